@@ -22,83 +22,86 @@ Core模块 - 项目核心功能
 所有Python模块都集中在core目录下
 """
 
-# AI客户端
-from . import ai_client
+import importlib
 
-# 配置管理
-from . import config
-from . import config_validators
+# 子模块与导出函数均在首次访问时才导入（PEP 562），
+# 这样 import core 或 import core.config 不会连带加载 telethon、openai、apscheduler 等重量级依赖
 
-# 数据库
-from . import database
-
-# 错误处理
-from . import error_handler
-
-# 历史记录处理
-from . import history_handlers
-
-# 日志配置
-from . import logger_config
+# 可按属性访问的子模块
+_LAZY_SUBMODULES = {
+    'ai_client',
+    'config',
+    'config_validators',
+    'database',
+    'error_handler',
+    'history_handlers',
+    'logger_config',
+    'prompt_manager',
+    'poll_prompt_manager',
+    'poll_regeneration_handlers',
+    'scheduler',
+    'summary_time_manager',
+    'telegram_client_utils',
+    'telegram_client',
+}
 
-# 提示词管理
-from . import prompt_manager
-from . import poll_prompt_manager
+# 导出函数 -> 所在子模块
+_LAZY_ATTRIBUTES = {
+    # Telegram模块（包含子模块）
+    'fetch_last_week_messages': '.telegram',
+    'send_report': '.telegram',
+    'send_long_message': '.telegram',
+    'send_poll': '.telegram',
+    'extract_date_range_from_summary': '.telegram',
+    'set_active_client': '.telegram',
+    'get_active_client': '.telegram',
 
-# 投票重新生成处理
-from . import poll_regeneration_handlers
+    # 命令处理器（包含子模块）
+    'handle_manual_summary': '.command_handlers',
+    'handle_show_prompt': '.command_handlers',
+    'handle_set_prompt': '.command_handlers',
+    'handle_prompt_input': '.command_handlers',
+    'handle_show_poll_prompt': '.command_handlers',
+    'handle_set_poll_prompt': '.command_handlers',
+    'handle_poll_prompt_input': '.command_handlers',
+    'handle_show_log_level': '.command_handlers',
+    'handle_set_log_level': '.command_handlers',
+    'handle_restart': '.command_handlers',
+    'handle_show_channels': '.command_handlers',
+    'handle_add_channel': '.command_handlers',
+    'handle_delete_channel': '.command_handlers',
+    'handle_clear_summary_time': '.command_handlers',
+    'handle_set_send_to_source': '.command_handlers',
+    'handle_show_channel_schedule': '.command_handlers',
+    'handle_set_channel_schedule': '.command_handlers',
+    'handle_delete_channel_schedule': '.command_handlers',
+    'handle_changelog': '.command_handlers',
+    'handle_shutdown': '.command_handlers',
+    'handle_pause': '.command_handlers',
+    'handle_resume': '.command_handlers',
+    'handle_start': '.command_handlers',
+    'handle_help': '.command_handlers',
+    'handle_clear_cache': '.command_handlers',
+    'handle_clean_logs': '.command_handlers',
+    'handle_blacklist': '.command_handlers',
+}
 
-# 调度器
-from . import scheduler
 
-# 总结时间管理
-from . import summary_time_manager
+def __getattr__(name):
+    """首次访问时导入子模块或导出函数，并缓存到模块命名空间"""
+    if name in _LAZY_SUBMODULES:
+        value = importlib.import_module(f'.{name}', __name__)
+    elif name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
-# Telegram客户端工具
-from . import telegram_client_utils
-from . import telegram_client
 
-# Telegram模块（包含子模块）
-from .telegram import (
-    fetch_last_week_messages,
-    send_report,
-    send_long_message,
-    send_poll,
-    extract_date_range_from_summary,
-    set_active_client,
-    get_active_client
-)
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
-# 命令处理器（包含子模块）
-from .command_handlers import (
-    handle_manual_summary,
-    handle_show_prompt,
-    handle_set_prompt,
-    handle_prompt_input,
-    handle_show_poll_prompt,
-    handle_set_poll_prompt,
-    handle_poll_prompt_input,
-    handle_show_log_level,
-    handle_set_log_level,
-    handle_restart,
-    handle_show_channels,
-    handle_add_channel,
-    handle_delete_channel,
-    handle_clear_summary_time,
-    handle_set_send_to_source,
-    handle_show_channel_schedule,
-    handle_set_channel_schedule,
-    handle_delete_channel_schedule,
-    handle_changelog,
-    handle_shutdown,
-    handle_pause,
-    handle_resume,
-    handle_start,
-    handle_help,
-    handle_clear_cache,
-    handle_clean_logs,
-    handle_blacklist
-)
 
 __all__ = [
     # AI客户端
@@ -0,0 +1,183 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""总结任务准入控制模块
+
+大量频道使用相同的默认总结时间时，定时任务会在同一秒内同时触发，
+集中抓取消息和调用 LLM 容易触发 FloodWait 与服务商限流。
+准入控制器限制同时执行的总结数，按频道哈希给定时任务分配固定的错峰延迟，
+排队的任务按优先级和截止时间（越早越先）依次放行，把突发请求变成平稳的队列。
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+
+from .config import SUMMARY_MAX_CONCURRENCY, SUMMARY_JITTER_SECONDS, SUMMARY_DEADLINE_SECONDS
+from .metrics import ADMISSION_WAIT_SECONDS, ADMISSION_QUEUE_DEPTH, ADMISSION_DEADLINE_MISSED
+
+logger = logging.getLogger(__name__)
+
+# 优先级：数值越小越先放行
+PRIORITY_MANUAL = 0
+PRIORITY_SCHEDULED = 10
+PRIORITY_CATCH_UP = 20
+
+_PRIORITY_NAMES = {
+    PRIORITY_MANUAL: "manual",
+    PRIORITY_SCHEDULED: "scheduled",
+    PRIORITY_CATCH_UP: "catch_up",
+}
+
+
+class AdmissionController:
+    """全局总结任务准入控制器
+
+    通过 admit() 获取执行名额：有空闲名额且无人排队时直接放行，
+    否则进入按 (优先级, 截止时间, 到达顺序) 排序的堆中等待，名额释放时依次唤醒。
+    """
+
+    def __init__(self, max_concurrency: int, jitter_seconds: float, deadline_seconds: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.jitter_seconds = max(0.0, jitter_seconds)
+        self.deadline_seconds = deadline_seconds
+
+        self._active = 0
+        self._waiting: List[Tuple[int, float, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+        self._stats = {
+            "admitted_total": 0,
+            "queued_total": 0,
+            "deadline_missed_total": 0,
+            "max_queue_depth": 0,
+        }
+
+    def jitter_for(self, channel: str) -> float:
+        """频道的固定错峰延迟（秒）
+
+        由频道URL的哈希值决定，同一频道每次都相同，不同频道均匀分布在 [0, jitter_seconds) 内。
+        """
+        if not self.jitter_seconds:
+            return 0.0
+        digest = hashlib.sha256(channel.encode('utf-8')).digest()
+        fraction = int.from_bytes(digest[:8], 'big') / 2 ** 64
+        return fraction * self.jitter_seconds
+
+    def default_deadline(self) -> float:
+        """从现在起计算的默认截止时间（time.time() 时间戳）"""
+        return time.time() + self.deadline_seconds
+
+    @asynccontextmanager
+    async def admit(self, channel: str, priority: int = PRIORITY_SCHEDULED, deadline: Optional[float] = None):
+        """获取一个执行名额，退出上下文时释放
+
+        Args:
+            channel: 频道URL，用于日志
+            priority: 优先级，PRIORITY_* 常量之一
+            deadline: 截止时间戳，默认为现在起 SUMMARY_DEADLINE_SECONDS 秒后
+        """
+        if deadline is None:
+            deadline = self.default_deadline()
+
+        queued_at = time.monotonic()
+        await self._acquire(channel, priority, deadline)
+        self._stats["admitted_total"] += 1
+        waited = time.monotonic() - queued_at
+        ADMISSION_WAIT_SECONDS.observe(waited, priority=_PRIORITY_NAMES.get(priority, str(priority)))
+
+        if time.time() > deadline:
+            self._stats["deadline_missed_total"] += 1
+            ADMISSION_DEADLINE_MISSED.inc()
+            logger.warning(f"频道 {channel} 排队 {waited:.0f} 秒后才开始执行，已超过截止时间")
+        elif waited >= 1:
+            logger.info(f"频道 {channel} 排队 {waited:.0f} 秒后开始执行")
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, channel: str, priority: int, deadline: float):
+        if self._active < self.max_concurrency and not self._waiting:
+            self._active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, deadline, next(self._sequence), channel, future))
+        self._stats["queued_total"] += 1
+        self._update_queue_depth()
+        logger.debug("频道 %s 进入准入队列，当前排队 %d 个", channel, len(self._waiting))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已被放行但调用方取消：归还名额
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        self._active -= 1
+        self._grant_next()
+
+    def _grant_next(self):
+        """按堆顺序唤醒等待者，跳过已取消的"""
+        while self._waiting and self._active < self.max_concurrency:
+            future = heapq.heappop(self._waiting)[-1]
+            if future.done():
+                continue
+            self._active += 1
+            future.set_result(None)
+        self._update_queue_depth()
+
+    def _update_queue_depth(self):
+        depth = len(self._waiting)
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        ADMISSION_QUEUE_DEPTH.set(depth)
+
+    def get_stats(self) -> dict:
+        """获取准入控制统计信息"""
+        return {
+            **self._stats,
+            "active": self._active,
+            "waiting": len(self._waiting),
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+_global_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器实例（首次调用时创建）"""
+    global _global_admission_controller
+    if _global_admission_controller is None:
+        _global_admission_controller = AdmissionController(
+            max_concurrency=SUMMARY_MAX_CONCURRENCY,
+            jitter_seconds=SUMMARY_JITTER_SECONDS,
+            deadline_seconds=SUMMARY_DEADLINE_SECONDS,
+        )
+        logger.info("总结任务准入控制器已初始化")
+    return _global_admission_controller
@@ -17,32 +17,37 @@
 # 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
+import asyncio
 import logging
-from openai import OpenAI
-from .config import LLM_API_KEY, LLM_BASE_URL, LLM_MODEL
+import time
+from .config import (
+    LLM_API_KEY, LLM_BASE_URL, LLM_MODEL, COMBINED_POLL_GENERATION, STREAM_EDIT_INTERVAL_SECONDS
+)
 from .error_handler import retry_with_backoff, record_error
+from .llm_router import get_llm_router
+from .tracing import traced
 from .poll_prompt_manager import load_poll_prompt
 
 logger = logging.getLogger(__name__)
 
-# 初始化 AI 客户端
+# 初始化 AI 客户端（请求经 LLM 路由在所有配置的端点之间分发）
 logger.info("开始初始化AI客户端...")
 logger.debug(f"AI客户端配置: Base URL={LLM_BASE_URL}, Model={LLM_MODEL}, API Key={'***' if LLM_API_KEY else '未设置'}")
 
-client_llm = OpenAI(
-    api_key=LLM_API_KEY, 
-    base_url=LLM_BASE_URL
-)
+llm_router = get_llm_router()
 
 logger.info("AI客户端初始化完成")
 
-@retry_with_backoff(
-    max_retries=3,
-    base_delay=1.0,
-    max_delay=30.0,
-    exponential_backoff=True,
-    retry_on_exceptions=(ConnectionError, TimeoutError, Exception)
-)
+
+def __getattr__(name):
+    """client_llm 在首次访问时才创建（默认端点的客户端，保留给直接使用单一客户端的旧代码）"""
+    if name == 'client_llm':
+        return llm_router.primary.client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 合并生成模式下，总结与投票JSON之间的分隔标记
+POLL_JSON_MARKER = "===POLL_JSON==="
+
 def analyze_with_ai(messages, current_prompt):
     """调用 AI 进行汇总
     
@@ -63,6 +68,7 @@ def analyze_with_ai(messages, current_prompt):
     return _execute_ai_analysis(prompt)
 
 
+@traced("prompt_build")
 def _build_ai_prompt(messages, current_prompt):
     """
     构建AI请求的提示词
@@ -85,7 +91,7 @@ def _build_ai_prompt(messages, current_prompt):
 
 def _execute_ai_analysis(prompt):
     """
-    执行AI分析请求
+    执行AI分析请求，重试与熔断之后仍失败时返回失败提示
 
     Args:
         prompt: 完整的提示词
@@ -94,29 +100,223 @@ def _execute_ai_analysis(prompt):
         str: AI分析结果
     """
     try:
-        from datetime import datetime
-        start_time = datetime.now()
-        response = client_llm.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "你是一个专业的资讯摘要助手，擅长提取重点并保持客观。"},
-                {"role": "user", "content": prompt},
-            ]
-        )
-        end_time = datetime.now()
-        
-        processing_time = (end_time - start_time).total_seconds()
-        logger.info(f"AI分析完成，处理时间: {processing_time:.2f}秒")
-        logger.debug(f"AI响应状态: 成功，选择索引={response.choices[0].index}, 完成原因={response.choices[0].finish_reason}")
-        logger.debug(f"AI响应长度: {len(response.choices[0].message.content)}字符")
-        
-        return response.choices[0].message.content
+        return _request_ai_analysis(prompt)
     except Exception as e:
         record_error(e, "analyze_with_ai")
         logger.error(f"AI分析失败: {type(e).__name__}: {e}", exc_info=True)
         return f"AI 分析失败: {e}"
 
 
+@retry_with_backoff(
+    max_retries=3,
+    base_delay=1.0,
+    max_delay=30.0,
+    exponential_backoff=True,
+    dependency="llm"
+)
+def _request_ai_analysis(prompt):
+    """
+    发送AI分析请求；异常直接抛出，由重试装饰器分类重试并计入 llm 熔断器
+
+    Args:
+        prompt: 完整的提示词
+
+    Returns:
+        str: AI分析结果
+    """
+    from datetime import datetime
+    start_time = datetime.now()
+    response = llm_router.chat_completion(
+        messages=[
+            {"role": "system", "content": "你是一个专业的资讯摘要助手，擅长提取重点并保持客观。"},
+            {"role": "user", "content": prompt},
+        ]
+    )
+    end_time = datetime.now()
+
+    processing_time = (end_time - start_time).total_seconds()
+    logger.info(f"AI分析完成，处理时间: {processing_time:.2f}秒")
+    logger.debug(f"AI响应状态: 成功，选择索引={response.choices[0].index}, 完成原因={response.choices[0].finish_reason}")
+    logger.debug(f"AI响应长度: {len(response.choices[0].message.content)}字符")
+
+    return response.choices[0].message.content
+
+
+def analyze_with_ai_and_poll(messages, current_prompt):
+    """在一次 AI 请求中同时生成总结和投票
+
+    要求模型先输出总结，再输出分隔标记和投票JSON。投票部分缺失或解析失败时
+    返回的投票数据为None，调用方应回退到单独生成投票的流程。
+
+    Args:
+        messages: 要分析的消息列表
+        current_prompt: 当前使用的提示词
+
+    Returns:
+        tuple: (总结文本, 投票数据或None)
+    """
+    logger.info("开始调用AI进行消息汇总（同时生成投票）")
+
+    if not messages:
+        logger.info("没有需要分析的消息，返回空结果")
+        return "本周无新动态。", None
+
+    prompt = _build_combined_prompt(messages, current_prompt)
+    if prompt is None:
+        return analyze_with_ai(messages, current_prompt), None
+
+    response_text = _execute_ai_analysis(prompt)
+    return _split_summary_and_poll(response_text)
+
+
+def analyze_channel_messages(messages, current_prompt, with_poll=False):
+    """按配置生成频道总结，需要投票且启用合并生成时一次请求同时生成投票
+
+    Args:
+        messages: 要分析的消息列表
+        current_prompt: 当前使用的提示词
+        with_poll: 该频道是否需要投票
+
+    Returns:
+        tuple: (总结文本, 投票数据或None)
+    """
+    if with_poll and COMBINED_POLL_GENERATION:
+        return analyze_with_ai_and_poll(messages, current_prompt)
+    return analyze_with_ai(messages, current_prompt), None
+
+
+async def analyze_with_ai_stream(messages, current_prompt, on_progress, with_poll=False):
+    """流式调用 AI 生成总结，并以节流频率回调已生成的内容
+
+    流式请求在线程池中执行，不阻塞事件循环。流式请求失败时回退到普通请求。
+
+    Args:
+        messages: 要分析的消息列表
+        current_prompt: 当前使用的提示词
+        on_progress: 异步回调，参数为目前已生成的总结文本（不含投票部分）
+        with_poll: 该频道是否需要投票（启用合并生成时一并生成）
+
+    Returns:
+        tuple: (总结文本, 投票数据或None)
+    """
+    logger.info("开始流式调用AI进行消息汇总")
+
+    if not messages:
+        logger.info("没有需要分析的消息，返回空结果")
+        return "本周无新动态。", None
+
+    combined = with_poll and COMBINED_POLL_GENERATION
+    prompt = _build_combined_prompt(messages, current_prompt) if combined else None
+    if prompt is None:
+        combined = False
+        prompt = _build_ai_prompt(messages, current_prompt)
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def stream_worker():
+        # 在工作线程中迭代流式响应，通过队列把增量内容交回事件循环
+        try:
+            stream = llm_router.open_stream(
+                messages=[
+                    {"role": "system", "content": "你是一个专业的资讯摘要助手，擅长提取重点并保持客观。"},
+                    {"role": "user", "content": prompt},
+                ]
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.choices[0].delta.content)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    start_time = time.monotonic()
+    worker = loop.run_in_executor(None, stream_worker)
+    chunks = []
+    last_progress = 0.0
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            chunks.append(item)
+            now = time.monotonic()
+            if now - last_progress >= STREAM_EDIT_INTERVAL_SECONDS:
+                last_progress = now
+                visible_text = "".join(chunks).split(POLL_JSON_MARKER, 1)[0]
+                try:
+                    await on_progress(visible_text)
+                except Exception as e:
+                    logger.debug(f"流式进度回调失败: {type(e).__name__}: {e}")
+        await worker
+        if not chunks:
+            raise ValueError("流式响应内容为空")
+    except Exception as e:
+        record_error(e, "analyze_with_ai_stream")
+        logger.warning(f"流式生成失败，回退到普通请求: {type(e).__name__}: {e}")
+        return await asyncio.to_thread(analyze_channel_messages, messages, current_prompt, with_poll)
+
+    response_text = "".join(chunks)
+    logger.info(f"AI流式分析完成，处理时间: {time.monotonic() - start_time:.2f}秒，响应长度: {len(response_text)}字符")
+
+    if combined:
+        return _split_summary_and_poll(response_text)
+    return response_text, None
+
+
+def _build_combined_prompt(messages, current_prompt):
+    """
+    构建同时生成总结和投票的提示词
+
+    Args:
+        messages: 要分析的消息列表
+        current_prompt: 当前使用的提示词
+
+    Returns:
+        str: 完整的提示词，投票提示词模板无法格式化时返回None
+    """
+    try:
+        poll_instruction = load_poll_prompt().format(summary_text="（即你在上方输出的总结内容）")
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning(f"投票提示词模板无法用于合并生成，回退为单独请求: {type(e).__name__}: {e}")
+        return None
+
+    summary_prompt = _build_ai_prompt(messages, current_prompt)
+    return (
+        f"{summary_prompt}\n\n---\n\n"
+        f"完成总结后，另起一行单独输出 {POLL_JSON_MARKER}，然后根据总结内容按以下要求输出投票JSON，"
+        f"标记之后不要输出其他内容：\n\n{poll_instruction}"
+    )
+
+
+def _split_summary_and_poll(response_text):
+    """
+    从合并生成的响应中拆分总结和投票
+
+    Args:
+        response_text: AI响应文本
+
+    Returns:
+        tuple: (总结文本, 投票数据或None)
+    """
+    if POLL_JSON_MARKER not in response_text:
+        logger.warning("合并生成的响应中未找到投票标记，投票将单独生成")
+        return response_text.strip(), None
+
+    summary_text, poll_text = response_text.split(POLL_JSON_MARKER, 1)
+    poll_data = _extract_and_validate_poll(poll_text)
+    if poll_data:
+        logger.info(f"合并生成投票成功: {poll_data['question']}，选项数: {len(poll_data['options'])}")
+    else:
+        logger.warning("合并生成的投票JSON无效，投票将单独生成")
+    return summary_text.strip(), poll_data
+
+
 def _truncate_unicode(text, max_length):
     """
     安全截断文本，避免截断多字节字符
@@ -216,13 +416,7 @@ def _get_default_poll():
     }
 
 
-@retry_with_backoff(
-    max_retries=3,
-    base_delay=1.0,
-    max_delay=30.0,
-    exponential_backoff=True,
-    retry_on_exceptions=(ConnectionError, TimeoutError, Exception)
-)
+@traced("poll_generation")
 def generate_poll_from_summary(summary_text):
     """根据总结内容生成投票
     
@@ -280,7 +474,7 @@ def _build_poll_prompt(summary_text):
 
 def _execute_poll_generation(prompt):
     """
-    执行投票生成请求
+    执行投票生成请求，重试与熔断之后仍失败时返回默认投票
 
     Args:
         prompt: 完整的提示词
@@ -301,9 +495,16 @@ def _execute_poll_generation(prompt):
         return _get_default_poll()
 
 
+@retry_with_backoff(
+    max_retries=3,
+    base_delay=1.0,
+    max_delay=30.0,
+    exponential_backoff=True,
+    dependency="llm"
+)
 def _make_ai_poll_request(prompt):
     """
-    执行AI投票请求
+    执行AI投票请求；异常直接抛出，由重试装饰器分类重试并计入 llm 熔断器
 
     Args:
         prompt: 提示词
@@ -314,8 +515,7 @@ def _make_ai_poll_request(prompt):
     from datetime import datetime
     
     start_time = datetime.now()
-    response = client_llm.chat.completions.create(
-        model=LLM_MODEL,
+    response = llm_router.chat_completion(
         messages=[
             {"role": "system", "content": "你是一个幽默风趣的互动策划专家，擅长从枯燥的文字中挖掘槽点或亮点，创作让人忍不住想投票的双语投票。"},
             {"role": "user", "content": prompt},
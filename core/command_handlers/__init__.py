@@ -22,7 +22,7 @@ from .system_commands import (
     handle_restart, handle_changelog, handle_shutdown,
     handle_pause, handle_resume, handle_clean_logs,
     handle_help, handle_start, handle_clear_cache, handle_blacklist,
-    handle_reload
+    handle_reload, handle_metrics, handle_trace, handle_jobs
 )
 from .channel_commands import (
     handle_show_channels, handle_add_channel, handle_delete_channel,
@@ -43,7 +43,7 @@ __all__ = [
     'handle_restart', 'handle_changelog', 'handle_shutdown',
     'handle_pause', 'handle_resume', 'handle_clean_logs',
     'handle_help', 'handle_start', 'handle_clear_cache',
-    'handle_blacklist', 'handle_reload',
+    'handle_blacklist', 'handle_reload', 'handle_metrics', 'handle_trace', 'handle_jobs',
     'handle_show_channels', 'handle_add_channel', 'handle_delete_channel',
     'handle_show_channel_schedule', 'handle_set_channel_schedule',
     'handle_delete_channel_schedule', 'handle_clear_summary_time',
@@ -23,10 +23,10 @@ import os
 from telethon.events import NewMessage
 
 from ..config import (
-    CHANNELS, ADMIN_LIST, RESTART_FLAG_FILE, load_config, save_config, logger,
+    ADMIN_LIST, RESTART_FLAG_FILE, load_config, save_config, logger, get_config_snapshot,
     get_channel_schedule, set_channel_schedule, set_channel_schedule_v2,
     delete_channel_schedule, validate_schedule, LAST_SUMMARY_FILE,
-    SEND_REPORT_TO_SOURCE, ENABLE_POLL, get_channel_poll_config,
+    get_channel_poll_config,
     set_channel_poll_config, delete_channel_poll_config
 )
 from ..prompt_manager import load_prompt
@@ -51,13 +51,13 @@ async def handle_show_channels(event):
     
     logger.info(f"执行命令 {command} 成功")
     
-    if not CHANNELS:
+    if not get_config_snapshot().channels:
         await event.reply("当前没有配置任何频道")
         return
     
     # 构建频道列表消息
     channels_msg = "当前配置的频道列表：\n\n"
-    for i, channel in enumerate(CHANNELS, 1):
+    for i, channel in enumerate(get_config_snapshot().channels, 1):
         channels_msg += f"{i}. {channel}\n"
     
     await event.reply(channels_msg)
@@ -84,20 +84,21 @@ async def handle_add_channel(event):
             return
         
         # 检查频道是否已存在
-        if channel_url in CHANNELS:
+        channels = list(get_config_snapshot().channels)
+        if channel_url in channels:
             await event.reply(f"频道 {channel_url} 已存在于列表中")
             return
         
         # 添加频道到列表
-        CHANNELS.append(channel_url)
+        channels.append(channel_url)
         
-        # 更新配置文件
+        # 更新配置文件（save_config 会构建并替换配置快照）
         config = load_config()
-        config['channels'] = CHANNELS
+        config['channels'] = channels
         save_config(config)
         
         logger.info(f"已添加频道 {channel_url} 到列表")
-        await event.reply(f"频道 {channel_url} 已成功添加到列表中\n\n当前频道数量：{len(CHANNELS)}")
+        await event.reply(f"频道 {channel_url} 已成功添加到列表中\n\n当前频道数量：{len(channels)}")
         
     except ValueError:
         # 没有提供频道URL
@@ -128,20 +129,21 @@ async def handle_delete_channel(event):
             return
         
         # 检查频道是否存在
-        if channel_url not in CHANNELS:
+        channels = list(get_config_snapshot().channels)
+        if channel_url not in channels:
             await event.reply(f"频道 {channel_url} 不在列表中")
             return
         
         # 从列表中删除频道
-        CHANNELS.remove(channel_url)
+        channels.remove(channel_url)
         
-        # 更新配置文件
+        # 更新配置文件（save_config 会构建并替换配置快照）
         config = load_config()
-        config['channels'] = CHANNELS
+        config['channels'] = channels
         save_config(config)
         
         logger.info(f"已从列表中删除频道 {channel_url}")
-        await event.reply(f"频道 {channel_url} 已成功从列表中删除\n\n当前频道数量：{len(CHANNELS)}")
+        await event.reply(f"频道 {channel_url} 已成功从列表中删除\n\n当前频道数量：{len(channels)}")
         
     except ValueError:
         # 没有提供频道URL或频道不存在
@@ -175,18 +177,18 @@ async def handle_show_channel_schedule(event):
                 channel = f"https://t.me/{channel_part}"
             
             # 检查频道是否存在
-            if channel not in CHANNELS:
+            if channel not in get_config_snapshot().channels:
                 await event.reply(f"频道 {channel} 不在配置列表中")
                 return
         else:
             # 没有指定频道，显示所有频道的配置
-            if not CHANNELS:
+            if not get_config_snapshot().channels:
                 await event.reply("当前没有配置任何频道")
                 return
             
             # 构建所有频道的配置信息
             schedule_msg = "所有频道的自动总结时间配置：\n\n"
-            for i, ch in enumerate(CHANNELS, 1):
+            for i, ch in enumerate(get_config_snapshot().channels, 1):
                 schedule = get_channel_schedule(ch)
                 schedule_msg += format_schedule_info(ch, schedule, i)
 
@@ -246,7 +248,7 @@ async def handle_set_channel_schedule(event):
             channel = f"https://t.me/{channel_part}"
 
         # 检查频道是否存在
-        if channel not in CHANNELS:
+        if channel not in get_config_snapshot().channels:
             await event.reply(f"频道 {channel} 不在配置列表中，请先使用/addchannel命令添加频道")
             return
 
@@ -381,7 +383,7 @@ async def handle_delete_channel_schedule(event):
             channel = f"https://t.me/{channel_part}"
         
         # 检查频道是否存在
-        if channel not in CHANNELS:
+        if channel not in get_config_snapshot().channels:
             await event.reply(f"频道 {channel} 不在配置列表中")
             return
         
@@ -478,9 +480,10 @@ async def handle_set_send_to_source(event):
     
     # 处理没有参数的情况：显示当前设置
     if len(parts) == 1:
-        current_status = "开启" if SEND_REPORT_TO_SOURCE else "关闭"
+        send_report_to_source = get_config_snapshot().send_report_to_source
+        current_status = "开启" if send_report_to_source else "关闭"
         await event.reply(
-            f"当前报告发送回源频道的设置：`{SEND_REPORT_TO_SOURCE}`\n"
+            f"当前报告发送回源频道的设置：`{send_report_to_source}`\n"
             f"当前状态：`{current_status}`\n\n"
             f"使用格式：`/setsendtosource true|false`"
         )
@@ -503,7 +506,7 @@ async def handle_set_send_to_source(event):
         config['send_report_to_source'] = new_value
         save_config(config)
         
-        # save_config 会自动调用 update_module_variables 更新全局变量 SEND_REPORT_TO_SOURCE
+        # save_config 会自动调用 update_module_variables 构建并替换配置快照
         logger.info(f"已将 send_report_to_source 设置为: {new_value}")
         
         current_status = "开启" if new_value else "关闭"
@@ -538,23 +541,23 @@ async def handle_channel_poll(event):
                 channel = f"https://t.me/{channel_part}"
 
             # 检查频道是否存在
-            if channel not in CHANNELS:
+            if channel not in get_config_snapshot().channels:
                 await event.reply(f"频道 {channel} 不在配置列表中")
                 return
         else:
             # 没有指定频道，显示所有频道的配置
-            if not CHANNELS:
+            if not get_config_snapshot().channels:
                 await event.reply("当前没有配置任何频道")
                 return
 
             # 构建所有频道的配置信息
             poll_msg = "所有频道的投票配置：\n\n"
-            for i, ch in enumerate(CHANNELS, 1):
+            for i, ch in enumerate(get_config_snapshot().channels, 1):
                 poll_msg += format_poll_info(ch, i)
 
             # 添加全局配置说明
             poll_msg += f"\n🌐 全局配置：\n"
-            poll_msg += f"• 投票功能：{'开启' if ENABLE_POLL else '关闭'}\n"
+            poll_msg += f"• 投票功能：{'开启' if get_config_snapshot().enable_poll else '关闭'}\n"
             poll_msg += f"\n💡 提示：频道独立配置会覆盖全局配置"
 
             await event.reply(poll_msg)
@@ -569,7 +572,7 @@ async def handle_channel_poll(event):
         # 显示启用状态
         enabled = poll_config['enabled']
         if enabled is None:
-            poll_info += f"📊 投票启用：使用全局配置（{'开启' if ENABLE_POLL else '关闭'}）\n"
+            poll_info += f"📊 投票启用：使用全局配置（{'开启' if get_config_snapshot().enable_poll else '关闭'}）\n"
         else:
             poll_info += f"📊 投票启用：{'开启' if enabled else '关闭'}\n"
 
@@ -630,7 +633,7 @@ async def handle_set_channel_poll(event):
             channel = f"https://t.me/{channel_part}"
 
         # 检查频道是否存在
-        if channel not in CHANNELS:
+        if channel not in get_config_snapshot().channels:
             await event.reply(f"频道 {channel} 不在配置列表中，请先使用/addchannel命令添加频道")
             return
 
@@ -671,7 +674,7 @@ async def handle_set_channel_poll(event):
                 success_msg += f"• 发送位置：保持不变\n"
 
             if enabled is None:
-                success_msg += f"\n该频道将使用全局投票配置（{'开启' if ENABLE_POLL else '关闭'}）"
+                success_msg += f"\n该频道将使用全局投票配置（{'开启' if get_config_snapshot().enable_poll else '关闭'}）"
             else:
                 success_msg += f"\n该频道将使用独立配置"
 
@@ -711,7 +714,7 @@ async def handle_delete_channel_poll(event):
             channel = f"https://t.me/{channel_part}"
 
         # 检查频道是否存在
-        if channel not in CHANNELS:
+        if channel not in get_config_snapshot().channels:
             await event.reply(f"频道 {channel} 不在配置列表中")
             return
 
@@ -722,7 +725,7 @@ async def handle_delete_channel_poll(event):
             channel_name = channel.split('/')[-1]
             success_msg = f"✅ 已成功删除频道 `{channel_name}` 的独立投票配置。\n\n"
             success_msg += f"该频道将使用全局投票配置：\n"
-            success_msg += f"• 投票功能：{'开启' if ENABLE_POLL else '关闭'}\n"
+            success_msg += f"• 投票功能：{'开启' if get_config_snapshot().enable_poll else '关闭'}\n"
             success_msg += f"• 默认发送位置：讨论组"
 
             logger.info(f"已删除频道 {channel} 的投票配置")
@@ -17,22 +17,170 @@
 # 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
+import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
 from telethon.events import NewMessage
 
 from ..config import (
-    CHANNELS, ADMIN_LIST, SEND_REPORT_TO_SOURCE,
+    ADMIN_LIST, SUMMARY_STREAMING_ENABLED, get_config_snapshot,
     load_config, save_config, logger
 )
 from ..prompt_manager import load_prompt
-from ..summary_time_manager import load_last_summary_time, save_last_summary_time
-from ..ai_client import analyze_with_ai
+from ..summary_time_manager import save_last_summary_time, get_channel_fetch_window
+from ..ai_client import analyze_channel_messages, analyze_with_ai_stream
 from ..telegram import fetch_last_week_messages, send_long_message, send_report
+from ..telegram.entity_cache import get_entity_cache
+from ..telegram.send_scheduler import get_send_scheduler
+from ..telegram.message_sender import update_streaming_message, finalize_streamed_message
+from ..tracing import start_trace, span
+from ..outbox import enqueue_summary, deliver_summary
+from ..admission import get_admission_controller, PRIORITY_MANUAL
+from ..single_flight import get_single_flight, summary_flight_key
+from ..leases import hold_channel_lease, lease_skipped_result, lease_lost_result, LeaseLostError
 
 logger = logging.getLogger(__name__)
 
 
+async def _summarize_channel_for_requester(event, sender_id, channel, snapshot):
+    """手动总结单个频道：生成总结回复给请求者，并按配置发送报告、保存总结时间
+
+    Args:
+        event: 触发命令的事件
+        sender_id: 请求者ID
+        channel: 频道URL
+        snapshot: 本次命令使用的配置快照
+
+    Returns:
+        dict: 与 main_job 格式相同的结果字典，供同时到达的定时任务共享
+    """
+    channel_start_time = datetime.now()
+    with start_trace("manual_summary", channel=channel):
+        # 读取该频道的上次总结时间和需要排除的报告消息ID
+        channel_last_summary_time, report_message_ids_to_exclude = get_channel_fetch_window(channel)
+    
+        # 抓取该频道从上次总结时间开始的消息，排除已发送的报告消息
+        with span("fetch") as fetch_span:
+            messages_by_channel = await fetch_last_week_messages(
+                [channel], 
+                start_time=channel_last_summary_time,
+                report_message_ids={channel: report_message_ids_to_exclude}
+            )
+    
+        # 获取该频道的消息
+        messages = messages_by_channel.get(channel, [])
+        fetch_span.set_attribute("message_count", len(messages))
+        summary_length = 0
+        if messages:
+            logger.info(f"开始处理频道 {channel} 的消息")
+            current_prompt = load_prompt()
+            with_poll = snapshot.send_report_to_source and snapshot.channel(channel).poll_enabled
+            placeholder = None
+            if SUMMARY_STREAMING_ENABLED:
+                # 流式生成：先发送占位消息，生成过程中按节流频率更新
+                placeholder = await get_send_scheduler().send_message(event.client, sender_id, "📝 正在生成总结...")
+
+                async def on_progress(text):
+                    await update_streaming_message(event.client, sender_id, placeholder, text)
+
+                with span("analyze", streaming=True):
+                    summary, poll_data = await analyze_with_ai_stream(
+                        messages, current_prompt, on_progress, with_poll=with_poll
+                    )
+            else:
+                with span("analyze"):
+                    # 在线程中调用同步的 AI 接口，避免阻塞事件循环（包括租约心跳）
+                    summary, poll_data = await asyncio.to_thread(
+                        analyze_channel_messages, messages, current_prompt, with_poll=with_poll
+                    )
+            # 获取频道实际名称（实体缓存，解析失败时使用链接后缀作为回退）
+            with span("entity_resolve"):
+                channel_actual_name = await get_entity_cache().get_title(event.client, channel)
+            logger.info(f"获取到频道实际名称: {channel_actual_name}")
+            # 计算起始日期和终止日期
+            end_date = datetime.now(timezone.utc)
+            if channel_last_summary_time:
+                start_date = channel_last_summary_time
+            else:
+                start_date = end_date - timedelta(days=7)
+            # 格式化日期为 月.日 格式
+            start_date_str = f"{start_date.month}.{start_date.day}"
+            end_date_str = f"{end_date.month}.{end_date.day}"
+
+            # 获取频道的调度配置，用于生成报告标题
+            frequency = snapshot.channel(channel).schedule.get('frequency', 'weekly')
+
+            # 根据频率生成报告标题
+            if frequency == 'daily':
+                report_title = f"{channel_actual_name} 日报 {end_date_str}"
+            else:  # weekly
+                report_title = f"{channel_actual_name} 周报 {start_date_str}-{end_date_str}"
+
+            # 生成报告文本
+            report_text = f"**{report_title}**\n\n{summary}"
+            summary_length = len(summary)
+            # 向请求者发送总结（流式模式下将最终结果重新分段写入占位消息）
+            with span("reply"):
+                if placeholder:
+                    await finalize_streamed_message(event.client, sender_id, placeholder, report_text)
+                else:
+                    await send_long_message(event.client, sender_id, report_text)
+            # 根据配置决定是否向源频道发送总结，传递现有客户端实例避免数据库锁定
+            # 如果请求者是管理员，跳过向管理员发送报告，避免重复发送
+            skip_admins = sender_id in ADMIN_LIST or ADMIN_LIST == ['me']
+            sent_report_ids = []
+            if snapshot.send_report_to_source:
+                # 先存入发送队列，发送失败时由后台投递重试，总结内容不会丢失
+                with span("db_save"):
+                    summary_id = enqueue_summary(channel, channel_actual_name, report_text, len(messages), 'manual', poll_data=poll_data)
+            with span("send"):
+                if snapshot.send_report_to_source:
+                    try:
+                        sent_report_ids = await deliver_summary(summary_id, event.client, skip_admins=skip_admins)
+                    except Exception as e:
+                        logger.warning(f"频道 {channel} 的总结发送失败，已保留在发送队列中稍后重试: {type(e).__name__}: {e}")
+                else:
+                    await send_report(report_text, None, event.client, skip_admins=skip_admins, message_count=len(messages))
+        
+            # 保存该频道的本次总结时间和所有相关消息ID
+            if sent_report_ids:
+                summary_ids = sent_report_ids.get("summary_message_ids", [])
+                poll_id = sent_report_ids.get("poll_message_id")
+                button_id = sent_report_ids.get("button_message_id")
+
+                # 转换单个ID为列表格式
+                poll_ids = [poll_id] if poll_id else []
+                button_ids = [button_id] if button_id else []
+
+                with span("state_save"):
+                    save_last_summary_time(
+                        channel,
+                        datetime.now(timezone.utc),
+                        summary_message_ids=summary_ids,
+                        poll_message_ids=poll_ids,
+                        button_message_ids=button_ids
+                    )
+            else:
+                with span("state_save"):
+                    save_last_summary_time(channel, datetime.now(timezone.utc))
+        else:
+            logger.info(f"频道 {channel} 没有新消息需要总结")
+            # 获取频道实际名称用于无消息提示
+            channel_actual_name = await get_entity_cache().get_title(event.client, channel)
+            await send_long_message(event.client, sender_id, f"📋 **{channel_actual_name} 频道汇总**\n\n该频道自上次总结以来没有新消息。")
+
+    processing_time = (datetime.now() - channel_start_time).total_seconds()
+    return {
+        "success": True,
+        "channel": channel,
+        "message_count": len(messages),
+        "summary_length": summary_length,
+        "processing_time": processing_time,
+        "error": None,
+        "details": f"手动总结频道 {channel} 完成，共 {len(messages)} 条消息，处理时间 {processing_time:.2f}秒"
+    }
+
+
 async def handle_manual_summary(event):
     """处理/立即总结命令"""
     sender_id = event.sender_id
@@ -51,6 +199,9 @@ async def handle_manual_summary(event):
     
     # 解析命令参数，支持指定频道
     try:
+        # 本次命令使用同一个配置快照
+        snapshot = get_config_snapshot()
+        
         # 分割命令和参数
         parts = command.split()
         if len(parts) > 1:
@@ -67,7 +218,7 @@ async def handle_manual_summary(event):
             # 验证指定的频道是否在配置中
             valid_channels = []
             for channel in specified_channels:
-                if channel in CHANNELS:
+                if channel in snapshot.channels:
                     valid_channels.append(channel)
                 else:
                     await event.reply(f"频道 {channel} 不在配置列表中，将跳过")
@@ -79,129 +230,30 @@ async def handle_manual_summary(event):
             channels_to_process = valid_channels
         else:
             # 没有指定频道，处理所有配置的频道
-            channels_to_process = CHANNELS
+            channels_to_process = snapshot.channels
         
         # 按频道分别处理
         for channel in channels_to_process:
-            # 读取该频道的上次总结时间和报告消息ID
-            channel_summary_data = load_last_summary_time(channel, include_report_ids=True)
-            if channel_summary_data:
-                channel_last_summary_time = channel_summary_data["time"]
-                # 使用新的键名: summary_message_ids
-                # 为了向后兼容,同时支持旧格式
-                if "summary_message_ids" in channel_summary_data:
-                    # 新格式
-                    summary_ids = channel_summary_data["summary_message_ids"]
-                    # 类型检查: 如果summary_ids是字典,说明数据格式错误,需要修复
-                    if isinstance(summary_ids, dict):
-                        logger.warning(f"检测到summary_ids是字典格式,正在修复数据结构: {summary_ids}")
-                        summary_ids = summary_ids.get("summary_message_ids", [])
-                    # 确保是列表
-                    if not isinstance(summary_ids, list):
-                        logger.error(f"summary_ids类型错误: {type(summary_ids)}, 值: {summary_ids}, 使用空列表")
-                        summary_ids = []
-
-                    poll_ids = channel_summary_data.get("poll_message_ids", [])
-                    button_ids = channel_summary_data.get("button_message_ids", [])
-                    # 确保都是列表
-                    if not isinstance(poll_ids, list):
-                        poll_ids = []
-                    if not isinstance(button_ids, list):
-                        button_ids = []
-
-                    # 合并所有消息ID用于排除
-                    report_message_ids_to_exclude = summary_ids + poll_ids + button_ids
-                else:
-                    # 旧格式,使用report_message_ids
-                    report_message_ids_to_exclude = channel_summary_data["report_message_ids"]
-            else:
-                channel_last_summary_time = None
-                report_message_ids_to_exclude = []
-            
-            # 抓取该频道从上次总结时间开始的消息，排除已发送的报告消息
-            messages_by_channel = await fetch_last_week_messages(
-                [channel], 
-                start_time=channel_last_summary_time,
-                report_message_ids={channel: report_message_ids_to_exclude}
-            )
-            
-            # 获取该频道的消息
-            messages = messages_by_channel.get(channel, [])
-            if messages:
-                logger.info(f"开始处理频道 {channel} 的消息")
-                current_prompt = load_prompt()
-                summary = analyze_with_ai(messages, current_prompt)
-                # 获取频道实际名称
-                try:
-                    channel_entity = await event.client.get_entity(channel)
-                    channel_actual_name = channel_entity.title
-                    logger.info(f"获取到频道实际名称: {channel_actual_name}")
-                except Exception as e:
-                    logger.warning(f"获取频道实体失败，使用默认名称: {e}")
-                    # 使用频道链接的最后部分作为回退
-                    channel_actual_name = channel.split('/')[-1]
-                # 计算起始日期和终止日期
-                end_date = datetime.now(timezone.utc)
-                if channel_last_summary_time:
-                    start_date = channel_last_summary_time
-                else:
-                    start_date = end_date - timedelta(days=7)
-                # 格式化日期为 月.日 格式
-                start_date_str = f"{start_date.month}.{start_date.day}"
-                end_date_str = f"{end_date.month}.{end_date.day}"
-
-                # 获取频道的调度配置，用于生成报告标题
-                from ..config import get_channel_schedule
-                schedule_config = get_channel_schedule(channel)
-                frequency = schedule_config.get('frequency', 'weekly')
-
-                # 根据频率生成报告标题
-                if frequency == 'daily':
-                    report_title = f"{channel_actual_name} 日报 {end_date_str}"
-                else:  # weekly
-                    report_title = f"{channel_actual_name} 周报 {start_date_str}-{end_date_str}"
-
-                # 生成报告文本
-                report_text = f"**{report_title}**\n\n{summary}"
-                # 向请求者发送总结
-                await send_long_message(event.client, sender_id, report_text)
-                # 根据配置决定是否向源频道发送总结，传递现有客户端实例避免数据库锁定
-                # 如果请求者是管理员，跳过向管理员发送报告，避免重复发送
-                skip_admins = sender_id in ADMIN_LIST or ADMIN_LIST == ['me']
-                sent_report_ids = []
-                if SEND_REPORT_TO_SOURCE:
-                    sent_report_ids = await send_report(report_text, channel, event.client, skip_admins=skip_admins, message_count=len(messages))
-                else:
-                    await send_report(report_text, None, event.client, skip_admins=skip_admins, message_count=len(messages))
-                
-                # 保存该频道的本次总结时间和所有相关消息ID
-                if sent_report_ids:
-                    summary_ids = sent_report_ids.get("summary_message_ids", [])
-                    poll_id = sent_report_ids.get("poll_message_id")
-                    button_id = sent_report_ids.get("button_message_id")
+            # 同一频道已有总结在进行（定时任务或其他手动命令）时，等待并复用其结果；
+            # 正由其他进程执行时跳过
+            async def run_admitted(channel=channel):
+                async with get_admission_controller().admit(channel, priority=PRIORITY_MANUAL):
+                    try:
+                        async with hold_channel_lease(channel) as lease:
+                            if not lease.acquired:
+                                return lease_skipped_result(channel, lease)
+                            result = await _summarize_channel_for_requester(event, sender_id, channel, snapshot)
+                            lease.completed = result.get("success", False)
+                            return result
+                    except LeaseLostError as e:
+                        return lease_lost_result(channel, e)
 
-                    # 转换单个ID为列表格式
-                    poll_ids = [poll_id] if poll_id else []
-                    button_ids = [button_id] if button_id else []
-
-                    save_last_summary_time(
-                        channel,
-                        datetime.now(timezone.utc),
-                        summary_message_ids=summary_ids,
-                        poll_message_ids=poll_ids,
-                        button_message_ids=button_ids
-                    )
-                else:
-                    save_last_summary_time(channel, datetime.now(timezone.utc))
-            else:
-                logger.info(f"频道 {channel} 没有新消息需要总结")
-                # 获取频道实际名称用于无消息提示
-                try:
-                    channel_entity = await event.client.get_entity(channel)
-                    channel_actual_name = channel_entity.title
-                except Exception as e:
-                    channel_actual_name = channel.split('/')[-1]
-                await send_long_message(event.client, sender_id, f"📋 **{channel_actual_name} 频道汇总**\n\n该频道自上次总结以来没有新消息。")
+            result, shared = await get_single_flight().do(summary_flight_key(channel), run_admitted)
+            if shared or result.get("skipped"):
+                await send_long_message(
+                    event.client, sender_id,
+                    f"ℹ️ 频道 {channel} 的总结已在进行中，未重复生成。\n{result.get('details', '')}"
+                )
         
         logger.info(f"命令 {command} 执行成功")
     except Exception as e:
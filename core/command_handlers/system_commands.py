@@ -138,9 +138,6 @@ async def handle_restart(event):
         except Exception as e:
             logger.warning(f"关闭客户端连接时出错: {e}")
         
-        # 等待一段时间确保资源释放
-        await asyncio.sleep(1)
-        
         # 使用 subprocess.Popen 在 Windows 上可靠地重启程序
         logger.info("正在完全重启程序进程...")
         try:
@@ -158,6 +155,9 @@ async def handle_restart(event):
             
             # 彻底退出当前进程
             logger.info("新进程已启动，正在退出当前进程...")
+            # os._exit 不会执行 atexit，先停止后台日志线程写出队列中剩余的日志
+            from ..logger_config import stop_log_listener
+            stop_log_listener()
             os._exit(0)
         except Exception as e:
             logger.critical(f"重启进程失败: {type(e).__name__}: {e}", exc_info=True)
@@ -302,6 +302,11 @@ async def handle_clear_cache(event):
             os.remove(path)
             cache_cleared = True
             logger.info(f"已删除缓存文件: {path}")
+
+    # 清除讨论组ID与频道实体缓存，下次使用时重新解析
+    from ..config import clear_discussion_group_cache
+    clear_discussion_group_cache()
+    cache_cleared = True
     
     if cache_cleared:
         logger.info(f"执行命令 {command} 成功")
@@ -310,6 +315,150 @@ async def handle_clear_cache(event):
         await event.reply("没有需要清除的缓存文件")
 
 
+async def handle_metrics(event):
+    """处理/metrics命令，显示运行指标摘要"""
+    sender_id = event.sender_id
+    command = event.text
+    logger.info(f"收到命令: {command}，发送者: {sender_id}")
+
+    # 检查发送者是否为管理员
+    if sender_id not in ADMIN_LIST and ADMIN_LIST != ['me']:
+        logger.warning(f"发送者 {sender_id} 没有权限执行命令 {command}")
+        await event.reply("您没有权限执行此命令")
+        return
+
+    from ..metrics import get_metrics_summary
+    from ..error_handler import get_resilience_stats
+    from ..llm_router import get_llm_router
+
+    sections = ["📊 **运行指标**", get_metrics_summary()]
+
+    endpoint_lines = []
+    for stats in get_llm_router().get_stats():
+        latency = f"{stats['ewma_latency']:.2f}s" if stats['ewma_latency'] is not None else "-"
+        endpoint_lines.append(
+            f"  • {stats['name']} ({stats['model']}): {'健康' if stats['healthy'] else '冷却中'}，"
+            f"EWMA {latency}，错误率 {stats['error_rate']:.0%}，请求 {stats['requests']}"
+        )
+    sections.append("**LLM 端点**\n" + "\n".join(endpoint_lines))
+
+    resilience = get_resilience_stats()
+    breaker_lines = [
+        f"  • {name}: {stats['state']}，连续失败 {stats['consecutive_failures']}，已拒绝 {stats['rejected_count']}"
+        for name, stats in resilience["circuit_breakers"].items()
+    ]
+    budget = resilience["retry_budget"]
+    breaker_lines.append(f"  • 重试预算（60秒窗口）: 请求 {budget['requests']}，重试 {budget['retries']}，拒绝 {budget['denied']}")
+    sections.append("**熔断与重试**\n" + "\n".join(breaker_lines))
+
+    logger.info(f"执行命令 {command} 成功")
+    await event.reply("\n\n".join(section for section in sections if section))
+
+
+async def handle_trace(event):
+    """处理/trace命令，查看最近总结任务的链路耗时
+
+    用法：/trace [last|list|序号]，默认 last
+    """
+    sender_id = event.sender_id
+    command = event.text
+    logger.info(f"收到命令: {command}，发送者: {sender_id}")
+
+    # 检查发送者是否为管理员
+    if sender_id not in ADMIN_LIST and ADMIN_LIST != ['me']:
+        logger.warning(f"发送者 {sender_id} 没有权限执行命令 {command}")
+        await event.reply("您没有权限执行此命令")
+        return
+
+    from ..tracing import get_recent_traces, format_trace
+
+    traces = get_recent_traces()
+    if not traces:
+        await event.reply("暂无链路记录，总结任务运行后再查看")
+        return
+
+    parts = command.split()
+    arg = parts[1].lower() if len(parts) > 1 else "last"
+
+    if arg == "list":
+        lines = ["🧭 **最近的链路**（最新在前）"]
+        for index, trace in enumerate(reversed(traces), start=1):
+            root = trace.root
+            attributes = "，".join(f"{k}={v}" for k, v in root.attributes.items())
+            lines.append(f"{index}. {root.name} {root.duration_ms / 1000:.1f}s{' ❌' if root.status == 'error' else ''}  [{attributes}]")
+        lines.append("\n使用 /trace <序号> 查看详情")
+        await event.reply("\n".join(lines))
+        return
+
+    if arg == "last":
+        index = 1
+    elif arg.isdigit() and 1 <= int(arg) <= len(traces):
+        index = int(arg)
+    else:
+        await event.reply("用法：/trace [last|list|序号]")
+        return
+
+    trace = traces[-index]
+    logger.info(f"执行命令 {command} 成功")
+    await event.reply(f"🧭 **链路 {trace.trace_id[:8]}**\n```\n{format_trace(trace)}\n```")
+
+
+async def handle_jobs(event):
+    """处理/jobs命令，查看总结任务队列与死信任务
+
+    用法：/jobs 查看进行中和死信任务；/jobs retry <任务ID> 重试死信任务
+    """
+    sender_id = event.sender_id
+    command = event.text
+    logger.info(f"收到命令: {command}，发送者: {sender_id}")
+
+    # 检查发送者是否为管理员
+    if sender_id not in ADMIN_LIST and ADMIN_LIST != ['me']:
+        logger.warning(f"发送者 {sender_id} 没有权限执行命令 {command}")
+        await event.reply("您没有权限执行此命令")
+        return
+
+    from ..summary_jobs import format_summary_jobs
+
+    db = get_db_manager()
+    parts = command.split()
+
+    if len(parts) > 1:
+        if parts[1].lower() != "retry" or len(parts) < 3 or not parts[2].isdigit():
+            await event.reply("用法：/jobs [retry <任务ID>]")
+            return
+
+        job = db.retry_summary_job(int(parts[2]))
+        if job is None:
+            await event.reply(f"未找到死信任务 #{parts[2]}")
+            return
+
+        # 在后台从中断的阶段继续执行，不阻塞命令处理
+        import asyncio
+        from ..admission import PRIORITY_CATCH_UP
+        from ..scheduler import run_channel_summary
+        asyncio.create_task(run_channel_summary(job['channel_id'], priority=PRIORITY_CATCH_UP))
+        logger.info(f"执行命令 {command} 成功")
+        await event.reply(f"✅ 任务 #{job['id']} 已重新入队，将从 {job['state']} 阶段继续执行")
+        return
+
+    active_jobs = db.get_summary_jobs(status='active')
+    dead_jobs = db.get_summary_jobs(status='dead')
+
+    sections = ["📋 **总结任务队列**"]
+    sections.append(f"**进行中（{len(active_jobs)}）**\n{format_summary_jobs(active_jobs) if active_jobs else '无'}")
+    sections.append(f"**死信（{len(dead_jobs)}）**\n{format_summary_jobs(dead_jobs) if dead_jobs else '无'}")
+    leases = db.get_job_leases()
+    if leases:
+        lease_lines = "\n".join(f"• {lease['channel_id']}  {lease['owner']}" for lease in leases)
+        sections.append(f"**执行中的频道（{len(leases)}）**\n{lease_lines}")
+    if dead_jobs:
+        sections.append("使用 /jobs retry <任务ID> 从中断的阶段重试死信任务")
+
+    logger.info(f"执行命令 {command} 成功")
+    await event.reply("\n\n".join(sections))
+
+
 async def handle_clean_logs(event):
     """处理/cleanlogs命令，清理日志文件"""
     sender_id = event.sender_id
@@ -419,6 +568,9 @@ async def handle_help(event):
 /resume - 恢复自动总结
 /clearcache - 清除缓存
 /cleanlogs [天数] - 清理日志文件（默认保留30天）
+/metrics - 查看运行指标（耗时、LLM、发送队列、熔断状态）
+/trace [last|list|序号] - 查看总结任务各阶段的链路耗时
+/jobs [retry <任务ID>] - 查看总结任务队列与死信，重试死信任务
 
 **黑名单管理命令：**
 /blacklist add <用户ID> [原因] - 添加用户到黑名单
@@ -603,7 +755,7 @@ async def handle_reload(event):
         reload_all_configs, reload_env, reload_config_json,
         reload_prompt, reload_poll_prompt
     )
-    from ..config import CHANNELS, SUMMARY_SCHEDULES, CHANNEL_POLL_SETTINGS, SEND_REPORT_TO_SOURCE, ENABLE_POLL
+    from ..config import get_config_snapshot
     
     # 检查自动监控状态
     watcher = get_global_watcher()
@@ -637,7 +789,7 @@ async def handle_reload(event):
                     reply_msg += f"  投票配置: {info['poll_settings']} 个频道\n"
                     reply_msg += f"  发送到源频道: {info['send_report_to_source']}\n"
                     reply_msg += f"  启用投票: {info['enable_poll']}\n"
-                    reply_msg += f"  调度器已重启: {info['scheduler_restarted']}\n"
+                    reply_msg += f"  定时任务调整: {info['scheduler_changes']}\n"
             
             if 'prompt' in details:
                 prompt_info = details['prompt']
@@ -678,14 +830,15 @@ async def handle_reload(event):
             result = reload_config_json()
             
             if result.success:
+                snapshot = get_config_snapshot()
                 reply_msg = f"✅ 配置文件重载成功\n\n"
                 reply_msg += f"📊 **当前配置状态**\n\n"
-                reply_msg += f"频道列表: {len(CHANNELS)} 个\n"
-                reply_msg += f"总结时间配置: {len(SUMMARY_SCHEDULES)} 个频道\n"
-                reply_msg += f"投票配置: {len(CHANNEL_POLL_SETTINGS)} 个频道\n"
-                reply_msg += f"发送到源频道: {SEND_REPORT_TO_SOURCE}\n"
-                reply_msg += f"启用投票: {ENABLE_POLL}\n"
-                reply_msg += f"调度器已重启: {result.details.get('scheduler_restarted', False)}\n"
+                reply_msg += f"频道列表: {len(snapshot.channels)} 个\n"
+                reply_msg += f"总结时间配置: {len(snapshot.summary_schedules)} 个频道\n"
+                reply_msg += f"投票配置: {len(snapshot.channel_poll_settings)} 个频道\n"
+                reply_msg += f"发送到源频道: {snapshot.send_report_to_source}\n"
+                reply_msg += f"启用投票: {snapshot.enable_poll}\n"
+                reply_msg += f"定时任务调整: {result.details.get('scheduler_changes', '无变化')}\n"
                 reply_msg += f"\n{watcher_status}"
                 logger.info(f"执行命令 {command} 成功")
                 await event.reply(reply_msg)
@@ -18,7 +18,13 @@
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
 import os
+import copy
+import json
 import logging
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
 from dotenv import load_dotenv
 from .config_validators import ScheduleValidator, LegacyScheduleValidator
 
@@ -65,11 +71,22 @@ CONFIG_FILE = os.path.join(DATA_DIR, "config", "config.json")
 RESTART_FLAG_FILE = os.path.join(DATA_DIR, "temp", "restart_flag")
 SHUTDOWN_FLAG_FILE = os.path.join(DATA_DIR, "temp", "shutdown_flag")
 LAST_SUMMARY_FILE = os.path.join(DATA_DIR, "data", "last_summary_time.json")
+ENTITY_CACHE_FILE = os.path.join(DATA_DIR, "data", "entity_cache.json")
+TRACE_FILE = os.path.join(DATA_DIR, "data", "traces.jsonl")
 
 # 会话文件路径
 SESSION_PATH = os.path.join(DATA_DIR, "sessions", "bot_session")
 SESSION_NAME_PATH = os.path.join(DATA_DIR, "sessions", "session_name")
 
+# 工作进程标识（python main.py --worker 启动时必须设置），同时运行的工作进程各不相同
+WORKER_ID = os.getenv('WORKER_ID', '').strip()
+
+# 工作进程使用自己的会话文件（bot_session_<WORKER_ID>、session_name_<WORKER_ID>），
+# Telethon 会话是 SQLite 文件，多个进程同时打开同一个会话会互相锁住
+if WORKER_ID:
+    SESSION_PATH = f"{SESSION_PATH}_{WORKER_ID}"
+    SESSION_NAME_PATH = f"{SESSION_NAME_PATH}_{WORKER_ID}"
+
 # 数据库文件路径
 DATABASE_PATH = os.path.join(DATA_DIR, "database", "summaries.db")
 
@@ -77,6 +94,9 @@ DATABASE_PATH = os.path.join(DATA_DIR, "database", "summaries.db")
 # 避免频繁调用GetFullChannelRequest,提升性能
 LINKED_CHAT_CACHE = {}
 
+# 频道实体缓存有效期（小时），过期后重新解析频道实体
+ENTITY_CACHE_TTL_HOURS = float(os.getenv('ENTITY_CACHE_TTL_HOURS', '24'))
+
 # 默认提示词
 DEFAULT_PROMPT = "请总结以下 Telegram 消息，提取核心要点并列出重要消息的链接：\n\n"
 
@@ -165,6 +185,175 @@ logger.info(f"黑名单检测阈值: {BLACKLIST_THRESHOLD_COUNT} 次")
 BLACKLIST_THRESHOLD_HOURS = int(os.getenv('BLACKLIST_THRESHOLD_HOURS', '1'))
 logger.info(f"黑名单检测时间窗口: {BLACKLIST_THRESHOLD_HOURS} 小时")
 
+# ==================== 发送限流配置 ====================
+
+# 全局发送速率（条/秒），Telegram 对机器人的全局限制约为 30 条/秒
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '25'))
+
+# 私聊发送速率（条/秒），Telegram 建议单个私聊不超过 1 条/秒
+SEND_PRIVATE_CHAT_RATE = float(os.getenv('SEND_PRIVATE_CHAT_RATE', '1'))
+
+# 群组/频道发送速率（条/分钟），Telegram 限制单个群组约 20 条/分钟
+SEND_GROUP_CHAT_RATE_PER_MINUTE = float(os.getenv('SEND_GROUP_CHAT_RATE_PER_MINUTE', '20'))
+
+# 单个聊天允许的突发发送条数
+SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', '3'))
+
+# 遇到 FloodWait 时愿意等待的最长秒数，超过则直接放弃本次发送
+SEND_FLOOD_WAIT_MAX_SECONDS = int(os.getenv('SEND_FLOOD_WAIT_MAX_SECONDS', '300'))
+logger.info(f"发送限流配置: 全局 {SEND_GLOBAL_RATE} 条/秒，私聊 {SEND_PRIVATE_CHAT_RATE} 条/秒，"
+            f"群组 {SEND_GROUP_CHAT_RATE_PER_MINUTE} 条/分钟，突发 {SEND_CHAT_BURST} 条")
+
+# ==================== AI 请求配置 ====================
+
+# 是否在一次 AI 请求中同时生成总结和投票（解析失败时自动回退为两次请求）
+COMBINED_POLL_GENERATION = os.getenv('COMBINED_POLL_GENERATION', 'false').lower() == 'true'
+logger.info(f"总结与投票合并生成: {'启用' if COMBINED_POLL_GENERATION else '禁用'}")
+
+# 手动总结时是否流式生成，并逐步更新占位消息（不支持流式的接口会自动回退）
+SUMMARY_STREAMING_ENABLED = os.getenv('SUMMARY_STREAMING_ENABLED', 'false').lower() == 'true'
+
+# 流式生成时更新占位消息的最小间隔（秒），避免触发编辑频率限制
+STREAM_EDIT_INTERVAL_SECONDS = float(os.getenv('STREAM_EDIT_INTERVAL_SECONDS', '2'))
+
+# ==================== 多端点 LLM 路由配置 ====================
+
+# 额外的 OpenAI 兼容端点列表（JSON数组），每项包含 name、base_url、api_key、model
+# 未配置时仅使用 LLM_BASE_URL / LLM_MODEL 对应的单个端点
+LLM_ENDPOINTS = []
+_llm_endpoints_raw = os.getenv('LLM_ENDPOINTS', '').strip()
+if _llm_endpoints_raw:
+    try:
+        LLM_ENDPOINTS = json.loads(_llm_endpoints_raw)
+        if not isinstance(LLM_ENDPOINTS, list):
+            raise ValueError("LLM_ENDPOINTS 必须是JSON数组")
+    except ValueError as e:
+        logger.error(f"解析 LLM_ENDPOINTS 失败，将只使用默认端点: {type(e).__name__}: {e}")
+        LLM_ENDPOINTS = []
+
+# 是否启用对冲请求：首选端点超过其 p95 延迟仍未返回时，向次优端点发送重复请求
+LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+
+# 延迟样本不足以计算 p95 时使用的对冲等待秒数
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv('LLM_HEDGE_DELAY_SECONDS', '60'))
+logger.info(f"LLM路由: 额外端点 {len(LLM_ENDPOINTS)} 个，对冲请求{'启用' if LLM_HEDGE_ENABLED else '禁用'}")
+
+# ==================== 增量总结配置 ====================
+
+# 是否启用增量总结：平时定期生成阶段性摘要，定时总结时合并摘要
+INCREMENTAL_SUMMARY_ENABLED = os.getenv('INCREMENTAL_SUMMARY_ENABLED', 'false').lower() == 'true'
+
+# 生成阶段性摘要的间隔（小时）
+INCREMENTAL_INTERVAL_HOURS = float(os.getenv('INCREMENTAL_INTERVAL_HOURS', '24'))
+
+# 单个阶段性摘要最多包含的消息数，超过时拆分为多个摘要
+INCREMENTAL_CHUNK_MESSAGES = int(os.getenv('INCREMENTAL_CHUNK_MESSAGES', '200'))
+logger.info(f"增量总结: {'启用' if INCREMENTAL_SUMMARY_ENABLED else '禁用'}"
+            f"（间隔 {INCREMENTAL_INTERVAL_HOURS} 小时，每段最多 {INCREMENTAL_CHUNK_MESSAGES} 条消息）")
+
+# ==================== 定时任务持久化配置 ====================
+
+# 是否把定时总结任务保存到 SQLite 数据库，重启后保留下次运行时间
+SCHEDULER_PERSISTENT_JOBS = os.getenv('SCHEDULER_PERSISTENT_JOBS', 'true').lower() == 'true'
+
+# 任务错过预定时间后仍允许补跑的宽限秒数
+SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv('SCHEDULER_MISFIRE_GRACE_SECONDS', '3600'))
+
+# 同一任务错过多次时是否只补跑一次
+SCHEDULER_COALESCE = os.getenv('SCHEDULER_COALESCE', 'true').lower() == 'true'
+
+# 启动时是否补跑超期未执行的频道总结
+CATCHUP_ENABLED = os.getenv('CATCHUP_ENABLED', 'true').lower() == 'true'
+
+# 启动补跑只检查最近多少小时内的预定时间
+CATCHUP_WINDOW_HOURS = float(os.getenv('CATCHUP_WINDOW_HOURS', '48'))
+
+# 启动补跑时最多同时执行的频道总结数
+CATCHUP_MAX_CONCURRENCY = int(os.getenv('CATCHUP_MAX_CONCURRENCY', '2'))
+logger.info(f"定时任务持久化: {'启用' if SCHEDULER_PERSISTENT_JOBS else '禁用'}"
+            f"（宽限 {SCHEDULER_MISFIRE_GRACE_SECONDS} 秒，合并补跑{'启用' if SCHEDULER_COALESCE else '禁用'}），"
+            f"启动补跑{'启用' if CATCHUP_ENABLED else '禁用'}（最近 {CATCHUP_WINDOW_HOURS} 小时，并发 {CATCHUP_MAX_CONCURRENCY}）")
+
+# ==================== 总结任务准入控制配置 ====================
+
+# 全局同时执行的总结任务数上限（定时、补跑共享）
+SUMMARY_MAX_CONCURRENCY = int(os.getenv('SUMMARY_MAX_CONCURRENCY', '2'))
+
+# 定时总结的错峰范围（秒）：每个频道按哈希固定延迟 0~该值 秒后再排队
+SUMMARY_JITTER_SECONDS = float(os.getenv('SUMMARY_JITTER_SECONDS', '300'))
+
+# 定时总结的截止时间（秒）：从触发起计算，排队时截止时间早的先执行
+SUMMARY_DEADLINE_SECONDS = float(os.getenv('SUMMARY_DEADLINE_SECONDS', '3600'))
+logger.info(f"总结任务准入控制: 并发上限 {SUMMARY_MAX_CONCURRENCY}，错峰 {SUMMARY_JITTER_SECONDS} 秒，"
+            f"截止时间 {SUMMARY_DEADLINE_SECONDS} 秒")
+
+# ==================== 总结任务队列配置 ====================
+
+# 单个总结任务最多尝试次数，达到后进入死信，可用 /jobs 查看和重试
+SUMMARY_JOB_MAX_ATTEMPTS = int(os.getenv('SUMMARY_JOB_MAX_ATTEMPTS', '3'))
+logger.info(f"总结任务队列: 最多尝试 {SUMMARY_JOB_MAX_ATTEMPTS} 次")
+
+# ==================== 发送队列配置 ====================
+
+# 发送队列（outbox）重试间隔（秒）：生成的总结先存库再发送，发送失败的记录按该间隔重新投递
+OUTBOX_RETRY_INTERVAL_SECONDS = int(os.getenv('OUTBOX_RETRY_INTERVAL_SECONDS', '300'))
+
+# 单条总结最多投递次数，达到后标记为发送失败，内容仍保留在数据库中
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+logger.info(f"发送队列: 每 {OUTBOX_RETRY_INTERVAL_SECONDS} 秒重试，最多投递 {OUTBOX_MAX_ATTEMPTS} 次")
+
+# ==================== 多进程分片配置 ====================
+
+# 频道租约有效期（秒）：执行总结的进程每隔 1/3 有效期续约一次，
+# 进程崩溃后租约过期，其他进程会接手该频道未完成的总结任务
+LEASE_TTL_SECONDS = int(os.getenv('LEASE_TTL_SECONDS', '120'))
+logger.info(f"频道租约: 有效期 {LEASE_TTL_SECONDS} 秒{'，工作进程 ' + WORKER_ID if WORKER_ID else ''}")
+
+# ==================== 读取账号池配置 ====================
+
+# 用于抓取频道历史消息的用户会话名称（逗号分隔，会话文件位于 data/sessions/），
+# 各频道按一致性哈希固定分配到其中一个会话，某个会话被 FloodWait 限流时临时改用下一个会话。
+# 留空时只使用 session_name 会话；工作进程同样会在名称后追加 _<WORKER_ID>
+READER_SESSIONS = [name.strip() for name in os.getenv('READER_SESSIONS', '').split(',') if name.strip()]
+READER_SESSION_PATHS = [
+    os.path.join(DATA_DIR, "sessions", f"{name}_{WORKER_ID}" if WORKER_ID else name)
+    for name in READER_SESSIONS
+] or [SESSION_NAME_PATH]
+logger.info(f"读取账号池: {len(READER_SESSION_PATHS)} 个会话")
+
+# 定时总结抓取前先预检：只读取频道最新的几条消息，自上次总结以来没有新消息（报告消息除外）时跳过整段抓取
+FETCH_PROBE_ENABLED = os.getenv('FETCH_PROBE_ENABLED', 'true').lower() == 'true'
+logger.info(f"抓取前预检: {'启用' if FETCH_PROBE_ENABLED else '禁用'}")
+
+# ==================== 消息预取配置 ====================
+
+# 是否在定时总结前预取频道消息到本地缓存，定时触发时只需抓取最后几分钟的增量
+# （增量总结模式下不生效，该模式已预先处理消息）
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+
+# 在定时总结触发前多少分钟开始预取
+PREFETCH_LEAD_MINUTES = int(os.getenv('PREFETCH_LEAD_MINUTES', '15'))
+logger.info(f"消息预取: {'启用，定时总结前 ' + str(PREFETCH_LEAD_MINUTES) + ' 分钟' if PREFETCH_ENABLED else '禁用'}")
+
+# ==================== 运行指标配置 ====================
+
+# 是否启动本地 HTTP 指标端点（Prometheus 文本格式，路径 /metrics）
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+
+# 指标端点监听地址与端口
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+logger.info(f"指标端点: {'启用 ' + METRICS_HOST + ':' + str(METRICS_PORT) if METRICS_ENABLED else '禁用'}")
+
+# ==================== 链路追踪配置 ====================
+
+# 是否记录总结任务各阶段的链路追踪（写入 data/data/traces.jsonl）
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+
+# 是否以 OTLP/JSON 格式写入链路文件（便于导入 OpenTelemetry 工具），否则使用简化格式
+TRACE_OTLP_FORMAT = os.getenv('TRACE_OTLP_FORMAT', 'false').lower() == 'true'
+logger.info(f"链路追踪: {'启用' if TRACING_ENABLED else '禁用'}{'（OTLP格式）' if TRACING_ENABLED and TRACE_OTLP_FORMAT else ''}")
+
 # ==================== 配置验证 ====================
 
 def validate_config():
@@ -202,7 +391,70 @@ def validate_config():
             errors.append("BLACKLIST_THRESHOLD_COUNT 必须大于0")
         if BLACKLIST_THRESHOLD_HOURS < 1:
             errors.append("BLACKLIST_THRESHOLD_HOURS 必须大于0")
-    
+
+    # 验证发送限流配置
+    if SEND_GLOBAL_RATE <= 0 or SEND_PRIVATE_CHAT_RATE <= 0 or SEND_GROUP_CHAT_RATE_PER_MINUTE <= 0:
+        errors.append("SEND_GLOBAL_RATE、SEND_PRIVATE_CHAT_RATE、SEND_GROUP_CHAT_RATE_PER_MINUTE 必须大于0")
+    if SEND_CHAT_BURST < 1:
+        errors.append("SEND_CHAT_BURST 必须大于0")
+
+    # 验证多端点 LLM 路由配置
+    for i, endpoint in enumerate(LLM_ENDPOINTS):
+        if not isinstance(endpoint, dict) or not endpoint.get('base_url') or not endpoint.get('model'):
+            errors.append(f"LLM_ENDPOINTS 第 {i + 1} 项缺少 base_url 或 model")
+    if LLM_HEDGE_DELAY_SECONDS <= 0:
+        errors.append("LLM_HEDGE_DELAY_SECONDS 必须大于0")
+
+    # 验证运行指标配置
+    if METRICS_ENABLED and not 0 < METRICS_PORT < 65536:
+        errors.append("METRICS_PORT 必须在 1-65535 之间")
+
+    # 验证定时任务持久化配置
+    if SCHEDULER_MISFIRE_GRACE_SECONDS < 1:
+        errors.append("SCHEDULER_MISFIRE_GRACE_SECONDS 必须大于0")
+    if CATCHUP_ENABLED:
+        if CATCHUP_WINDOW_HOURS <= 0:
+            errors.append("CATCHUP_WINDOW_HOURS 必须大于0")
+        if CATCHUP_MAX_CONCURRENCY < 1:
+            errors.append("CATCHUP_MAX_CONCURRENCY 必须大于0")
+
+    # 验证总结任务准入控制配置
+    if SUMMARY_MAX_CONCURRENCY < 1:
+        errors.append("SUMMARY_MAX_CONCURRENCY 必须大于0")
+    if SUMMARY_JITTER_SECONDS < 0:
+        errors.append("SUMMARY_JITTER_SECONDS 不能为负数")
+    if SUMMARY_DEADLINE_SECONDS <= SUMMARY_JITTER_SECONDS:
+        errors.append("SUMMARY_DEADLINE_SECONDS 必须大于 SUMMARY_JITTER_SECONDS")
+
+    # 验证总结任务队列配置
+    if SUMMARY_JOB_MAX_ATTEMPTS < 1:
+        errors.append("SUMMARY_JOB_MAX_ATTEMPTS 必须大于0")
+
+    # 验证发送队列配置
+    if OUTBOX_RETRY_INTERVAL_SECONDS <= 0:
+        errors.append("OUTBOX_RETRY_INTERVAL_SECONDS 必须大于0")
+    if OUTBOX_MAX_ATTEMPTS < 1:
+        errors.append("OUTBOX_MAX_ATTEMPTS 必须大于0")
+
+    # 验证多进程分片配置
+    if LEASE_TTL_SECONDS < 10:
+        errors.append("LEASE_TTL_SECONDS 不能小于10")
+
+    # 验证读取账号池配置
+    if len(set(READER_SESSIONS)) != len(READER_SESSIONS):
+        errors.append("READER_SESSIONS 中存在重复的会话名称")
+
+    # 验证消息预取配置
+    if PREFETCH_ENABLED and PREFETCH_LEAD_MINUTES < 1:
+        errors.append("PREFETCH_LEAD_MINUTES 必须大于0")
+
+    # 验证增量总结配置
+    if INCREMENTAL_SUMMARY_ENABLED:
+        if INCREMENTAL_INTERVAL_HOURS <= 0:
+            errors.append("INCREMENTAL_INTERVAL_HOURS 必须大于0")
+        if INCREMENTAL_CHUNK_MESSAGES < 1:
+            errors.append("INCREMENTAL_CHUNK_MESSAGES 必须大于0")
+
     # 记录验证结果
     if errors:
         logger.error(f"配置验证失败，发现 {len(errors)} 个错误:")
@@ -270,36 +522,13 @@ def save_config(config):
         logger.error(f"保存配置到文件 {CONFIG_FILE} 时出错: {type(e).__name__}: {e}", exc_info=True)
 
 def update_module_variables(config):
-    """更新模块变量以匹配配置文件（不包括AI配置）"""
-    global CHANNELS, SEND_REPORT_TO_SOURCE, ENABLE_POLL, SUMMARY_SCHEDULES, CHANNEL_POLL_SETTINGS
-
-    # 更新频道列表
-    config_channels = config.get('channels')
-    if config_channels and isinstance(config_channels, list):
-        CHANNELS = config_channels
-        logger.info(f"已更新内存中的频道列表: {CHANNELS}")
-
-    # 更新是否将报告发送回源频道的配置
-    if 'send_report_to_source' in config:
-        SEND_REPORT_TO_SOURCE = config['send_report_to_source']
-        logger.info(f"已更新内存中的发送报告到源频道的配置: {SEND_REPORT_TO_SOURCE}")
-
-    # 更新是否启用投票功能的配置
-    if 'enable_poll' in config:
-        ENABLE_POLL = config['enable_poll']
-        logger.info(f"已更新内存中的投票功能配置: {ENABLE_POLL}")
-
-    # 更新频道级时间配置
-    summary_schedules_config = config.get('summary_schedules', {})
-    if isinstance(summary_schedules_config, dict):
-        SUMMARY_SCHEDULES = summary_schedules_config
-        logger.info(f"已更新内存中的频道级时间配置: {len(SUMMARY_SCHEDULES)} 个频道")
-
-    # 更新频道级投票配置
-    channel_poll_config = config.get('channel_poll_settings', {})
-    if isinstance(channel_poll_config, dict):
-        CHANNEL_POLL_SETTINGS = channel_poll_config
-        logger.info(f"已更新内存中的频道级投票配置: {len(CHANNEL_POLL_SETTINGS)} 个频道")
+    """根据配置文件内容构建新的配置快照并原子替换（不包括AI配置）"""
+    snapshot = apply_config(config)
+    logger.info(
+        f"已更新内存中的配置: 频道 {len(snapshot.channels)} 个，"
+        f"频道级时间配置 {len(snapshot.summary_schedules)} 个，频道级投票配置 {len(snapshot.channel_poll_settings)} 个，"
+        f"发送报告到源频道 {snapshot.send_report_to_source}，投票功能 {snapshot.enable_poll}"
+    )
 
 # 加载配置文件
 logger.info("开始加载配置文件...")
@@ -328,7 +557,7 @@ else:
     LOG_LEVEL_FROM_CONFIG = None
 
 # 确定最终日志级别（配置文件优先于环境变量）
-final_log_level_str = LOG_LEVEL_FROM_CONFIG or LOG_LEVEL_FROM_ENV
+final_log_level_str = LOG_LEVEL_FROM_CONFIG or LOG_LEVEL_FROM_ENV or 'INFO'
 final_log_level = get_log_level(final_log_level_str)
 
 # 获取根日志记录器并设置级别
@@ -418,18 +647,7 @@ def get_channel_schedule(channel):
     Returns:
         dict: 标准化的配置字典，包含 frequency, days, hour, minute
     """
-    if channel in SUMMARY_SCHEDULES:
-        schedule = SUMMARY_SCHEDULES[channel]
-        # 标准化配置（处理向后兼容）
-        return normalize_schedule_config(schedule)
-    else:
-        # 返回默认配置
-        return {
-            'frequency': 'weekly',
-            'days': [DEFAULT_SUMMARY_DAY],
-            'hour': DEFAULT_SUMMARY_HOUR,
-            'minute': DEFAULT_SUMMARY_MINUTE
-        }
+    return copy.deepcopy(dict(get_config_snapshot().channel(channel).schedule))
 
 # 设置频道的时间配置
 def set_channel_schedule(channel, day=None, hour=None, minute=None):
@@ -697,18 +915,7 @@ def get_channel_poll_config(channel):
             - enabled: 是否启用投票（None 表示使用全局配置）
             - send_to_channel: true=频道模式, false=讨论组模式
     """
-    if channel in CHANNEL_POLL_SETTINGS:
-        config = CHANNEL_POLL_SETTINGS[channel]
-        return {
-            'enabled': config.get('enabled', None),  # None 表示使用全局配置
-            'send_to_channel': config.get('send_to_channel', False)  # 默认讨论组模式
-        }
-    else:
-        # 没有独立配置，返回默认配置
-        return {
-            'enabled': None,  # 使用全局 ENABLE_POLL
-            'send_to_channel': False  # 默认讨论组模式
-        }
+    return dict(get_config_snapshot().channel(channel).poll_config)
 
 
 def set_channel_poll_config(channel, enabled=None, send_to_channel=None):
@@ -813,6 +1020,163 @@ def delete_channel_poll_config(channel):
         return False
 
 
+# ==================== 配置快照 ====================
+
+@dataclass(frozen=True)
+class ChannelSettings:
+    """单个频道预先计算好的配置"""
+    schedule: Mapping[str, Any]
+    cron_trigger: Mapping[str, Any]
+    poll_config: Mapping[str, Any]
+    poll_enabled: bool
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """config.json 的不可变快照
+
+    配置变更时构建新快照并整体替换引用，读取方通过 get_config_snapshot() 以 O(1) 取得当前快照，
+    同一个任务内持有的快照不会被中途修改。频道的时间配置、cron 触发器参数和投票配置在构建时预先计算。
+    """
+    version: int
+    channels: Tuple[str, ...]
+    send_report_to_source: bool
+    enable_poll: bool
+    summary_schedules: Mapping[str, Any]
+    channel_poll_settings: Mapping[str, Any]
+    channel_settings: Mapping[str, ChannelSettings]
+
+    def channel(self, channel: str) -> ChannelSettings:
+        """获取频道配置；不在频道列表中的频道按本快照即时计算"""
+        settings = self.channel_settings.get(channel)
+        if settings is None:
+            settings = _build_channel_settings(
+                channel, self.summary_schedules, self.channel_poll_settings, self.enable_poll
+            )
+        return settings
+
+
+def _build_channel_settings(channel, summary_schedules, channel_poll_settings, enable_poll) -> ChannelSettings:
+    """计算单个频道的标准化时间配置、cron 触发器参数和投票配置"""
+    if channel in summary_schedules:
+        schedule = normalize_schedule_config(copy.deepcopy(summary_schedules[channel]))
+    else:
+        schedule = {
+            'frequency': 'weekly',
+            'days': [DEFAULT_SUMMARY_DAY],
+            'hour': DEFAULT_SUMMARY_HOUR,
+            'minute': DEFAULT_SUMMARY_MINUTE
+        }
+
+    channel_poll = channel_poll_settings.get(channel)
+    poll_config = {
+        'enabled': channel_poll.get('enabled', None) if channel_poll else None,  # None 表示使用全局配置
+        'send_to_channel': channel_poll.get('send_to_channel', False) if channel_poll else False  # 默认讨论组模式
+    }
+    poll_enabled = enable_poll if poll_config['enabled'] is None else poll_config['enabled']
+
+    return ChannelSettings(
+        schedule=MappingProxyType(schedule),
+        cron_trigger=MappingProxyType(build_cron_trigger(schedule)),
+        poll_config=MappingProxyType(poll_config),
+        poll_enabled=bool(poll_enabled)
+    )
+
+
+def build_config_snapshot(config, base: Optional[ConfigSnapshot] = None) -> ConfigSnapshot:
+    """根据配置字典构建新快照
+
+    Args:
+        config: config.json 的内容
+        base: 基准快照，config 中没有出现的配置项沿用基准快照的值
+
+    Returns:
+        ConfigSnapshot: 新快照
+    """
+    channels = config.get('channels')
+    if not isinstance(channels, list):
+        channels = list(base.channels) if base else []
+
+    summary_schedules = config.get('summary_schedules')
+    if not isinstance(summary_schedules, dict):
+        summary_schedules = dict(base.summary_schedules) if base else {}
+
+    channel_poll_settings = config.get('channel_poll_settings')
+    if not isinstance(channel_poll_settings, dict):
+        channel_poll_settings = dict(base.channel_poll_settings) if base else {}
+
+    send_report_to_source = config.get('send_report_to_source', base.send_report_to_source if base else True)
+    enable_poll = config.get('enable_poll', base.enable_poll if base else True)
+
+    summary_schedules = copy.deepcopy(summary_schedules)
+    channel_poll_settings = copy.deepcopy(channel_poll_settings)
+    channel_settings = {
+        channel: _build_channel_settings(channel, summary_schedules, channel_poll_settings, enable_poll)
+        for channel in channels
+    }
+
+    return ConfigSnapshot(
+        version=base.version + 1 if base else 1,
+        channels=tuple(channels),
+        send_report_to_source=send_report_to_source,
+        enable_poll=enable_poll,
+        summary_schedules=MappingProxyType(summary_schedules),
+        channel_poll_settings=MappingProxyType(channel_poll_settings),
+        channel_settings=MappingProxyType(channel_settings)
+    )
+
+
+def get_config_snapshot() -> ConfigSnapshot:
+    """获取当前配置快照（只读取一次引用，调用方应在一次任务中复用同一个快照）"""
+    return _config_snapshot
+
+
+def swap_config_snapshot(snapshot: ConfigSnapshot) -> ConfigSnapshot:
+    """原子替换当前配置快照
+
+    旧的模块级变量（CHANNELS 等）同步更新，兼容仍直接读取它们的代码。
+
+    Args:
+        snapshot: 新快照
+
+    Returns:
+        ConfigSnapshot: 被替换的旧快照
+    """
+    global _config_snapshot, CHANNELS, SEND_REPORT_TO_SOURCE, ENABLE_POLL, SUMMARY_SCHEDULES, CHANNEL_POLL_SETTINGS
+
+    with _config_snapshot_lock:
+        previous = _config_snapshot
+        _config_snapshot = snapshot
+
+    CHANNELS = list(snapshot.channels)
+    SEND_REPORT_TO_SOURCE = snapshot.send_report_to_source
+    ENABLE_POLL = snapshot.enable_poll
+    SUMMARY_SCHEDULES = dict(snapshot.summary_schedules)
+    CHANNEL_POLL_SETTINGS = dict(snapshot.channel_poll_settings)
+
+    logger.info(f"配置快照已更新至版本 {snapshot.version}: {len(snapshot.channels)} 个频道")
+    return previous
+
+
+def apply_config(config) -> ConfigSnapshot:
+    """以当前快照为基准应用配置字典并替换快照
+
+    Args:
+        config: config.json 的内容（可以只包含部分配置项）
+
+    Returns:
+        ConfigSnapshot: 新快照
+    """
+    with _config_snapshot_lock:
+        snapshot = build_config_snapshot(config, base=_config_snapshot)
+        swap_config_snapshot(snapshot)
+    return snapshot
+
+
+_config_snapshot_lock = threading.RLock()
+_config_snapshot = build_config_snapshot(config or {})
+
+
 # 投票重新生成数据存储
 POLL_REGENERATIONS_FILE = os.path.join(DATA_DIR, "data", "poll_regenerations.json")
 
@@ -961,8 +1325,7 @@ def _log_migration_results(migrated_count, skipped_count):
 
 # ==================== 初始化目录结构 ====================
 
-# 在模块加载时确保目录结构存在
-ensure_data_directories()
+# 目录结构由程序入口在启动时调用 ensure_data_directories() 创建，导入本模块不再产生文件系统副作用
 
 
 def load_poll_regenerations():
@@ -1133,9 +1496,13 @@ def cache_discussion_group_id(channel_url, discussion_group_id):
 def clear_discussion_group_cache(channel_url=None):
     """清除讨论组ID缓存
 
+    同时使频道实体缓存失效，下次使用时重新解析。
+
     Args:
         channel_url: 可选,指定要清除的频道URL。如果为None则清除所有缓存
     """
+    from .telegram.entity_cache import get_entity_cache
+
     if channel_url:
         if channel_url in LINKED_CHAT_CACHE:
             del LINKED_CHAT_CACHE[channel_url]
@@ -1144,11 +1511,13 @@ def clear_discussion_group_cache(channel_url=None):
         LINKED_CHAT_CACHE.clear()
         logger.info("已清除所有讨论组ID缓存")
 
+    get_entity_cache().invalidate(channel_url)
+
 
 async def get_discussion_group_id_cached(client, channel_url):
     """获取频道的讨论组ID(带缓存)
 
-    首先尝试从缓存获取,如果缓存不存在则从Telegram获取并缓存结果
+    首先尝试从内存缓存获取,未命中时由频道实体缓存解析(实体缓存会持久化到磁盘)
 
     Args:
         client: Telegram客户端实例
@@ -1163,36 +1532,14 @@ async def get_discussion_group_id_cached(client, channel_url):
         logger.debug(f"使用缓存的讨论组ID: {channel_url} -> {cached_id}")
         return cached_id
 
-    # 2. 缓存未命中,从Telegram获取
-    from telethon.tl.functions.channels import GetFullChannelRequest
-
-    try:
-        full_channel = await client.get_entity(channel_url)
+    # 2. 缓存未命中,通过频道实体缓存获取
+    from .telegram.entity_cache import get_entity_cache
 
-        # 获取讨论组ID
-        discussion_group_id = None
-        if hasattr(full_channel, 'linked_chat_id') and full_channel.linked_chat_id:
-            discussion_group_id = full_channel.linked_chat_id
-        else:
-            # 尝试使用GetFullChannelRequest
-            logger.debug(f"频道 {channel_url} 没有linked_chat_id属性,尝试GetFullChannelRequest")
-            full_info = await client(GetFullChannelRequest(full_channel))
-            if hasattr(full_info.full_chat, 'linked_chat_id') and full_info.full_chat.linked_chat_id:
-                discussion_group_id = full_info.full_chat.linked_chat_id
-
-        if discussion_group_id:
-            # 转换为超级群组格式
-            if discussion_group_id > 0:
-                discussion_group_id = -1000000000000 - discussion_group_id
-
-            # 缓存结果
-            cache_discussion_group_id(channel_url, discussion_group_id)
-            logger.info(f"已获取并缓存讨论组ID: {channel_url} -> {discussion_group_id}")
-            return discussion_group_id
-        else:
-            logger.warning(f"频道 {channel_url} 没有绑定讨论组")
-            return None
+    discussion_group_id = await get_entity_cache().get_linked_chat_id(client, channel_url)
+    if discussion_group_id:
+        cache_discussion_group_id(channel_url, discussion_group_id)
+        logger.info(f"已获取并缓存讨论组ID: {channel_url} -> {discussion_group_id}")
+        return discussion_group_id
 
-    except Exception as e:
-        logger.error(f"获取频道 {channel_url} 的讨论组ID失败: {e}")
-        return None
+    logger.warning(f"频道 {channel_url} 没有绑定讨论组")
+    return None
@@ -185,11 +185,10 @@ def build_success_notification(result: ReloadResult, is_auto_reload: bool = Fals
             new_value = new_values.get('enable_poll', False)
             message += f"- {format_bool_diff(old_value, new_value, '启用投票')}\n"
         
-        # 调度器重启状态
-        if 'scheduler_restarted' in new_values:
-            scheduler_restarted = new_values.get('scheduler_restarted', False)
-            if scheduler_restarted:
-                message += "- 调度器已重启\n"
+        # 定时任务调整情况
+        scheduler_changes = new_values.get('scheduler_changes')
+        if scheduler_changes and scheduler_changes != '无变化':
+            message += f"- 定时任务调整: {scheduler_changes}\n"
         
         message += "\n"
     
@@ -32,8 +32,7 @@ from dataclasses import dataclass, field
 from .config_watcher import ReloadResult
 from .config import (
     CONFIG_FILE, PROMPT_FILE, POLL_PROMPT_FILE,
-    CHANNELS, SEND_REPORT_TO_SOURCE, ENABLE_POLL,
-    SUMMARY_SCHEDULES, CHANNEL_POLL_SETTINGS,
+    ConfigSnapshot, get_config_snapshot, apply_config,
     load_config, save_config, update_module_variables,
     logger
 )
@@ -193,14 +192,9 @@ class ConfigReloader:
             ReloadResult: 重载结果
         """
         try:
-            # 保存旧配置值用于对比
-            old_values = {
-                'channels': len(CHANNELS),
-                'summary_schedules': len(SUMMARY_SCHEDULES),
-                'poll_settings': len(CHANNEL_POLL_SETTINGS),
-                'send_report_to_source': SEND_REPORT_TO_SOURCE,
-                'enable_poll': ENABLE_POLL
-            }
+            # 保存旧配置快照用于对比
+            previous_snapshot = get_config_snapshot()
+            old_values = self._snapshot_summary(previous_snapshot)
             
             # 1. 读取并验证新配置
             new_config = self._load_and_validate_config_json()
@@ -215,58 +209,18 @@ class ConfigReloader:
                     error_location='config.json'
                 )
             
-            # 2. 原子化更新全局变量
-            self._apply_config_json_atomically(new_config)
-            
-            # 3. 重新加载调度器（如果需要）
-            # 检查是否需要重启调度器
-            needs_restart = (
-                'channels' in new_config or
-                'summary_schedules' in new_config
-            )
+            # 2. 构建新配置快照并原子替换
+            snapshot = self._apply_config_json_atomically(new_config)
             
-            if needs_restart:
-                try:
-                    # 尝试获取运行中的事件循环
-                    loop = asyncio.get_running_loop()
-                    # 在后台任务中异步重启调度器，避免阻塞
-                    loop.create_task(self._restart_scheduler_if_needed(new_config))
-                    scheduler_restarted = True
-                    logger.info("调度器重启任务已提交（后台异步执行）")
-                except RuntimeError:
-                    # 当前线程没有事件循环（Watchdog 线程）
-                    # 尝试使用主事件循环的线程安全方法
-                    if self._main_loop is not None:
-                        try:
-                            # 创建协程函数，避免 lambda 闭包问题
-                            async def _restart_scheduler():
-                                await self._restart_scheduler_if_needed(new_config)
-                            
-                            # 使用线程安全的方式将任务投递到主循环
-                            self._main_loop.call_soon_threadsafe(
-                                lambda: asyncio.create_task(_restart_scheduler())
-                            )
-                            scheduler_restarted = True
-                            logger.info("已通过线程安全方式投递调度器重启任务到主循环")
-                        except Exception as e:
-                            logger.error(f"使用 call_soon_threadsafe 重启调度器失败: {type(e).__name__}: {e}")
-                            scheduler_restarted = False
-                    else:
-                        # 没有保存主循环引用，无法重启调度器
-                        logger.warning("没有运行中的事件循环且未保存主循环引用，跳过调度器重启")
-                        scheduler_restarted = False
-            else:
-                scheduler_restarted = False
+            # 3. 按定时任务当前对应的快照与新快照的差异增量调整定时任务（只处理变化的频道）
+            #    机器人命令写入 config.json 时全局快照已提前替换，不能用 previous_snapshot 对比
+            from .scheduler import get_scheduled_snapshot
+            scheduled_snapshot = get_scheduled_snapshot() or previous_snapshot
+            scheduler_changes = self._reconcile_scheduler(scheduled_snapshot, snapshot)
             
             # 4. 构建详细信息
-            details = {
-                'channels': len(CHANNELS),
-                'summary_schedules': len(SUMMARY_SCHEDULES),
-                'poll_settings': len(CHANNEL_POLL_SETTINGS),
-                'send_report_to_source': SEND_REPORT_TO_SOURCE,
-                'enable_poll': ENABLE_POLL,
-                'scheduler_restarted': scheduler_restarted
-            }
+            details = self._snapshot_summary(snapshot)
+            details['scheduler_changes'] = scheduler_changes
             
             logger.info(f"JSON配置重载成功: {details}")
             
@@ -374,71 +328,59 @@ class ConfigReloader:
         
         return errors
     
-    def _apply_config_json_atomically(self, new_config: Dict):
-        """原子化应用JSON配置（原地更新全局变量）
+    def _apply_config_json_atomically(self, new_config: Dict) -> ConfigSnapshot:
+        """原子化应用JSON配置：以当前快照为基准构建新快照后整体替换
         
-        Args:
-            new_config: 新的配置字典
-        """
-        # 使用全局声明原地更新
-        global CHANNELS, SEND_REPORT_TO_SOURCE, ENABLE_POLL
-        global SUMMARY_SCHEDULES, CHANNEL_POLL_SETTINGS
-        
-        # 更新频道列表（原地更新）
-        if 'channels' in new_config:
-            CHANNELS.clear()
-            CHANNELS.extend(new_config['channels'])
-            logger.info(f"已更新频道列表: {CHANNELS}")
-        
-        # 更新发送报告配置
-        if 'send_report_to_source' in new_config:
-            SEND_REPORT_TO_SOURCE = new_config['send_report_to_source']
-            logger.info(f"已更新发送报告配置: {SEND_REPORT_TO_SOURCE}")
-        
-        # 更新投票功能配置
-        if 'enable_poll' in new_config:
-            ENABLE_POLL = new_config['enable_poll']
-            logger.info(f"已更新投票功能配置: {ENABLE_POLL}")
-        
-        # 更新总结时间配置（原地更新）
-        if 'summary_schedules' in new_config:
-            SUMMARY_SCHEDULES.clear()
-            SUMMARY_SCHEDULES.update(new_config['summary_schedules'])
-            logger.info(f"已更新总结时间配置: {len(SUMMARY_SCHEDULES)} 个频道")
-        
-        # 更新投票配置（原地更新）
-        if 'channel_poll_settings' in new_config:
-            CHANNEL_POLL_SETTINGS.clear()
-            CHANNEL_POLL_SETTINGS.update(new_config['channel_poll_settings'])
-            logger.info(f"已更新投票配置: {len(CHANNEL_POLL_SETTINGS)} 个频道")
-    
-    async def _restart_scheduler_if_needed(self, new_config: Dict) -> bool:
-        """根据配置变更决定是否需要重启调度器
+        正在执行的任务继续使用它们已取得的旧快照，新任务读取到的是新快照。
         
         Args:
             new_config: 新的配置字典
             
         Returns:
-            是否重启了调度器
+            新的配置快照
         """
-        # 检查是否有需要重启调度器的配置变更
-        needs_restart = (
-            'channels' in new_config or
-            'summary_schedules' in new_config
+        snapshot = apply_config(new_config)
+        logger.info(
+            f"已应用新配置快照 v{snapshot.version}: 频道 {len(snapshot.channels)} 个，"
+            f"总结时间配置 {len(snapshot.summary_schedules)} 个频道，投票配置 {len(snapshot.channel_poll_settings)} 个频道"
         )
+        return snapshot
+    
+    @staticmethod
+    def _snapshot_summary(snapshot: ConfigSnapshot) -> Dict:
+        """提取配置快照的概要，用于重载结果对比"""
+        return {
+            'channels': len(snapshot.channels),
+            'summary_schedules': len(snapshot.summary_schedules),
+            'poll_settings': len(snapshot.channel_poll_settings),
+            'send_report_to_source': snapshot.send_report_to_source,
+            'enable_poll': snapshot.enable_poll
+        }
+    
+    def _reconcile_scheduler(self, old_snapshot: ConfigSnapshot, new_snapshot: ConfigSnapshot) -> str:
+        """根据新旧配置快照增量调整定时任务
         
-        if not needs_restart:
-            return False
+        Args:
+            old_snapshot: 定时任务当前对应的配置快照
+            new_snapshot: 重载后的配置快照
+            
+        Returns:
+            变更概要文本
+        """
+        if old_snapshot.channel_settings == new_snapshot.channel_settings:
+            return '无变化'
         
         try:
-            from .scheduler import graceful_restart_scheduler
-            await graceful_restart_scheduler()
-            logger.info("调度器已重启")
-            return True
+            from .scheduler import reconcile_channel_jobs
+            changes = reconcile_channel_jobs(old_snapshot, new_snapshot)
+            if changes is None:
+                return '调度器未运行'
+            return (f"新增 {changes['added']}，移除 {changes['removed']}，"
+                    f"改期 {changes['rescheduled']}")
             
         except Exception as e:
-            logger.error(f"重启调度器失败: {type(e).__name__}: {e}", exc_info=True)
-            return False
+            logger.error(f"调整定时任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return f'调整失败: {type(e).__name__}'
     
     def _reload_prompt(self) -> ReloadResult:
         """重载总结提示词（原子化）
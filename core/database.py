@@ -21,6 +21,7 @@ import sqlite3
 import json
 import logging
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 
@@ -28,6 +29,12 @@ logger = logging.getLogger(__name__)
 
 # 导入数据库路径配置
 from .config import DATABASE_PATH
+from .metrics import DB_QUERY_DURATION, timed
+
+
+def _timed_query(func):
+    """记录数据库操作耗时，按方法名区分"""
+    return timed(DB_QUERY_DURATION, method=func.__name__)(func)
 
 
 class DatabaseManager:
@@ -53,6 +60,21 @@ class DatabaseManager:
             # 创建总结记录主表
             self._create_summaries_table(cursor)
 
+            # 为旧版数据库的总结记录表补充发送队列字段
+            self._migrate_summaries_outbox_columns(cursor)
+
+            # 创建阶段性摘要表（增量总结模式）
+            self._create_partial_digests_table(cursor)
+
+            # 创建总结任务队列表
+            self._create_summary_jobs_table(cursor)
+
+            # 创建频道租约表（多进程分片）
+            self._create_job_leases_table(cursor)
+
+            # 创建消息预取缓存表
+            self._create_message_cache_tables(cursor)
+
             # 创建索引以提升查询性能
             self._create_indexes(cursor)
 
@@ -92,13 +114,48 @@ class DatabaseManager:
                 summary_type TEXT DEFAULT 'weekly',
                 summary_message_ids TEXT,
                 poll_message_id INTEGER,
-                button_message_id INTEGER
+                button_message_id INTEGER,
+                delivery_status TEXT DEFAULT 'sent',
+                delivery_attempts INTEGER DEFAULT 0,
+                delivery_error TEXT,
+                poll_data TEXT,
+                delivered_at TIMESTAMP
             )
         """)
         
         # 创建黑名单表
         self._create_blacklist_table(cursor)
     
+    # 发送队列相关字段：(列名, 列定义)
+    SUMMARY_OUTBOX_COLUMNS = (
+        ('delivery_status', "TEXT DEFAULT 'sent'"),
+        ('delivery_attempts', 'INTEGER DEFAULT 0'),
+        ('delivery_error', 'TEXT'),
+        ('poll_data', 'TEXT'),
+        ('delivered_at', 'TIMESTAMP'),
+    )
+
+    def _migrate_summaries_outbox_columns(self, cursor):
+        """
+        为总结记录表补充发送队列字段
+
+        旧版本创建的表缺少这些列，已有记录视为已发送（delivery_status 默认 'sent'）。
+
+        Args:
+            cursor: 数据库游标
+        """
+        cursor.execute("PRAGMA table_info(summaries)")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, definition in self.SUMMARY_OUTBOX_COLUMNS:
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE summaries ADD COLUMN {name} {definition}")
+                logger.info(f"总结记录表已添加字段: {name}")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_summaries_delivery_status
+            ON summaries(delivery_status)
+        """)
+
     def _create_blacklist_table(self, cursor):
         """
         创建黑名单表
@@ -130,6 +187,127 @@ class DatabaseManager:
             ON blacklist(added_at DESC)
         """)
 
+    def _create_partial_digests_table(self, cursor):
+        """
+        创建阶段性摘要表
+
+        增量总结模式下，按时间段（或每N条消息）预先生成的摘要存放在此表，
+        定时总结时合并这些摘要生成最终报告。
+
+        Args:
+            cursor: 数据库游标
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS partial_digests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id TEXT NOT NULL,
+                period_start TIMESTAMP NOT NULL,
+                period_end TIMESTAMP NOT NULL,
+                message_count INTEGER DEFAULT 0,
+                digest_text TEXT NOT NULL,
+                last_message_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_partial_digests_channel_period
+            ON partial_digests(channel_id, period_end)
+        """)
+
+    def _create_summary_jobs_table(self, cursor):
+        """
+        创建总结任务队列表
+
+        每次定时总结对应一条记录，state 为最后完成的阶段
+        （pending → fetched → summarised → sent → persisted），
+        status 为 active（进行中）、done（已完成）或 dead（失败次数达到上限，进入死信）。
+        进程崩溃或重启后从 state 记录的阶段继续，不会重复已完成的 AI 调用。
+
+        Args:
+            cursor: 数据库游标
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS summary_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                status TEXT NOT NULL DEFAULT 'active',
+                attempts INTEGER DEFAULT 0,
+                last_error TEXT,
+                window_start TIMESTAMP,
+                window_end TIMESTAMP,
+                message_count INTEGER DEFAULT 0,
+                messages_json TEXT,
+                summary_text TEXT,
+                poll_data TEXT,
+                channel_name TEXT,
+                report_text TEXT,
+                sent_report_ids TEXT,
+                summary_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_summary_jobs_channel_status
+            ON summary_jobs(channel_id, status)
+        """)
+
+    def _create_job_leases_table(self, cursor):
+        """
+        创建频道租约表
+
+        多个进程（机器人主进程与 --worker 工作进程）共用同一个数据库时，
+        执行频道总结前必须先取得该频道的租约，持有者定期续约（expires_at），
+        进程崩溃后租约过期，其他进程可以接手。completed_at 记录最近一次完成时间，
+        用于判断同一次定时触发是否已由其他进程完成。时间均为 Unix 时间戳。
+
+        Args:
+            cursor: 数据库游标
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS job_leases (
+                channel_id TEXT PRIMARY KEY,
+                owner TEXT,
+                acquired_at REAL,
+                expires_at REAL,
+                heartbeat_at REAL,
+                completed_at REAL
+            )
+        """)
+
+    def _create_message_cache_tables(self, cursor):
+        """
+        创建消息预取缓存表
+
+        定时总结前由预取任务把频道的新消息写入 message_cache，
+        message_cache_state 记录每个频道缓存覆盖的起始时间（cached_since）
+        与已抓取到的最大消息ID，定时总结时只需抓取该ID之后的消息。时间均为 Unix 时间戳。
+
+        Args:
+            cursor: 数据库游标
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS message_cache (
+                channel_id TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                posted_at REAL NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (channel_id, message_id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS message_cache_state (
+                channel_id TEXT PRIMARY KEY,
+                cached_since REAL,
+                max_message_id INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            )
+        """)
+
     def _create_indexes(self, cursor):
         """
         创建数据库索引
@@ -175,9 +353,10 @@ class DatabaseManager:
         """
         cursor.execute("""
             INSERT OR REPLACE INTO db_version (version, upgraded_at)
-            VALUES (1, CURRENT_TIMESTAMP)
+            VALUES (2, CURRENT_TIMESTAMP)
         """)
 
+    @_timed_query
     def save_summary(self, channel_id: str, channel_name: str, summary_text: str,
                      message_count: int, start_time: Optional[datetime] = None,
                      end_time: Optional[datetime] = None,
@@ -254,6 +433,7 @@ class DatabaseManager:
         ))
         return cursor.lastrowid
 
+    @_timed_query
     def get_summaries(self, channel_id: Optional[str] = None, limit: int = 10,
                       start_date: Optional[datetime] = None,
                       end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
@@ -360,6 +540,7 @@ class DatabaseManager:
 
         return summaries
 
+    @_timed_query
     def get_summary_by_id(self, summary_id: int) -> Optional[Dict[str, Any]]:
         """
         根据ID获取单条总结
@@ -397,6 +578,7 @@ class DatabaseManager:
             logger.error(f"查询总结记录失败 (ID={summary_id}): {type(e).__name__}: {e}", exc_info=True)
             return None
 
+    @_timed_query
     def delete_old_summaries(self, days: int = 90) -> int:
         """
         删除旧总结记录
@@ -478,6 +660,7 @@ class DatabaseManager:
             """, [date_ago])
         return cursor.fetchone()[0]
 
+    @_timed_query
     def get_statistics(self, channel_id: Optional[str] = None) -> Dict[str, Any]:
         """
         获取统计信息
@@ -559,6 +742,7 @@ class DatabaseManager:
             "month_count": month_count
         }
 
+    @_timed_query
     def get_channel_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         获取频道排行(按总结次数)
@@ -597,6 +781,7 @@ class DatabaseManager:
             logger.error(f"获取频道排行失败: {type(e).__name__}: {e}", exc_info=True)
             return []
 
+    @_timed_query
     def export_summaries(self, output_format: str = "json",
                          channel_id: Optional[str] = None) -> Optional[str]:
         """
@@ -724,6 +909,7 @@ class DatabaseManager:
 
     # ==================== 黑名单管理方法 ====================
     
+    @_timed_query
     def add_to_blacklist(self, user_id: int, username: str = None, 
                        reason: str = None, added_by: str = None) -> bool:
         """
@@ -774,6 +960,7 @@ class DatabaseManager:
             logger.error(f"添加到黑名单失败: {type(e).__name__}: {e}", exc_info=True)
             return False
     
+    @_timed_query
     def remove_from_blacklist(self, user_id: int) -> bool:
         """
         从黑名单移除用户
@@ -810,6 +997,7 @@ class DatabaseManager:
             logger.error(f"从黑名单移除失败: {type(e).__name__}: {e}", exc_info=True)
             return False
     
+    @_timed_query
     def is_user_blacklisted(self, user_id: int) -> bool:
         """
         检查用户是否在黑名单中
@@ -838,6 +1026,7 @@ class DatabaseManager:
             logger.error(f"检查黑名单失败: {type(e).__name__}: {e}", exc_info=True)
             return False
     
+    @_timed_query
     def get_blacklist(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
         获取黑名单列表
@@ -871,6 +1060,7 @@ class DatabaseManager:
             logger.error(f"查询黑名单失败: {type(e).__name__}: {e}", exc_info=True)
             return []
     
+    @_timed_query
     def clear_blacklist(self) -> int:
         """
         清空黑名单（软删除：设置所有记录为inactive）
@@ -899,6 +1089,7 @@ class DatabaseManager:
             logger.error(f"清空黑名单失败: {type(e).__name__}: {e}", exc_info=True)
             return 0
     
+    @_timed_query
     def get_blacklist_stats(self) -> Dict[str, Any]:
         """
         获取黑名单统计信息
@@ -946,6 +1137,916 @@ class DatabaseManager:
             return {'active_count': 0, 'total_count': 0, 'week_new': 0}
 
 
+    @_timed_query
+    def save_partial_digest(self, channel_id: str, period_start: datetime, period_end: datetime,
+                            message_count: int, digest_text: str,
+                            last_message_id: Optional[int] = None) -> Optional[int]:
+        """
+        保存阶段性摘要
+
+        Args:
+            channel_id: 频道URL
+            period_start: 摘要覆盖的起始时间
+            period_end: 摘要覆盖的结束时间
+            message_count: 摘要包含的消息数量
+            digest_text: 摘要内容
+            last_message_id: 摘要包含的最后一条消息ID
+
+        Returns:
+            int: 新记录ID，失败返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO partial_digests (
+                    channel_id, period_start, period_end, message_count,
+                    digest_text, last_message_id
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                channel_id, period_start.isoformat(), period_end.isoformat(),
+                message_count, digest_text, last_message_id
+            ))
+
+            digest_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+
+            logger.info(f"已保存阶段性摘要, ID: {digest_id}, 频道: {channel_id}, 消息数: {message_count}")
+            return digest_id
+
+        except Exception as e:
+            logger.error(f"保存阶段性摘要失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def get_partial_digests(self, channel_id: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        查询频道在指定时间之后的阶段性摘要（按时间升序）
+
+        Args:
+            channel_id: 频道URL
+            since: 起始时间，只返回 period_end 晚于该时间的摘要；为None时返回全部
+
+        Returns:
+            阶段性摘要列表
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            if since:
+                cursor.execute("""
+                    SELECT * FROM partial_digests
+                    WHERE channel_id = ? AND period_end > ?
+                    ORDER BY period_start ASC, id ASC
+                """, (channel_id, since.isoformat()))
+            else:
+                cursor.execute("""
+                    SELECT * FROM partial_digests
+                    WHERE channel_id = ?
+                    ORDER BY period_start ASC, id ASC
+                """, (channel_id,))
+
+            digests = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return digests
+
+        except Exception as e:
+            logger.error(f"查询阶段性摘要失败: {type(e).__name__}: {e}", exc_info=True)
+            return []
+
+    @_timed_query
+    def delete_old_partial_digests(self, days: int = 30) -> int:
+        """
+        删除旧的阶段性摘要
+
+        Args:
+            days: 保留天数，默认30天
+
+        Returns:
+            删除的记录数
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cutoff_date = datetime.now() - timedelta(days=days)
+            cursor.execute("""
+                DELETE FROM partial_digests
+                WHERE created_at < ?
+            """, (cutoff_date.strftime('%Y-%m-%d %H:%M:%S'),))
+
+            deleted_count = cursor.rowcount
+            conn.commit()
+            conn.close()
+
+            logger.info(f"已删除 {deleted_count} 条旧阶段性摘要 (超过 {days} 天)")
+            return deleted_count
+
+        except Exception as e:
+            logger.error(f"删除旧阶段性摘要失败: {type(e).__name__}: {e}", exc_info=True)
+            return 0
+
+    # ==================== 总结任务队列 ====================
+
+    # 允许通过 update_summary_job 更新的字段
+    SUMMARY_JOB_FIELDS = (
+        'state', 'status', 'attempts', 'last_error', 'window_start', 'window_end',
+        'message_count', 'messages_json', 'summary_text', 'poll_data', 'channel_name',
+        'report_text', 'sent_report_ids', 'summary_id'
+    )
+
+    @_timed_query
+    def create_summary_job(self, channel_id: str) -> Optional[int]:
+        """
+        创建新的总结任务（状态为 pending）
+
+        Args:
+            channel_id: 频道URL
+
+        Returns:
+            int: 任务ID，失败返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO summary_jobs (channel_id, state, status)
+                VALUES (?, 'pending', 'active')
+            """, (channel_id,))
+
+            job_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+
+            logger.info(f"已创建总结任务, ID: {job_id}, 频道: {channel_id}")
+            return job_id
+
+        except Exception as e:
+            logger.error(f"创建总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def get_summary_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        根据ID查询总结任务
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务记录，不存在时返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM summary_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            conn.close()
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"查询总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def get_active_summary_job(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询频道未完成的总结任务（用于崩溃或重启后从上次完成的阶段继续）
+
+        Args:
+            channel_id: 频道URL
+
+        Returns:
+            最近一个未完成的任务，没有时返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT * FROM summary_jobs
+                WHERE channel_id = ? AND status = 'active'
+                ORDER BY id DESC LIMIT 1
+            """, (channel_id,))
+            row = cursor.fetchone()
+            conn.close()
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"查询未完成的总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def update_summary_job(self, job_id: int, **fields) -> bool:
+        """
+        更新总结任务的字段，同时刷新 updated_at
+
+        Args:
+            job_id: 任务ID
+            **fields: 要更新的字段，必须在 SUMMARY_JOB_FIELDS 中
+
+        Returns:
+            bool: 是否更新成功
+        """
+        unknown = set(fields) - set(self.SUMMARY_JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的总结任务字段: {', '.join(sorted(unknown))}")
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            cursor.execute(
+                f"UPDATE summary_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+
+            updated = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+            return updated
+
+        except Exception as e:
+            logger.error(f"更新总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return False
+
+    @_timed_query
+    def record_summary_job_failure(self, job_id: int, error: str, max_attempts: int) -> Optional[str]:
+        """
+        记录总结任务的一次失败，失败次数达到上限时转入死信
+
+        Args:
+            job_id: 任务ID
+            error: 错误描述
+            max_attempts: 最大尝试次数
+
+        Returns:
+            str: 更新后的任务状态（'active' 或 'dead'），失败返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE summary_jobs
+                SET attempts = attempts + 1,
+                    last_error = ?,
+                    status = CASE WHEN attempts + 1 >= ? THEN 'dead' ELSE status END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (error, max_attempts, job_id))
+
+            cursor.execute("SELECT status FROM summary_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            conn.commit()
+            conn.close()
+            return row[0] if row else None
+
+        except Exception as e:
+            logger.error(f"记录总结任务失败次数失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def get_summary_jobs(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        查询总结任务列表（最新在前），不包含消息内容等大字段
+
+        Args:
+            status: 按状态过滤（active/done/dead），为None时返回全部
+            limit: 返回数量
+
+        Returns:
+            任务列表
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            columns = """id, channel_id, state, status, attempts, last_error,
+                         message_count, created_at, updated_at"""
+            if status:
+                cursor.execute(f"""
+                    SELECT {columns} FROM summary_jobs
+                    WHERE status = ?
+                    ORDER BY id DESC LIMIT ?
+                """, (status, limit))
+            else:
+                cursor.execute(f"""
+                    SELECT {columns} FROM summary_jobs
+                    ORDER BY id DESC LIMIT ?
+                """, (limit,))
+
+            jobs = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return jobs
+
+        except Exception as e:
+            logger.error(f"查询总结任务列表失败: {type(e).__name__}: {e}", exc_info=True)
+            return []
+
+    @_timed_query
+    def retry_summary_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        将死信任务重新放回队列（清零失败次数，保留已完成的阶段）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            更新后的任务，任务不存在或不是死信时返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE summary_jobs
+                SET status = 'active', attempts = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'dead'
+            """, (job_id,))
+
+            updated = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+
+            if not updated:
+                return None
+            logger.info(f"死信总结任务已重新入队, ID: {job_id}")
+            return self.get_summary_job(job_id)
+
+        except Exception as e:
+            logger.error(f"重新入队总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def get_unfinished_summary_job_channels(self) -> List[str]:
+        """
+        查询有未完成总结任务的频道
+
+        Returns:
+            频道URL列表
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT DISTINCT channel_id FROM summary_jobs
+                WHERE status = 'active'
+            """)
+            channels = [row[0] for row in cursor.fetchall()]
+            conn.close()
+            return channels
+
+        except Exception as e:
+            logger.error(f"查询未完成的总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return []
+
+    @_timed_query
+    def delete_old_summary_jobs(self, days: int = 30) -> int:
+        """
+        删除已完成的旧总结任务（死信任务保留，等待管理员处理）
+
+        Args:
+            days: 保留天数，默认30天
+
+        Returns:
+            删除的记录数
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cutoff_date = datetime.now() - timedelta(days=days)
+            cursor.execute("""
+                DELETE FROM summary_jobs
+                WHERE status = 'done' AND updated_at < ?
+            """, (cutoff_date.strftime('%Y-%m-%d %H:%M:%S'),))
+
+            deleted_count = cursor.rowcount
+            conn.commit()
+            conn.close()
+
+            logger.info(f"已删除 {deleted_count} 条已完成的旧总结任务 (超过 {days} 天)")
+            return deleted_count
+
+        except Exception as e:
+            logger.error(f"删除旧总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+            return 0
+
+
+    # ==================== 发送队列（outbox） ====================
+
+    @_timed_query
+    def create_pending_summary(self, channel_id: str, channel_name: str, summary_text: str,
+                               message_count: int, start_time: Optional[datetime] = None,
+                               end_time: Optional[datetime] = None,
+                               ai_model: str = "unknown", summary_type: str = "weekly",
+                               poll_data: Optional[str] = None) -> Optional[int]:
+        """
+        在发送前保存总结记录（delivery_status 为 pending），发送成功后再补充消息ID
+
+        Args:
+            channel_id: 频道URL
+            channel_name: 频道名称
+            summary_text: 完整报告内容
+            message_count: 消息数量
+            start_time: 总结起始时间
+            end_time: 总结结束时间
+            ai_model: AI模型名称
+            summary_type: 总结类型 (daily/weekly/manual)
+            poll_data: 随总结生成的投票数据（JSON字符串）
+
+        Returns:
+            int: 新记录ID，失败返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO summaries (
+                    channel_id, channel_name, summary_text, message_count,
+                    start_time, end_time, ai_model, summary_type,
+                    poll_data, delivery_status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+            """, (
+                channel_id, channel_name, summary_text, message_count,
+                start_time.isoformat() if start_time else None,
+                end_time.isoformat() if end_time else None,
+                ai_model, summary_type, poll_data
+            ))
+
+            summary_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+
+            logger.info(f"总结已存入发送队列, ID: {summary_id}, 频道: {channel_name}")
+            return summary_id
+
+        except Exception as e:
+            logger.error(f"保存待发送总结失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def mark_summary_delivered(self, summary_id: int, summary_message_ids: List[int],
+                               poll_message_id: Optional[int] = None,
+                               button_message_id: Optional[int] = None) -> bool:
+        """
+        记录总结已发送，并写入发送得到的消息ID
+
+        Args:
+            summary_id: 总结记录ID
+            summary_message_ids: 总结消息ID列表
+            poll_message_id: 投票消息ID
+            button_message_id: 按钮消息ID
+
+        Returns:
+            bool: 是否更新成功
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE summaries
+                SET delivery_status = 'sent',
+                    delivery_error = NULL,
+                    delivered_at = CURRENT_TIMESTAMP,
+                    summary_message_ids = ?,
+                    poll_message_id = ?,
+                    button_message_id = ?
+                WHERE id = ?
+            """, (json.dumps(summary_message_ids), poll_message_id, button_message_id, summary_id))
+
+            updated = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+            return updated
+
+        except Exception as e:
+            logger.error(f"更新总结发送状态失败 (ID={summary_id}): {type(e).__name__}: {e}", exc_info=True)
+            return False
+
+    @_timed_query
+    def record_summary_delivery_failure(self, summary_id: int, error: str, max_attempts: int) -> Optional[str]:
+        """
+        记录总结的一次发送失败，次数达到上限时标记为 failed（内容保留，可再次手动投递）
+
+        Args:
+            summary_id: 总结记录ID
+            error: 错误描述
+            max_attempts: 最大投递次数
+
+        Returns:
+            str: 更新后的发送状态（'pending' 或 'failed'），失败返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE summaries
+                SET delivery_attempts = delivery_attempts + 1,
+                    delivery_error = ?,
+                    delivery_status = CASE WHEN delivery_attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+                WHERE id = ? AND delivery_status != 'sent'
+            """, (error, max_attempts, summary_id))
+
+            cursor.execute("SELECT delivery_status FROM summaries WHERE id = ?", (summary_id,))
+            row = cursor.fetchone()
+            conn.commit()
+            conn.close()
+            return row[0] if row else None
+
+        except Exception as e:
+            logger.error(f"记录总结发送失败次数失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def get_pending_summaries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        查询等待发送的总结（最早的在前）
+
+        仍由未完成的总结任务负责投递的记录不在此列，避免与任务重试重复发送。
+
+        Args:
+            limit: 返回数量
+
+        Returns:
+            总结记录列表
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT * FROM summaries
+                WHERE delivery_status = 'pending'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM summary_jobs
+                      WHERE summary_jobs.summary_id = summaries.id
+                        AND summary_jobs.status != 'done'
+                  )
+                ORDER BY id ASC LIMIT ?
+            """, (limit,))
+
+            summaries = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return summaries
+
+        except Exception as e:
+            logger.error(f"查询待发送总结失败: {type(e).__name__}: {e}", exc_info=True)
+            return []
+
+
+    # ==================== 频道租约（多进程分片） ====================
+
+    def _connect_immediate(self):
+        """打开自动提交模式的连接，由调用方用 BEGIN IMMEDIATE 开启写事务，保证跨进程的读-改-写原子性"""
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @_timed_query
+    def acquire_job_lease(self, channel_id: str, owner: str, ttl_seconds: float,
+                          not_before: Optional[float] = None) -> Optional[str]:
+        """
+        尝试取得频道租约
+
+        Args:
+            channel_id: 频道URL
+            owner: 租约持有者标识
+            ttl_seconds: 租约有效期（秒）
+            not_before: 可选，该时间戳之后已有进程完成过该频道时不再取得租约
+
+        Returns:
+            str: 'acquired'（已取得）、'held'（其他进程持有且未过期）或 'done'（已由其他进程完成），失败返回None
+        """
+        try:
+            conn = self._connect_immediate()
+            cursor = conn.cursor()
+            now = time.time()
+
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "SELECT owner, expires_at, completed_at FROM job_leases WHERE channel_id = ?",
+                (channel_id,)
+            )
+            row = cursor.fetchone()
+
+            if row and row[0] and row[0] != owner and row[1] > now:
+                status = 'held'
+            elif row and not_before is not None and row[2] is not None and row[2] >= not_before:
+                status = 'done'
+            else:
+                cursor.execute("""
+                    INSERT INTO job_leases (channel_id, owner, acquired_at, expires_at, heartbeat_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(channel_id) DO UPDATE SET
+                        owner = excluded.owner,
+                        acquired_at = excluded.acquired_at,
+                        expires_at = excluded.expires_at,
+                        heartbeat_at = excluded.heartbeat_at
+                """, (channel_id, owner, now, now + ttl_seconds, now))
+                status = 'acquired'
+
+            cursor.execute("COMMIT")
+            conn.close()
+            return status
+
+        except Exception as e:
+            logger.error(f"取得频道租约失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def renew_job_lease(self, channel_id: str, owner: str, ttl_seconds: float) -> Optional[bool]:
+        """
+        续约频道租约
+
+        Args:
+            channel_id: 频道URL
+            owner: 租约持有者标识
+            ttl_seconds: 租约有效期（秒）
+
+        Returns:
+            bool: 是否仍持有租约；数据库出错时返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            cursor = conn.cursor()
+            now = time.time()
+
+            cursor.execute("""
+                UPDATE job_leases SET expires_at = ?, heartbeat_at = ?
+                WHERE channel_id = ? AND owner = ?
+            """, (now + ttl_seconds, now, channel_id, owner))
+
+            renewed = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+            return renewed
+
+        except Exception as e:
+            logger.error(f"续约频道租约失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def release_job_lease(self, channel_id: str, owner: str, completed: bool = False) -> bool:
+        """
+        释放频道租约
+
+        Args:
+            channel_id: 频道URL
+            owner: 租约持有者标识
+            completed: 是否已完成总结，为True时记录完成时间
+
+        Returns:
+            bool: 是否释放成功（租约已被其他进程接手时返回False）
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE job_leases
+                SET owner = NULL, expires_at = NULL,
+                    completed_at = CASE WHEN ? THEN ? ELSE completed_at END
+                WHERE channel_id = ? AND owner = ?
+            """, (completed, time.time(), channel_id, owner))
+
+            released = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+            return released
+
+        except Exception as e:
+            logger.error(f"释放频道租约失败: {type(e).__name__}: {e}", exc_info=True)
+            return False
+
+    @_timed_query
+    def get_expired_job_leases(self) -> List[Dict[str, Any]]:
+        """
+        查询持有者未释放且已过期的租约（持有进程已崩溃或失联）
+
+        Returns:
+            租约列表
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT * FROM job_leases
+                WHERE owner IS NOT NULL AND expires_at < ?
+            """, (time.time(),))
+
+            leases = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return leases
+
+        except Exception as e:
+            logger.error(f"查询过期频道租约失败: {type(e).__name__}: {e}", exc_info=True)
+            return []
+
+    @_timed_query
+    def get_job_leases(self) -> List[Dict[str, Any]]:
+        """
+        查询当前被持有的租约
+
+        Returns:
+            租约列表
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT * FROM job_leases
+                WHERE owner IS NOT NULL
+                ORDER BY acquired_at
+            """)
+
+            leases = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return leases
+
+        except Exception as e:
+            logger.error(f"查询频道租约失败: {type(e).__name__}: {e}", exc_info=True)
+            return []
+
+
+    # ==================== 消息预取缓存 ====================
+
+    @_timed_query
+    def get_message_cache_state(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询频道的消息缓存状态
+
+        Args:
+            channel_id: 频道URL
+
+        Returns:
+            dict: 包含 cached_since、max_message_id、updated_at；没有缓存时返回None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM message_cache_state WHERE channel_id = ?", (channel_id,))
+            row = cursor.fetchone()
+            conn.close()
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"查询消息缓存状态失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @_timed_query
+    def reset_message_cache(self, channel_id: str, cached_since: float) -> bool:
+        """
+        清空频道的消息缓存，并从指定时间重新开始缓存
+
+        Args:
+            channel_id: 频道URL
+            cached_since: 新缓存覆盖的起始时间（Unix 时间戳）
+
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            cursor = conn.cursor()
+
+            cursor.execute("DELETE FROM message_cache WHERE channel_id = ?", (channel_id,))
+            cursor.execute("""
+                INSERT OR REPLACE INTO message_cache_state (channel_id, cached_since, max_message_id, updated_at)
+                VALUES (?, ?, 0, ?)
+            """, (channel_id, cached_since, time.time()))
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"重置消息缓存失败: {type(e).__name__}: {e}", exc_info=True)
+            return False
+
+    @_timed_query
+    def save_cached_messages(self, channel_id: str, records: List[tuple], max_message_id: int) -> bool:
+        """
+        写入预取到的消息并推进缓存的最大消息ID
+
+        Args:
+            channel_id: 频道URL
+            records: 消息记录列表，每项为 (消息ID, 发送时间的 Unix 时间戳, 格式化文本)
+            max_message_id: 本次抓取覆盖到的最大消息ID（包括没有文本的消息）
+
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            cursor = conn.cursor()
+
+            cursor.executemany("""
+                INSERT OR REPLACE INTO message_cache (channel_id, message_id, posted_at, content)
+                VALUES (?, ?, ?, ?)
+            """, [(channel_id, message_id, posted_at, content) for message_id, posted_at, content in records])
+            cursor.execute("""
+                UPDATE message_cache_state
+                SET max_message_id = MAX(max_message_id, ?), updated_at = ?
+                WHERE channel_id = ?
+            """, (max_message_id, time.time(), channel_id))
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"写入消息缓存失败: {type(e).__name__}: {e}", exc_info=True)
+            return False
+
+    @_timed_query
+    def get_cached_messages(self, channel_id: str, since: float) -> List[tuple]:
+        """
+        查询频道在指定时间之后的缓存消息（按消息ID升序）
+
+        Args:
+            channel_id: 频道URL
+            since: 起始时间（Unix 时间戳），只返回晚于该时间发送的消息
+
+        Returns:
+            list: (消息ID, 格式化文本) 列表
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT message_id, content FROM message_cache
+                WHERE channel_id = ? AND posted_at > ?
+                ORDER BY message_id ASC
+            """, (channel_id, since))
+
+            rows = cursor.fetchall()
+            conn.close()
+            return rows
+
+        except Exception as e:
+            logger.error(f"查询消息缓存失败: {type(e).__name__}: {e}", exc_info=True)
+            return []
+
+    @_timed_query
+    def trim_message_cache(self, channel_id: str, since: float) -> int:
+        """
+        删除频道中早于指定时间的缓存消息，并相应推进缓存起始时间
+
+        Args:
+            channel_id: 频道URL
+            since: 保留该时间（Unix 时间戳）之后发送的消息
+
+        Returns:
+            删除的记录数
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                DELETE FROM message_cache
+                WHERE channel_id = ? AND posted_at <= ?
+            """, (channel_id, since))
+            deleted_count = cursor.rowcount
+            cursor.execute("""
+                UPDATE message_cache_state
+                SET cached_since = MAX(cached_since, ?)
+                WHERE channel_id = ?
+            """, (since, channel_id))
+
+            conn.commit()
+            conn.close()
+
+            if deleted_count:
+                logger.debug(f"已清理频道 {channel_id} 的 {deleted_count} 条已总结的缓存消息")
+            return deleted_count
+
+        except Exception as e:
+            logger.error(f"清理消息缓存失败: {type(e).__name__}: {e}", exc_info=True)
+            return 0
+
 # 创建全局数据库管理器实例
 db_manager = None
 
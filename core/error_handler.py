@@ -24,11 +24,17 @@
 
 import logging
 import asyncio
+import contextvars
+import threading
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Callable, Any, Optional, Dict, List, Tuple
+from typing import Callable, Any, Optional, Dict, List, Tuple, NamedTuple
 from functools import wraps
 import inspect
+import sys
+
+from .metrics import ERRORS_TOTAL
 
 logger = logging.getLogger(__name__)
 
@@ -46,10 +52,28 @@ DEFAULT_RETRY_CONFIG = {
     "base_delay": 1.0,  # 基础延迟秒数
     "max_delay": 30.0,  # 最大延迟秒数
     "exponential_backoff": True,
-    "retry_on_exceptions": (Exception,),  # 默认重试所有异常
-    "skip_retry_on_exceptions": (KeyboardInterrupt, SystemExit)  # 不重试的异常
+    "retry_on_exceptions": (Exception,),  # 默认重试所有异常（不可重试的错误由错误分类过滤）
+    "skip_retry_on_exceptions": (KeyboardInterrupt, SystemExit),  # 不重试的异常
+    "dependency": None  # 依赖名称，用于选择熔断器（如 "llm"、"telegram"）
 }
 
+# 熔断器配置
+CIRCUIT_FAILURE_THRESHOLD = 5      # 连续失败多少次后断开
+CIRCUIT_RECOVERY_TIMEOUT = 60.0    # 断开后多少秒允许一次探测请求
+
+# 全局重试预算：窗口内重试次数不超过请求数的一定比例（至少允许 RETRY_BUDGET_MIN_RETRIES 次）
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN_RETRIES = 10
+RETRY_BUDGET_WINDOW_SECONDS = 60.0
+
+# 错误分类
+ERROR_TRANSIENT = "transient"        # 临时错误，可退避重试
+ERROR_RATE_LIMITED = "rate_limited"  # 被限流，按服务器给出的等待时间重试
+ERROR_FATAL = "fatal"                # 认证、参数等错误，重试无意义
+
+# 当前调用链是否已处于重试装饰器内，嵌套的装饰器只执行一次，避免重试次数相乘
+_retry_active = contextvars.ContextVar("retry_active", default=False)
+
 
 class RetryExhaustedError(Exception):
     """重试耗尽异常"""
@@ -58,6 +82,244 @@ class RetryExhaustedError(Exception):
         self.last_exception = last_exception
 
 
+class CircuitOpenError(Exception):
+    """熔断器处于断开状态，请求被直接拒绝"""
+    def __init__(self, dependency: str, retry_in: float):
+        super().__init__(f"依赖 {dependency} 已熔断，{retry_in:.0f}秒后允许探测")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+class ErrorClassification(NamedTuple):
+    """错误分类结果"""
+    kind: str
+    retry_after: Optional[float] = None  # 服务器要求的等待秒数（仅限流错误）
+
+
+def _openai_retry_after(error) -> Optional[float]:
+    """从 OpenAI 错误响应头中读取 Retry-After 秒数"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception) -> ErrorClassification:
+    """
+    将异常分类为临时错误、限流错误或不可重试错误
+
+    Args:
+        error: 捕获的异常
+
+    Returns:
+        ErrorClassification: 分类结果
+    """
+    if isinstance(error, (CircuitOpenError, RetryExhaustedError)):
+        return ErrorClassification(ERROR_FATAL)
+
+    try:
+        from telethon.errors import FloodWaitError, RPCError
+        if isinstance(error, FloodWaitError):
+            return ErrorClassification(ERROR_RATE_LIMITED, float(error.seconds))
+        if isinstance(error, RPCError):
+            code = getattr(error, 'code', None)
+            if code == 420:
+                return ErrorClassification(ERROR_RATE_LIMITED, float(getattr(error, 'seconds', 0) or 0) or None)
+            # 5xx 与负数错误码（如 -503 超时）为服务端临时故障
+            if code is None or code >= 500 or code < 0:
+                return ErrorClassification(ERROR_TRANSIENT)
+            return ErrorClassification(ERROR_FATAL)
+    except ImportError:
+        pass
+
+    # openai 只在首次调用 LLM 时才导入；尚未导入时错误不可能来自 openai
+    openai = sys.modules.get('openai')
+    if openai is not None:
+        if isinstance(error, openai.RateLimitError):
+            return ErrorClassification(ERROR_RATE_LIMITED, _openai_retry_after(error))
+        if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+            return ErrorClassification(ERROR_TRANSIENT)
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code in (408, 409) or error.status_code >= 500:
+                return ErrorClassification(ERROR_TRANSIENT)
+            return ErrorClassification(ERROR_FATAL)
+
+    if isinstance(error, (PermissionError, FileNotFoundError)):
+        return ErrorClassification(ERROR_FATAL)
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError, OSError)):
+        return ErrorClassification(ERROR_TRANSIENT)
+    if isinstance(error, (ValueError, TypeError, KeyError, IndexError, AttributeError, NotImplementedError)):
+        return ErrorClassification(ERROR_FATAL)
+
+    # 未知错误按临时错误处理，由重试预算和熔断器限制放大效应
+    return ErrorClassification(ERROR_TRANSIENT)
+
+
+class CircuitBreaker:
+    """按依赖划分的熔断器
+
+    连续失败达到阈值后断开，断开期间直接拒绝请求；恢复时间过后放行一次探测请求，
+    探测成功则闭合，失败则重新断开。只有临时错误和限流错误计为失败。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 recovery_timeout: float = CIRCUIT_RECOVERY_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self.rejected_count = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """请求前检查熔断状态
+
+        Raises:
+            CircuitOpenError: 熔断器断开或探测请求进行中
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info(f"熔断器 {self.name} 进入半开状态，放行一次探测请求")
+                return
+
+            self.rejected_count += 1
+            raise CircuitOpenError(self.name, max(0.0, self.opened_at + self.recovery_timeout - now))
+
+    def record_success(self):
+        """记录一次成功（或依赖可达的非临时错误）"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"熔断器 {self.name} 已恢复闭合")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """记录一次临时失败，达到阈值或探测失败时断开"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.open_count += 1
+                    logger.warning(f"熔断器 {self.name} 断开：连续失败 {self.consecutive_failures} 次，"
+                                   f"{self.recovery_timeout:.0f}秒内拒绝请求")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_count": self.open_count,
+            "rejected_count": self.rejected_count,
+        }
+
+
+class RetryBudget:
+    """全局重试预算
+
+    在滑动窗口内，重试次数不得超过请求次数的 ratio 倍（至少允许 min_retries 次），
+    依赖整体故障时限制重试带来的额外负载。
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: int = RETRY_BUDGET_MIN_RETRIES,
+                 window_seconds: float = RETRY_BUDGET_WINDOW_SECONDS):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        self._requests = deque()
+        self._retries = deque()
+        self.denied_count = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self):
+        """记录一次首次请求"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """申请一次重试额度，预算耗尽时返回False"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            allowed = max(self.min_retries, int(len(self._requests) * self.ratio))
+            if len(self._retries) >= allowed:
+                self.denied_count += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取窗口内的请求与重试统计"""
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "denied": self.denied_count,
+            }
+
+
+# 全局熔断器与重试预算
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+_retry_budget = RetryBudget()
+
+
+def get_circuit_breaker(dependency: str) -> CircuitBreaker:
+    """获取（或创建）指定依赖的熔断器"""
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(dependency)
+        if breaker is None:
+            breaker = CircuitBreaker(dependency)
+            _circuit_breakers[dependency] = breaker
+        return breaker
+
+
+def get_retry_budget() -> RetryBudget:
+    """获取全局重试预算"""
+    return _retry_budget
+
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """获取所有熔断器与重试预算的状态"""
+    return {
+        "circuit_breakers": {name: breaker.get_stats() for name, breaker in _circuit_breakers.items()},
+        "retry_budget": _retry_budget.get_stats(),
+    }
+
+
 def record_error(error: Exception, context: str = ""):
     """记录错误统计信息"""
     global _error_stats
@@ -67,6 +329,7 @@ def record_error(error: Exception, context: str = ""):
     
     error_type = type(error).__name__
     _error_stats["error_types"][error_type] = _error_stats["error_types"].get(error_type, 0) + 1
+    ERRORS_TOTAL.inc(type=error_type)
     
     # 记录最近错误（最多保留10个）
     error_record = {
@@ -115,40 +378,88 @@ def _build_retry_config(**kwargs):
     return config
 
 
-def _execute_retry_with_delay(func_name: str, attempt: int, config: dict, 
-                             error: Exception, is_async: bool = False):
+def _plan_retry(func_name: str, attempt: int, config: dict, error: Exception) -> float:
     """
-    执行重试延迟并记录
-    
+    根据错误分类、重试次数和全局重试预算决定是否重试
+
     Args:
         func_name: 函数名
-        attempt: 当前尝试次数
+        attempt: 当前尝试次数（从0开始）
         config: 重试配置
         error: 捕获的异常
-        is_async: 是否为异步函数
-    
+
     Returns:
-        bool: 是否应该继续重试（False表示重试耗尽）
-    
+        float: 重试前需要等待的秒数
+
     Raises:
-        RetryExhaustedError: 重试次数耗尽时抛出
+        Exception: 不可重试的错误原样抛出
+        RetryExhaustedError: 重试次数或重试预算耗尽、限流等待超过上限时抛出
     """
     record_error(error, f"retry_attempt_{attempt}: {func_name}")
-    
-    if attempt == config["max_retries"]:
+    classification = classify_error(error)
+
+    if classification.kind == ERROR_FATAL:
+        logger.error(f"{func_name} 遇到不可重试的错误，放弃重试: {type(error).__name__}: {error}")
+        raise error
+
+    if attempt >= config["max_retries"]:
         logger.error(f"{func_name} 重试次数耗尽 ({config['max_retries']} 次)")
-        raise RetryExhaustedError(
-            f"{func_name} 重试次数耗尽",
-            error
-        )
-    
+        raise RetryExhaustedError(f"{func_name} 重试次数耗尽", error) from error
+
     delay = _calculate_delay(attempt, config)
+    if classification.kind == ERROR_RATE_LIMITED and classification.retry_after:
+        if classification.retry_after > config["max_delay"]:
+            logger.error(f"{func_name} 被限流，需等待 {classification.retry_after:.0f} 秒，超过最大延迟，放弃重试")
+            raise RetryExhaustedError(f"{func_name} 限流等待时间过长", error) from error
+        delay = max(delay, classification.retry_after)
+
+    if not _retry_budget.try_acquire():
+        logger.error(f"{func_name} 全局重试预算耗尽，放弃重试: {type(error).__name__}: {error}")
+        raise RetryExhaustedError(f"{func_name} 重试预算耗尽", error) from error
+
     logger.warning(
-        f"{func_name} 第 {attempt + 1} 次失败，"
+        f"{func_name} 第 {attempt + 1} 次失败（{classification.kind}），"
         f"{delay:.1f}秒后重试: {type(error).__name__}: {error}"
     )
-    
-    return True
+    return delay
+
+
+def _record_outcome(breaker: Optional[CircuitBreaker], error: Optional[Exception] = None):
+    """把一次调用结果记入熔断器：只有临时错误和限流错误计为依赖故障"""
+    if breaker is None or isinstance(error, CircuitOpenError):
+        return
+    if error is None or classify_error(error).kind == ERROR_FATAL:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+
+async def _call_once_async(func: Callable, args: tuple, kwargs: dict,
+                           breaker: Optional[CircuitBreaker]):
+    """在熔断器保护下执行一次异步调用"""
+    if breaker:
+        breaker.before_call()
+    try:
+        result = await func(*args, **kwargs)
+    except Exception as e:
+        _record_outcome(breaker, e)
+        raise
+    _record_outcome(breaker)
+    return result
+
+
+def _call_once_sync(func: Callable, args: tuple, kwargs: dict,
+                    breaker: Optional[CircuitBreaker]):
+    """在熔断器保护下执行一次同步调用"""
+    if breaker:
+        breaker.before_call()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        _record_outcome(breaker, e)
+        raise
+    _record_outcome(breaker)
+    return result
 
 
 async def _execute_with_retry_async(func: Callable, args: tuple, kwargs: dict, 
@@ -169,23 +480,32 @@ async def _execute_with_retry_async(func: Callable, args: tuple, kwargs: dict,
     Raises:
         RetryExhaustedError: 重试次数耗尽时抛出
     """
-    last_exception = None
-    for attempt in range(config["max_retries"] + 1):
-        try:
-            if attempt > 0:
-                logger.info(f"重试 {func_name}，第 {attempt} 次尝试")
-            return await func(*args, **kwargs)
-            
-        except config["skip_retry_on_exceptions"] as e:
-            record_error(e, f"skip_retry: {func_name}")
-            raise
-            
-        except config["retry_on_exceptions"] as e:
-            last_exception = e
-            _execute_retry_with_delay(func_name, attempt, config, e, is_async=True)
-            await asyncio.sleep(_calculate_delay(attempt, config))
-    
-    raise RetryExhaustedError(f"{func_name} 重试次数耗尽", last_exception)
+    breaker = get_circuit_breaker(config["dependency"]) if config["dependency"] else None
+
+    # 外层已有重试装饰器时只执行一次，由外层统一重试
+    if _retry_active.get():
+        return await _call_once_async(func, args, kwargs, breaker)
+
+    token = _retry_active.set(True)
+    try:
+        _retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                if attempt > 0:
+                    logger.info(f"重试 {func_name}，第 {attempt} 次尝试")
+                return await _call_once_async(func, args, kwargs, breaker)
+
+            except config["skip_retry_on_exceptions"] as e:
+                record_error(e, f"skip_retry: {func_name}")
+                raise
+
+            except config["retry_on_exceptions"] as e:
+                delay = _plan_retry(func_name, attempt, config, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+    finally:
+        _retry_active.reset(token)
 
 
 def _execute_with_retry_sync(func: Callable, args: tuple, kwargs: dict,
@@ -206,23 +526,32 @@ def _execute_with_retry_sync(func: Callable, args: tuple, kwargs: dict,
     Raises:
         RetryExhaustedError: 重试次数耗尽时抛出
     """
-    last_exception = None
-    for attempt in range(config["max_retries"] + 1):
-        try:
-            if attempt > 0:
-                logger.info(f"重试 {func_name}，第 {attempt} 次尝试")
-            return func(*args, **kwargs)
-            
-        except config["skip_retry_on_exceptions"] as e:
-            record_error(e, f"skip_retry: {func_name}")
-            raise
-            
-        except config["retry_on_exceptions"] as e:
-            last_exception = e
-            _execute_retry_with_delay(func_name, attempt, config, e, is_async=False)
-            time.sleep(_calculate_delay(attempt, config))
-    
-    raise RetryExhaustedError(f"{func_name} 重试次数耗尽", last_exception)
+    breaker = get_circuit_breaker(config["dependency"]) if config["dependency"] else None
+
+    # 外层已有重试装饰器时只执行一次，由外层统一重试
+    if _retry_active.get():
+        return _call_once_sync(func, args, kwargs, breaker)
+
+    token = _retry_active.set(True)
+    try:
+        _retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                if attempt > 0:
+                    logger.info(f"重试 {func_name}，第 {attempt} 次尝试")
+                return _call_once_sync(func, args, kwargs, breaker)
+
+            except config["skip_retry_on_exceptions"] as e:
+                record_error(e, f"skip_retry: {func_name}")
+                raise
+
+            except config["retry_on_exceptions"] as e:
+                delay = _plan_retry(func_name, attempt, config, e)
+                time.sleep(delay)
+                attempt += 1
+    finally:
+        _retry_active.reset(token)
 
 
 def _calculate_delay(attempt: int, config: dict) -> float:
@@ -281,10 +610,14 @@ def retry_with_backoff(
     max_delay: float = None,
     exponential_backoff: bool = None,
     retry_on_exceptions: tuple = None,
-    skip_retry_on_exceptions: tuple = None
+    skip_retry_on_exceptions: tuple = None,
+    dependency: str = None
 ):
     """
     重试装饰器，支持指数退避
+
+    只重试临时错误和限流错误（限流时按服务器要求的时间等待），认证、参数等错误直接抛出；
+    所有重试共享全局重试预算。嵌套的重试装饰器只在最外层生效。
     
     Args:
         max_retries: 最大重试次数
@@ -293,6 +626,7 @@ def retry_with_backoff(
         exponential_backoff: 是否使用指数退避
         retry_on_exceptions: 需要重试的异常类型
         skip_retry_on_exceptions: 跳过重试的异常类型
+        dependency: 依赖名称，指定后调用受该依赖的熔断器保护
     """
     def decorator(func: Callable):
         is_async = inspect.iscoroutinefunction(func)
@@ -305,7 +639,8 @@ def retry_with_backoff(
             max_delay=max_delay,
             exponential_backoff=exponential_backoff,
             retry_on_exceptions=retry_on_exceptions,
-            skip_retry_on_exceptions=skip_retry_on_exceptions
+            skip_retry_on_exceptions=skip_retry_on_exceptions,
+            dependency=dependency
         )
         
         @wraps(func)
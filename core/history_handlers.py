@@ -22,7 +22,7 @@ import os
 from datetime import datetime, timedelta
 from telethon.events import NewMessage
 
-from .config import ADMIN_LIST, CHANNELS
+from .config import ADMIN_LIST, get_config_snapshot
 from .telegram import send_long_message
 from .database import get_db_manager
 
@@ -56,7 +56,7 @@ async def handle_history(event):
                 channel_id = f"https://t.me/{channel_part}"
 
             # 验证频道是否存在
-            if channel_id not in CHANNELS:
+            if channel_id not in get_config_snapshot().channels:
                 await event.reply(f"频道 {channel_id} 不在配置列表中")
                 return
 
@@ -172,7 +172,7 @@ async def handle_export(event):
                 output_format = second_param
 
         # 如果指定了频道，验证是否存在
-        if channel_id and channel_id not in CHANNELS:
+        if channel_id and channel_id not in get_config_snapshot().channels:
             await event.reply(f"频道 {channel_id} 不在配置列表中")
             return
 
@@ -231,7 +231,7 @@ async def handle_stats(event):
                 channel_id = f"https://t.me/{channel_part}"
 
             # 验证频道是否存在
-            if channel_id not in CHANNELS:
+            if channel_id not in get_config_snapshot().channels:
                 await event.reply(f"频道 {channel_id} 不在配置列表中")
                 return
 
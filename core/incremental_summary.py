@@ -0,0 +1,160 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""增量总结模块
+
+启用后，新消息按固定间隔（或每 N 条消息）被压缩为阶段性摘要并存入数据库，
+定时总结时只需合并这些摘要，避免一次性处理整周的原始消息。
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+
+from .config import INCREMENTAL_CHUNK_MESSAGES
+from .ai_client import analyze_with_ai, analyze_channel_messages
+from .database import get_db_manager
+from .error_handler import record_error
+from .summary_time_manager import get_channel_fetch_window
+from .telegram import fetch_channel_records
+
+logger = logging.getLogger(__name__)
+
+# 生成阶段性摘要使用的提示词
+PARTIAL_DIGEST_PROMPT = (
+    "请将以下 Telegram 消息整理为简明的阶段性要点摘要，保留重要消息的链接，"
+    "稍后会与其他时间段的摘要合并为完整总结：\n\n"
+)
+
+# 合并阶段性摘要时追加在用户提示词之后的说明
+MERGE_PROMPT_NOTE = (
+    "\n\n（以下内容是按时间段预先整理好的阶段性摘要，已包含原消息链接，"
+    "请将它们合并去重后按上述要求生成完整总结）\n\n"
+)
+
+
+def _get_increment_start(channel, last_summary_time):
+    """
+    计算本次增量抓取的起始位置
+
+    Args:
+        channel: 频道URL
+        last_summary_time: 上次总结时间
+
+    Returns:
+        tuple: (起始时间, 已处理的最后一条消息ID)；起始时间为上一个阶段性摘要的结束时间，
+               没有摘要时为上次总结时间或一周前，此时消息ID为0
+    """
+    digests = get_db_manager().get_partial_digests(channel, since=last_summary_time)
+    if digests:
+        return datetime.fromisoformat(digests[-1]['period_end']), digests[-1]['last_message_id'] or 0
+    if last_summary_time:
+        return last_summary_time, 0
+    return datetime.now(timezone.utc) - timedelta(days=7), 0
+
+
+async def run_incremental_digest(channel):
+    """抓取频道自上一个阶段性摘要以来的新消息，并生成阶段性摘要
+
+    消息较多时按 INCREMENTAL_CHUNK_MESSAGES 条一组分别生成摘要，每组摘要只覆盖到
+    组内最后一条消息的时间和ID。AI 生成失败的分组及其后的消息不会保存，下次运行时会重新处理。
+
+    Args:
+        channel: 频道URL
+
+    Returns:
+        tuple: (本次生成摘要的消息数量, 因生成失败留待下次处理的消息数量)
+    """
+    last_summary_time, exclude_ids = get_channel_fetch_window(channel)
+    period_start, last_message_id = _get_increment_start(channel, last_summary_time)
+
+    # 按时间升序抓取，附带消息ID和时间，用于确定每组摘要的覆盖范围
+    records, _ = await fetch_channel_records(channel, period_start, last_message_id)
+    exclude_ids = set(exclude_ids)
+    messages = [record for record in records if record[0] not in exclude_ids]
+    if not messages:
+        logger.info(f"频道 {channel} 自 {period_start} 以来没有新消息，跳过阶段性摘要")
+        return 0, 0
+
+    db = get_db_manager()
+    digested_count = 0
+    for i in range(0, len(messages), INCREMENTAL_CHUNK_MESSAGES):
+        chunk = messages[i:i + INCREMENTAL_CHUNK_MESSAGES]
+        digest = await asyncio.to_thread(analyze_with_ai, [text for _, _, text in chunk], PARTIAL_DIGEST_PROMPT)
+        if not digest or digest.startswith("AI 分析失败"):
+            logger.warning(f"频道 {channel} 的阶段性摘要生成失败，剩余 {len(messages) - i} 条消息将在下次处理")
+            break
+
+        chunk_last_id, chunk_end, _ = chunk[-1]
+        db.save_partial_digest(channel, period_start, chunk_end, len(chunk), digest, last_message_id=chunk_last_id)
+        period_start = chunk_end
+        digested_count += len(chunk)
+
+    logger.info(f"频道 {channel} 阶段性摘要完成，共处理 {digested_count}/{len(messages)} 条消息")
+    return digested_count, len(messages) - digested_count
+
+
+async def incremental_digest_job(channel):
+    """定时任务入口：为频道生成阶段性摘要"""
+    try:
+        await run_incremental_digest(channel)
+    except Exception as e:
+        record_error(e, "incremental_digest_job")
+        logger.error(f"频道 {channel} 阶段性摘要任务失败: {type(e).__name__}: {e}", exc_info=True)
+
+
+async def summarize_from_partials(channel, current_prompt, with_poll=False):
+    """合并阶段性摘要生成完整总结
+
+    先为上一个摘要之后的新消息补一次阶段性摘要，再合并自上次总结以来的所有摘要。
+    补做的阶段性摘要没有全部成功时抛出异常，避免跳过未摘要的消息并推进总结时间。
+
+    Args:
+        channel: 频道URL
+        current_prompt: 当前使用的提示词
+        with_poll: 该频道是否需要投票
+
+    Returns:
+        tuple: (总结文本, 投票数据或None, 覆盖的消息数量, 已合并摘要中最晚的 period_end)；
+               没有任何摘要时返回None
+
+    Raises:
+        RuntimeError: 仍有消息未能生成阶段性摘要
+    """
+    _, pending_count = await run_incremental_digest(channel)
+    if pending_count:
+        raise RuntimeError(f"频道 {channel} 还有 {pending_count} 条消息未能生成阶段性摘要，稍后重试")
+
+    last_summary_time, _ = get_channel_fetch_window(channel)
+    digests = get_db_manager().get_partial_digests(channel, since=last_summary_time)
+    if not digests:
+        return None
+
+    digest_texts = [
+        f"时间段: {d['period_start'][:16]} ~ {d['period_end'][:16]}（{d['message_count']} 条消息）\n{d['digest_text']}"
+        for d in digests
+    ]
+    message_count = sum(d['message_count'] for d in digests)
+    period_end = max((d['period_end'] for d in digests), key=datetime.fromisoformat)
+    logger.info(f"开始合并频道 {channel} 的 {len(digests)} 个阶段性摘要，覆盖 {message_count} 条消息")
+
+    summary, poll_data = await asyncio.to_thread(
+        analyze_channel_messages, digest_texts, f"{current_prompt}{MERGE_PROMPT_NOTE}", with_poll
+    )
+    return summary, poll_data, message_count, period_end
@@ -0,0 +1,184 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""持久化定时任务存储
+
+基于现有 SQLite 数据库（summaries.db）的 APScheduler 任务存储，
+表结构与 APScheduler 自带的 SQLAlchemyJobStore 相同，但只依赖标准库 sqlite3。
+定时总结任务保存在这里，机器人重启后任务及其下次运行时间不会丢失，
+错过的运行由调度器按 misfire_grace_time / coalesce 规则补跑。
+"""
+
+import logging
+import pickle
+import sqlite3
+from contextlib import closing
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from .config import DATABASE_PATH
+
+logger = logging.getLogger(__name__)
+
+# 调度器中持久化任务存储的别名
+PERSISTENT_JOBSTORE = "persistent"
+
+
+class SQLiteJobStore(BaseJobStore):
+    """把任务序列化后保存到 SQLite 表中
+
+    每次操作单独打开连接，与 DatabaseManager 的用法一致，可在调度线程与 Watchdog 线程中同时使用。
+    """
+
+    def __init__(self, db_path=None, tablename="apscheduler_jobs", pickle_protocol=pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.db_path = db_path if db_path else DATABASE_PATH
+        self.tablename = tablename
+        self.pickle_protocol = pickle_protocol
+        self._create_table()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _create_table(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.tablename} (
+                    id VARCHAR(191) PRIMARY KEY,
+                    next_run_time REAL,
+                    job_state BLOB NOT NULL
+                )
+            """)
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.tablename}_next_run_time ON {self.tablename}(next_run_time)"
+            )
+
+    def lookup_job(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(f"SELECT job_state FROM {self.tablename} WHERE id = ?", (job_id,)).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        timestamp = datetime_to_utc_timestamp(now)
+        return self._get_jobs("next_run_time <= ?", (timestamp,))
+
+    def get_next_run_time(self):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT next_run_time FROM {self.tablename} WHERE next_run_time IS NOT NULL "
+                f"ORDER BY next_run_time LIMIT 1"
+            ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    f"INSERT INTO {self.tablename} (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                    (job.id, datetime_to_utc_timestamp(job.next_run_time), self._serialize(job))
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                f"UPDATE {self.tablename} SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time), self._serialize(job), job.id)
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(f"DELETE FROM {self.tablename} WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.tablename}")
+
+    def stored_job_states(self):
+        """读取所有已保存任务的原始状态，调度器启动前也可调用
+
+        Returns:
+            dict: {任务ID: 任务状态字典（含 trigger、next_run_time、func 等）}
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT id, job_state FROM {self.tablename}").fetchall()
+
+        states = {}
+        for job_id, job_state in rows:
+            try:
+                states[job_id] = pickle.loads(job_state)
+            except Exception as e:
+                logger.warning(f"无法读取已保存的定时任务 {job_id}: {type(e).__name__}: {e}")
+        return states
+
+    def discard_jobs(self, job_ids):
+        """直接删除指定的已保存任务，调度器启动前也可调用"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(f"DELETE FROM {self.tablename} WHERE id = ?", [(job_id,) for job_id in job_ids])
+
+    def _serialize(self, job):
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, condition=None, params=()):
+        query = f"SELECT id, job_state FROM {self.tablename}"
+        if condition:
+            query += f" WHERE {condition}"
+        query += " ORDER BY next_run_time"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        jobs = []
+        failed_job_ids = []
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except Exception:
+                self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                failed_job_ids.append(job_id)
+
+        self.discard_jobs(failed_job_ids)
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (db_path={self.db_path})>"
@@ -0,0 +1,192 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+
+"""频道租约模块（多进程分片）
+
+机器人主进程与若干 `python main.py --worker` 工作进程共用同一个数据库，
+执行某个频道的总结前必须先在 job_leases 表中取得该频道的租约，
+持有期间后台心跳定期续约；进程崩溃后租约在 LEASE_TTL_SECONDS 内过期，
+其他进程会接手该频道未完成的总结任务。这样各频道的抓取、LLM 调用和发送
+分散在多个进程（多个事件循环、多个账号）中执行，同一频道任何时刻只有一个进程在处理。
+续约失败（租约已被接手）或持续出错到租约过期时，持有者的总结会被取消，不再继续发送。
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+
+from .config import LEASE_TTL_SECONDS, WORKER_ID
+from .database import get_db_manager
+
+logger = logging.getLogger(__name__)
+
+# 取得租约的结果
+LEASE_ACQUIRED = 'acquired'
+LEASE_HELD = 'held'
+LEASE_DONE = 'done'
+
+# 本进程的租约持有者标识
+LEASE_OWNER = f"{WORKER_ID or 'bot'}@{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseLostError(Exception):
+    """持有期间失去了频道租约（已被其他进程接手或续约持续失败至过期）"""
+
+
+class ChannelLease:
+    """一次租约申请的结果；持有者完成总结后将 completed 置为 True"""
+
+    def __init__(self, channel, status):
+        self.channel = channel
+        self.status = status
+        self.completed = False
+        self.lost = False
+        # 本地记录的租约到期时间（单调时钟），每次续约成功后推后
+        self.expires_at = time.monotonic() + LEASE_TTL_SECONDS
+
+    @property
+    def acquired(self):
+        return self.status == LEASE_ACQUIRED
+
+    def check(self):
+        """确认仍持有租约，已失去或已过期时抛出 LeaseLostError"""
+        if self.acquired and (self.lost or time.monotonic() >= self.expires_at):
+            self.lost = True
+            raise LeaseLostError(f"频道 {self.channel} 的租约已失去，停止处理")
+
+
+_current_lease: contextvars.ContextVar = contextvars.ContextVar("current_lease", default=None)
+
+
+def check_current_lease():
+    """在 hold_channel_lease 内调用：确认仍持有租约，否则抛出 LeaseLostError；不在租约内时不做任何事"""
+    lease = _current_lease.get()
+    if lease is not None:
+        lease.check()
+
+
+async def _heartbeat(lease, guarded_task):
+    """每隔 1/3 有效期续约一次，直到被取消
+
+    租约已不属于本进程，或续约持续出错直到本地记录的到期时间，
+    则标记租约已失去并取消正在持有租约执行的任务。
+    """
+    channel = lease.channel
+    interval = LEASE_TTL_SECONDS / 3
+    while True:
+        await asyncio.sleep(interval)
+        renew_started = time.monotonic()
+        try:
+            renewed = get_db_manager().renew_job_lease(channel, LEASE_OWNER, LEASE_TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"频道 {channel} 的租约续约出错: {type(e).__name__}: {e}", exc_info=True)
+            renewed = None
+
+        if renewed:
+            lease.expires_at = renew_started + LEASE_TTL_SECONDS
+            continue
+        if renewed is None and time.monotonic() + interval < lease.expires_at:
+            logger.warning(f"频道 {channel} 的租约续约出错，{interval:.0f} 秒后重试")
+            continue
+
+        lease.lost = True
+        logger.error(f"频道 {channel} 的租约已失去（已被其他进程接手或续约失败至过期），取消本进程的总结")
+        guarded_task.cancel()
+        return
+
+
+@asynccontextmanager
+async def hold_channel_lease(channel, not_before=None):
+    """申请频道租约，持有期间自动续约，退出时释放
+
+    未取得租约时 lease.acquired 为 False，调用方应跳过本次执行。
+    持有期间失去租约时，执行中的任务被取消，退出时抛出 LeaseLostError，且不再释放租约。
+
+    Args:
+        channel: 频道URL
+        not_before: 可选，该时间戳之后已有进程完成过该频道时不再取得租约（用于定时触发去重）
+
+    Yields:
+        ChannelLease: 租约申请结果
+
+    Raises:
+        LeaseLostError: 持有期间失去了租约
+    """
+    db = get_db_manager()
+    status = db.acquire_job_lease(channel, LEASE_OWNER, LEASE_TTL_SECONDS, not_before) or LEASE_HELD
+    lease = ChannelLease(channel, status)
+    if not lease.acquired:
+        yield lease
+        return
+
+    logger.debug("进程 %s 取得频道 %s 的租约", LEASE_OWNER, channel)
+    guarded_task = asyncio.current_task()
+    token = _current_lease.set(lease)
+    heartbeat = asyncio.create_task(_heartbeat(lease, guarded_task))
+    try:
+        yield lease
+    except asyncio.CancelledError:
+        if not lease.lost:
+            raise
+        # 由心跳发起的取消：撤销取消状态，改为抛出 LeaseLostError
+        if hasattr(guarded_task, 'uncancel'):
+            guarded_task.uncancel()
+        raise LeaseLostError(f"频道 {channel} 的租约已失去，总结已取消") from None
+    finally:
+        heartbeat.cancel()
+        _current_lease.reset(token)
+        if not lease.lost:
+            db.release_job_lease(channel, LEASE_OWNER, completed=lease.completed)
+
+
+def lease_skipped_result(channel, lease):
+    """未取得租约时返回的结果字典，格式与 main_job 相同"""
+    if lease.status == LEASE_DONE:
+        details = f"频道 {channel} 本次定时总结已由其他进程完成，跳过"
+    else:
+        details = f"频道 {channel} 的总结正由其他进程执行，跳过"
+    logger.info(details)
+    return {
+        "success": True,
+        "skipped": True,
+        "channel": channel,
+        "message_count": 0,
+        "summary_length": 0,
+        "processing_time": 0.0,
+        "error": None,
+        "details": details
+    }
+
+
+def lease_lost_result(channel, error):
+    """持有期间失去租约时返回的结果字典，格式与 main_job 相同"""
+    return {
+        "success": False,
+        "channel": channel,
+        "message_count": 0,
+        "summary_length": 0,
+        "processing_time": 0.0,
+        "error": str(error),
+        "details": f"频道 {channel} 的租约已被其他进程接手，本进程停止处理"
+    }
@@ -0,0 +1,342 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""多端点 LLM 路由模块
+
+维护多个 OpenAI 兼容端点的 EWMA 延迟与错误率，优先使用最快的健康端点；
+请求失败时自动切换到下一个端点，启用对冲后首选端点超过 p95 延迟仍未返回时
+向次优端点发送重复请求，取先完成的结果。
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional
+
+from .metrics import LLM_REQUEST_DURATION, record_llm_usage
+from .tracing import span
+from .config import (
+    LLM_API_KEY, LLM_BASE_URL, LLM_MODEL, LLM_ENDPOINTS,
+    LLM_HEDGE_ENABLED, LLM_HEDGE_DELAY_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# EWMA 平滑系数（越大越偏向最近的请求）
+EWMA_ALPHA = 0.3
+
+# 计算 p95 所需的最少延迟样本数及保留的样本数
+MIN_LATENCY_SAMPLES = 10
+LATENCY_WINDOW_SIZE = 100
+
+# 连续失败后的冷却时间（秒），随连续失败次数线性增长
+FAILURE_COOLDOWN_SECONDS = 30
+MAX_COOLDOWN_SECONDS = 300
+
+# 错误率对排序分数的放大系数
+ERROR_RATE_PENALTY = 4.0
+
+
+class LLMEndpoint:
+    """单个 OpenAI 兼容端点及其延迟/错误统计"""
+
+    def __init__(self, name: str, base_url: str, api_key: Optional[str], model: str):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self._client = None
+
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW_SIZE)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.hedged_wins = 0
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI 客户端，首次使用时才导入 openai 并创建"""
+        if self._client is None:
+            from openai import OpenAI
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    def is_healthy(self) -> bool:
+        """是否不在失败冷却期内"""
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self) -> float:
+        """排序分数，越小越优先；尚无延迟数据的端点优先探测"""
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.0
+        return latency * (1 + ERROR_RATE_PENALTY * self.error_rate)
+
+    def p95_latency(self) -> Optional[float]:
+        """最近请求的 p95 延迟，样本不足时返回None"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def record_success(self, latency: float):
+        """记录一次成功请求"""
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+            self.error_rate = (1 - EWMA_ALPHA) * self.error_rate
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+
+    def record_failure(self):
+        """记录一次失败请求，并按连续失败次数进入冷却期"""
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_rate
+            self.consecutive_failures += 1
+            cooldown = min(MAX_COOLDOWN_SECONDS, FAILURE_COOLDOWN_SECONDS * self.consecutive_failures)
+            self.cooldown_until = time.monotonic() + cooldown
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取端点统计信息"""
+        return {
+            "name": self.name,
+            "model": self.model,
+            "healthy": self.is_healthy(),
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "p95_latency": self.p95_latency(),
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedged_wins": self.hedged_wins,
+        }
+
+
+class LLMRouter:
+    """按延迟与健康状况在多个端点之间路由 chat.completions 请求"""
+
+    def __init__(self, endpoints: List[LLMEndpoint], hedge_enabled: bool = False,
+                 hedge_delay: float = 60.0):
+        if not endpoints:
+            raise ValueError("LLM路由至少需要一个端点")
+        self.endpoints = endpoints
+        self.hedge_enabled = hedge_enabled
+        self.hedge_delay = hedge_delay
+        self._executor = ThreadPoolExecutor(max_workers=max(4, len(endpoints) * 2),
+                                            thread_name_prefix="llm-router")
+
+    @property
+    def primary(self) -> LLMEndpoint:
+        """配置中的第一个端点"""
+        return self.endpoints[0]
+
+    def ranked_endpoints(self) -> List[LLMEndpoint]:
+        """按优先级排序的端点列表：健康端点按分数排序在前，冷却中的端点在后"""
+        healthy = [e for e in self.endpoints if e.is_healthy()]
+        cooling = [e for e in self.endpoints if not e.is_healthy()]
+        healthy.sort(key=lambda e: e.score())
+        cooling.sort(key=lambda e: e.cooldown_until)
+        return healthy + cooling
+
+    def _call(self, endpoint: LLMEndpoint, messages, **kwargs):
+        """在指定端点上执行一次请求并记录统计"""
+        start = time.monotonic()
+        try:
+            with span("llm_call", endpoint=endpoint.name, model=endpoint.model):
+                response = endpoint.client.chat.completions.create(
+                    model=endpoint.model, messages=messages, **kwargs
+                )
+        except Exception:
+            endpoint.record_failure()
+            LLM_REQUEST_DURATION.observe(time.monotonic() - start, endpoint=endpoint.name, outcome="error")
+            raise
+        latency = time.monotonic() - start
+        endpoint.record_success(latency)
+        LLM_REQUEST_DURATION.observe(latency, endpoint=endpoint.name, outcome="ok")
+        record_llm_usage(endpoint.name, response)
+        return response
+
+    def _hedge_delay_for(self, endpoint: LLMEndpoint) -> float:
+        """对冲等待时间：首选端点的 p95 延迟，样本不足时使用配置的默认值"""
+        p95 = endpoint.p95_latency()
+        return p95 if p95 is not None else self.hedge_delay
+
+    def chat_completion(self, messages, **kwargs):
+        """执行 chat.completions 请求，失败时依次切换端点
+
+        Args:
+            messages: 对话消息列表
+            **kwargs: 透传给 chat.completions.create 的其他参数
+
+        Returns:
+            ChatCompletion: 第一个成功返回的响应
+
+        Raises:
+            Exception: 所有端点均失败时抛出最后一个错误
+        """
+        candidates = self.ranked_endpoints()
+        last_error = None
+
+        while candidates:
+            endpoint = candidates.pop(0)
+            hedge = candidates[0] if self.hedge_enabled and candidates else None
+            attempted = []
+
+            try:
+                if hedge is None:
+                    return self._call(endpoint, messages, **kwargs)
+                return self._call_hedged(endpoint, hedge, attempted, messages, **kwargs)
+            except Exception as e:
+                last_error = e
+                # 已发出过对冲请求的端点不再作为后续候选
+                candidates = [c for c in candidates if c not in attempted]
+                logger.warning(f"LLM端点 {endpoint.name} 请求失败: {type(e).__name__}: {e}"
+                               f"{'，切换到下一个端点' if candidates else ''}")
+
+        raise last_error
+
+    def _call_hedged(self, endpoint: LLMEndpoint, hedge: LLMEndpoint, attempted: list, messages, **kwargs):
+        """向首选端点发送请求，超过对冲延迟仍未返回时同时向对冲端点发送
+
+        Args:
+            endpoint: 首选端点
+            hedge: 对冲端点
+            attempted: 发出对冲请求时会把对冲端点追加到此列表
+
+        Returns:
+            ChatCompletion: 先成功返回的响应
+
+        Raises:
+            Exception: 已发出的请求全部失败时抛出首选端点的错误
+        """
+        # 复制上下文，使工作线程中的请求仍归属当前链路
+        primary_future = self._executor.submit(contextvars.copy_context().run, self._call, endpoint, messages, **kwargs)
+        futures = {primary_future: endpoint}
+
+        delay = self._hedge_delay_for(endpoint)
+        done, _ = wait([primary_future], timeout=delay)
+        if not done:
+            logger.info(f"LLM端点 {endpoint.name} 超过 {delay:.1f} 秒未返回，向 {hedge.name} 发送对冲请求")
+            futures[self._executor.submit(contextvars.copy_context().run, self._call, hedge, messages, **kwargs)] = hedge
+            attempted.append(hedge)
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if futures[future] is hedge:
+                        hedge.hedged_wins += 1
+                    return future.result()
+
+        # 全部失败：优先抛出首选端点的错误，由调用方切换到后续端点
+        raise primary_future.exception()
+
+    def open_stream(self, messages, **kwargs):
+        """打开流式请求，建立连接失败时依次切换端点
+
+        流式请求不做对冲；流在迭代完成后记录延迟，迭代中断时记录失败。
+
+        Args:
+            messages: 对话消息列表
+            **kwargs: 透传给 chat.completions.create 的其他参数
+
+        Returns:
+            iterator: 流式响应块迭代器
+        """
+        last_error = None
+        for endpoint in self.ranked_endpoints():
+            start = time.monotonic()
+            try:
+                stream = endpoint.client.chat.completions.create(
+                    model=endpoint.model, messages=messages, stream=True, **kwargs
+                )
+            except Exception as e:
+                endpoint.record_failure()
+                last_error = e
+                logger.warning(f"LLM端点 {endpoint.name} 流式请求失败: {type(e).__name__}: {e}")
+                continue
+            return self._track_stream(endpoint, stream, start)
+        raise last_error
+
+    @staticmethod
+    def _track_stream(endpoint: LLMEndpoint, stream, start: float):
+        """迭代流式响应并在结束时记录端点统计"""
+        try:
+            for chunk in stream:
+                # 部分接口在最后一个流式块中返回 usage
+                record_llm_usage(endpoint.name, chunk)
+                yield chunk
+        except Exception:
+            endpoint.record_failure()
+            LLM_REQUEST_DURATION.observe(time.monotonic() - start, endpoint=endpoint.name, outcome="error")
+            raise
+        latency = time.monotonic() - start
+        endpoint.record_success(latency)
+        LLM_REQUEST_DURATION.observe(latency, endpoint=endpoint.name, outcome="ok")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """获取所有端点的统计信息（按当前优先级排序）"""
+        return [endpoint.get_stats() for endpoint in self.ranked_endpoints()]
+
+
+def _build_endpoints() -> List[LLMEndpoint]:
+    """根据配置构建端点列表：默认端点在前，LLM_ENDPOINTS 中的端点依次追加
+
+    缺少 base_url 或 model 的配置项会被跳过（validate_config 同时报告该错误）。
+    """
+    endpoints = [LLMEndpoint("default", LLM_BASE_URL, LLM_API_KEY, LLM_MODEL)]
+    for i, item in enumerate(LLM_ENDPOINTS):
+        if not isinstance(item, dict) or not item.get('base_url') or not item.get('model'):
+            logger.error(f"LLM_ENDPOINTS 第 {i + 1} 项缺少 base_url 或 model，已跳过: {item!r}")
+            continue
+        endpoints.append(LLMEndpoint(
+            name=item.get('name') or f"endpoint-{i + 1}",
+            base_url=item['base_url'],
+            api_key=item.get('api_key') or LLM_API_KEY,
+            model=item['model'],
+        ))
+    return endpoints
+
+
+# 全局路由实例
+_global_llm_router = None
+
+
+def get_llm_router() -> LLMRouter:
+    """获取全局 LLM 路由实例（首次调用时创建）"""
+    global _global_llm_router
+    if _global_llm_router is None:
+        endpoints = _build_endpoints()
+        _global_llm_router = LLMRouter(endpoints, LLM_HEDGE_ENABLED, LLM_HEDGE_DELAY_SECONDS)
+        logger.info(f"LLM路由已初始化: {', '.join(f'{e.name}({e.model})' for e in endpoints)}")
+    return _global_llm_router
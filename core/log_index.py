@@ -0,0 +1,185 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""日志段索引
+
+每个日志段（会话目录中的活动日志文件或轮转后压缩的 .gz 段）在索引文件中
+记录一条：路径、所属会话、大小以及首末条日志的时间。
+日志统计和 /cleanlogs 直接读取索引，不再遍历整个日志目录树；
+只有索引中没有记录的会话目录（例如旧版本留下的或异常退出的会话）
+才会在 reconcile() 时被扫描一次补录。
+机器人主进程与工作进程共用同一个日志目录，每次修改索引都在文件锁内
+重新读取磁盘上的索引再写回，不会覆盖其他进程记录的日志段。
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 索引文件名，位于日志根目录
+INDEX_FILENAME = 'index.json'
+
+# 跨进程修改索引时使用的锁文件名
+LOCK_FILENAME = 'index.lock'
+
+# 视为日志段的文件后缀
+SEGMENT_SUFFIXES = ('.log', '.jsonl', '.gz')
+
+
+class LogIndex:
+    """日志段索引，修改在线程锁和文件锁内完成并以原子替换方式落盘"""
+
+    def __init__(self, log_dir: str):
+        self.log_dir = log_dir
+        self.index_path = os.path.join(log_dir, INDEX_FILENAME)
+        self.lock_path = os.path.join(log_dir, LOCK_FILENAME)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        """从磁盘读取索引（每次都重新读取，以包含其他进程的修改）"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return {item['path']: item for item in json.load(f).get('segments', [])}
+        except (FileNotFoundError, ValueError, KeyError):
+            return {}
+
+    def _save(self, segments: Dict[str, Dict]):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'segments': list(segments.values())}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    @contextmanager
+    def _locked(self):
+        """持有跨进程文件锁，产出最新的索引内容，退出时写回"""
+        with self._lock:
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(self.lock_path, 'a+') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    segments = self._load()
+                    yield segments
+                    self._save(segments)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def record_segment(self, path: str, start: float = None, end: float = None):
+        """记录或更新一个日志段
+
+        Args:
+            path: 日志段文件路径
+            start: 段内第一条日志的时间戳，未知时使用文件修改时间
+            end: 段内最后一条日志的时间戳，未知时使用文件修改时间
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._locked() as segments:
+            previous = segments.get(path, {})
+            segments[path] = {
+                'path': path,
+                'session': os.path.basename(os.path.dirname(path)),
+                'size': stat.st_size,
+                'start': start or previous.get('start') or stat.st_mtime,
+                'end': end or stat.st_mtime,
+            }
+
+    def remove_segments(self, paths: List[str]):
+        """从索引中删除日志段"""
+        with self._locked() as segments:
+            for path in paths:
+                segments.pop(path, None)
+
+    def segments(self) -> List[Dict]:
+        """获取所有日志段记录的副本"""
+        with self._lock:
+            return [dict(item) for item in self._load().values()]
+
+    def reconcile(self, skip_session: str = None):
+        """补录索引中缺失的会话目录
+
+        Args:
+            skip_session: 不补录的会话名（当前会话的文件仍在写入，由调用方单独统计）
+        """
+        with self._lock:
+            indexed_sessions = {item['session'] for item in self._load().values()}
+
+        for item in os.listdir(self.log_dir):
+            item_path = os.path.join(self.log_dir, item)
+            if item in indexed_sessions or item == skip_session:
+                continue
+            if not (os.path.isdir(item_path) and '_' in item):
+                continue
+            for filename in os.listdir(item_path):
+                if filename.endswith(SEGMENT_SUFFIXES):
+                    self.record_segment(os.path.join(item_path, filename))
+
+    def sessions(self, segments: List[Dict] = None) -> Dict[str, Dict]:
+        """按会话汇总日志段
+
+        Args:
+            segments: 要汇总的日志段，默认为索引中的全部日志段
+
+        Returns:
+            dict: 会话名 -> {'path', 'name', 'modified', 'size', 'segments'}
+        """
+        result = {}
+        for segment in self.segments() if segments is None else segments:
+            name = segment['session']
+            session = result.setdefault(name, {
+                'path': os.path.join(self.log_dir, name),
+                'name': name,
+                'modified': datetime.fromtimestamp(segment['end']),
+                'size': 0,
+                'segments': [],
+            })
+            session['size'] += segment['size']
+            session['segments'].append(segment)
+            session['modified'] = max(session['modified'], datetime.fromtimestamp(segment['end']))
+        return result
+
+
+_log_index = None
+
+
+def get_log_index() -> LogIndex:
+    """获取全局日志索引实例"""
+    global _log_index
+    if _log_index is None:
+        from .logger_config import LOG_DIR
+        _log_index = LogIndex(LOG_DIR)
+    return _log_index
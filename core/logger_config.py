@@ -6,17 +6,28 @@
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
 import os
+import atexit
+import gzip
+import json
 import logging
 import logging.handlers
-import glob
+import queue
+import shutil
 import sys
+import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple
 
+from .log_index import get_log_index
+
 # 日志配置
 LOG_DIR = os.getenv('LOG_DIR', 'log')
 LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', '30'))
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 单个日志文件超过该大小（字节）后轮转并 gzip 压缩，0 表示不轮转
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+# 是否额外输出结构化 JSON 行日志（events.jsonl）
+LOG_JSON_ENABLED = os.getenv('LOG_JSON_ENABLED', 'true').lower() == 'true'
 
 # 创建基于时间戳的日志目录（每次启动）
 SESSION_DIR = os.path.join(LOG_DIR, datetime.now().strftime('%Y%m%d_%H%M%S'))
@@ -47,6 +58,187 @@ SIMPLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# 文件日志批量刷新：累计条数或距上次刷新的秒数达到阈值时才落盘（ERROR 及以上立即落盘）
+LOG_FLUSH_BATCH = 200
+LOG_FLUSH_INTERVAL = 1.0
+
+
+class BatchedFileHandler(logging.handlers.RotatingFileHandler):
+    """批量写入、按大小轮转的文件处理器
+
+    标准 FileHandler 每条日志都会 flush，这里只写入缓冲区，
+    按条数、时间间隔或日志级别决定何时落盘。
+    落盘后文件超过 max_bytes 时，当前文件被压缩为带时间戳的 .gz 段，
+    并把该段的大小和时间范围写入日志索引。
+    文件在第一条日志写入时才打开，启动时不再为每个处理器创建文件。
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=True, max_bytes=LOG_MAX_BYTES):
+        super().__init__(filename, mode=mode, maxBytes=max_bytes, encoding=encoding, delay=delay)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._segment_start = None
+        self._segment_end = None
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            self._pending += 1
+            if self._segment_start is None:
+                self._segment_start = record.created
+            self._segment_end = record.created
+            if (record.levelno >= logging.ERROR
+                    or self._pending >= LOG_FLUSH_BATCH
+                    or time.monotonic() - self._last_flush >= LOG_FLUSH_INTERVAL):
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        # 只在落盘时检查大小，避免每条日志都 seek/tell
+        if self.maxBytes > 0 and self.stream is not None and self.stream.tell() >= self.maxBytes:
+            self.doRollover()
+
+    def doRollover(self):
+        """将当前文件压缩为 .gz 段并记入索引，然后重新打开空文件"""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        segment_path = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.gz"
+        with open(self.baseFilename, 'rb') as src, gzip.open(segment_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.baseFilename)
+        get_log_index().record_segment(segment_path, self._segment_start, self._segment_end)
+
+        self._segment_start = None
+        self._segment_end = None
+        self.stream = self._open()
+
+    def close(self):
+        super().close()
+        # 关闭时把仍在使用的文件也记入索引
+        if self._segment_end is not None and os.path.exists(self.baseFilename):
+            get_log_index().record_segment(self.baseFilename, self._segment_start, self._segment_end)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """结构化日志格式：每条记录输出一行 JSON
+
+    event 为日志消息本身，channel、stage、duration_ms、trace_id
+    通过 logger.info(..., extra={...}) 传入时一并输出。
+    """
+
+    STRUCTURED_FIELDS = ('channel', 'stage', 'duration_ms', 'trace_id')
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+            'location': f"{record.filename}:{record.lineno}",
+        }
+        for field in self.STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TargetedQueueHandler(logging.handlers.QueueHandler):
+    """挂在 logger 上的队列处理器
+
+    调用方线程只负责把日志记录放入队列，真正的格式化和写入
+    由后台监听线程交给 targets 中的处理器完成。
+    """
+
+    def __init__(self, log_queue, targets):
+        super().__init__(log_queue)
+        self.targets = []
+        for target in targets:
+            self.add_target(target)
+
+    def add_target(self, handler: logging.Handler):
+        """追加一个真实处理器，队列处理器级别取所有目标中的最低级别"""
+        self.targets.append(handler)
+        _all_targets.append(handler)
+        self.setLevel(min(h.level for h in self.targets))
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.log_targets = self.targets
+        return record
+
+
+class _RoutingHandler(logging.Handler):
+    """后台线程中把记录分发给其所属 logger 的真实处理器"""
+
+    def handle(self, record):
+        for target in getattr(record, 'log_targets', ()):
+            if record.levelno >= target.level:
+                target.handle(record)
+        return True
+
+    def flush_all(self):
+        """刷新所有真实处理器和原始标准输出"""
+        for target in list(_all_targets):
+            try:
+                target.flush()
+            except Exception:
+                pass
+        if console_capture is not None:
+            console_capture.flush()
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """队列空闲时顺带刷新缓冲，保证低流量时日志也能及时落盘"""
+
+    def dequeue(self, block):
+        if not block:
+            return self.queue.get(False)
+        while True:
+            try:
+                return self.queue.get(True, LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                _router.flush_all()
+
+
+_log_queue = queue.SimpleQueue()
+_all_targets: List[logging.Handler] = []
+_router = _RoutingHandler()
+_log_listener = _BatchingQueueListener(_log_queue, _router)
+console_capture = None
+
+
+def _attach_handler(logger: logging.Logger, handler: logging.Handler):
+    """将真实处理器挂到 logger 的队列处理器之后，由后台线程写出"""
+    for existing in logger.handlers:
+        if isinstance(existing, _TargetedQueueHandler):
+            existing.add_target(handler)
+            return
+    logger.addHandler(_TargetedQueueHandler(_log_queue, [handler]))
+
+
+# 所有模块共享的结构化日志处理器
+json_handler = None
+if LOG_JSON_ENABLED:
+    json_handler = BatchedFileHandler(os.path.join(SESSION_DIR, 'events.jsonl'), mode='a', encoding='utf-8')
+    json_handler.setLevel(get_log_level(LOG_LEVEL))
+    json_handler.setFormatter(JsonLineFormatter())
+
+
+def stop_log_listener():
+    """停止后台日志线程并写出队列中剩余的日志（幂等）"""
+    if _log_listener._thread is not None:
+        _log_listener.stop()
+        _router.flush_all()
+
 
 def setup_logger(name: str, log_file: str = None, level: int = logging.INFO) -> logging.Logger:
     """配置一个logger实例
@@ -74,17 +266,20 @@ def setup_logger(name: str, log_file: str = None, level: int = logging.INFO) ->
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(logging.Formatter(SIMPLE_FORMAT, DATE_FORMAT))
-    logger.addHandler(console_handler)
+    _attach_handler(logger, console_handler)
     
     # 文件处理器（如果指定了日志文件）
     if log_file:
         log_path = os.path.join(SESSION_DIR, log_file)
         
-        # 使用FileHandler（每次启动都是新文件）
-        file_handler = logging.FileHandler(log_path, mode='a', encoding='utf-8')
+        # 使用批量写入的文件处理器（每次启动都是新文件）
+        file_handler = BatchedFileHandler(log_path, mode='a', encoding='utf-8')
         file_handler.setLevel(level)
         file_handler.setFormatter(logging.Formatter(DETAILED_FORMAT, DATE_FORMAT))
-        logger.addHandler(file_handler)
+        _attach_handler(logger, file_handler)
+    
+    if json_handler is not None:
+        _attach_handler(logger, json_handler)
     
     return logger
 
@@ -103,11 +298,12 @@ def setup_error_logger(name: str, log_file: str = None) -> logging.Logger:
     if log_file:
         log_path = os.path.join(SESSION_DIR, log_file)
         
-        # 使用FileHandler（每次启动都是新文件）
-        error_handler = logging.FileHandler(log_path, mode='a', encoding='utf-8')
+        # 使用批量写入的文件处理器（ERROR 级别会立即落盘）
+        error_handler = BatchedFileHandler(log_path, mode='a', encoding='utf-8')
         error_handler.setLevel(logging.ERROR)
+        error_handler.min_level = logging.ERROR
         error_handler.setFormatter(logging.Formatter(DETAILED_FORMAT, DATE_FORMAT))
-        logger.addHandler(error_handler)
+        _attach_handler(logger, error_handler)
     
     return logger
 
@@ -132,25 +328,29 @@ console_logger.setLevel(logging.INFO)
 console_logger.propagate = False
 
 # 控制台日志文件
-console_file_handler = logging.FileHandler(
+console_file_handler = BatchedFileHandler(
     os.path.join(SESSION_DIR, 'console.log'),
     mode='a',
     encoding='utf-8'
 )
 console_file_handler.setLevel(logging.INFO)
 console_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s', DATE_FORMAT))
-console_logger.addHandler(console_file_handler)
+_attach_handler(console_logger, console_file_handler)
 
 # 创建控制台输出捕获器
 class ConsoleCapture:
-    """捕获控制台输出并记录到console.log"""
+    """捕获控制台输出并记录到console.log
+
+    写入 console.log 经由日志队列完成；原始 stdout 只在遇到换行时刷新，
+    其余由后台日志线程在空闲时统一刷新。
+    """
     
     def __init__(self, original_stdout):
         self.original_stdout = original_stdout
         
     def write(self, text):
         """写入数据"""
-        # 先记录到console.log
+        # 先记录到console.log（仅入队，不阻塞调用方）
         if text and text.strip():
             try:
                 console_logger.info(text.strip())
@@ -161,7 +361,8 @@ class ConsoleCapture:
         if self.original_stdout:
             try:
                 self.original_stdout.write(text)
-                self.original_stdout.flush()
+                if '\n' in text:
+                    self.original_stdout.flush()
             except Exception:
                 pass
     
@@ -189,7 +390,13 @@ for handler in root_logger.handlers[:]:
 console_handler = logging.StreamHandler()
 console_handler.setLevel(get_log_level(LOG_LEVEL))
 console_handler.setFormatter(logging.Formatter(SIMPLE_FORMAT, DATE_FORMAT))
-root_logger.addHandler(console_handler)
+_attach_handler(root_logger, console_handler)
+if json_handler is not None:
+    _attach_handler(root_logger, json_handler)
+
+# 启动后台日志线程；退出时先停止监听线程，再由 logging.shutdown 关闭文件
+_log_listener.start()
+atexit.register(stop_log_listener)
 
 logger = setup_logger(__name__, None, get_log_level(LOG_LEVEL))
 
@@ -214,6 +421,16 @@ def get_current_log_level() -> str:
     return level_str or 'INFO'
 
 
+def _set_handler_level(handler: logging.Handler, level: int):
+    """设置处理器级别；队列处理器同时更新其后的真实处理器（错误日志处理器不低于 ERROR）"""
+    if isinstance(handler, _TargetedQueueHandler):
+        for target in handler.targets:
+            target.setLevel(max(level, getattr(target, 'min_level', logging.NOTSET)))
+        handler.setLevel(min(target.level for target in handler.targets))
+    else:
+        handler.setLevel(level)
+
+
 def update_all_loggers_level(level_str: str):
     """动态更新所有已创建的 logger 及其处理器的级别
     
@@ -242,7 +459,7 @@ def update_all_loggers_level(level_str: str):
             
             # 更新所有处理器的级别
             for handler in logger_obj.handlers:
-                handler.setLevel(level)
+                _set_handler_level(handler, level)
         except Exception as e:
             print(f"更新 logger '{logger_name}' 级别时出错: {e}")
     
@@ -250,76 +467,63 @@ def update_all_loggers_level(level_str: str):
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
     for handler in root_logger.handlers:
-        handler.setLevel(level)
+        _set_handler_level(handler, level)
     
     print(f"已将所有日志级别更新为: {level_str}")
 
 
-def _get_dir_size(dir_path: str) -> int:
+def _collect_segments() -> List[Dict]:
     """
-    计算目录的总大小
-    
-    Args:
-        dir_path: 目录路径
+    收集所有日志段：历史会话来自日志索引，当前会话直接读取文件大小
     
     Returns:
-        int: 目录大小（字节）
-    """
-    return sum(
-        os.path.getsize(os.path.join(dirpath, filename))
-        for dirpath, dirnames, filenames in os.walk(dir_path)
-        for filename in filenames
-    )
-
-
-def _get_session_info(session_path: str, session_name: str) -> dict:
+        list: 日志段列表
     """
-    获取会话目录信息
-    
-    Args:
-        session_path: 会话目录路径
-        session_name: 会话目录名称
-    
-    Returns:
-        dict: 会话信息字典
-    """
-    dir_mtime = datetime.fromtimestamp(os.path.getmtime(session_path))
-    dir_size = _get_dir_size(session_path)
-    return {
-        'path': session_path,
-        'name': session_name,
-        'modified': dir_mtime,
-        'size': dir_size,
-        'size_mb': dir_size / (1024 * 1024)
-    }
+    current_session = os.path.basename(SESSION_DIR)
+    index = get_log_index()
+    index.reconcile(skip_session=current_session)
+    segments = [segment for segment in index.segments() if segment['session'] != current_session]
+    
+    # 当前会话的文件仍在写入，数量固定且很少
+    for filename in os.listdir(SESSION_DIR):
+        path = os.path.join(SESSION_DIR, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        segments.append({
+            'path': path,
+            'session': current_session,
+            'size': stat.st_size,
+            'start': stat.st_mtime,
+            'end': stat.st_mtime
+        })
+    return segments
 
 
-def _get_file_info(log_file: str, session_name: str) -> dict:
+def _get_file_info(segment: Dict) -> dict:
     """
-    获取日志文件信息
+    获取日志段信息
     
     Args:
-        log_file: 日志文件路径
-        session_name: 所属会话名称
+        segment: 日志索引中的日志段记录
     
     Returns:
         dict: 文件信息字典
     """
-    file_size = os.path.getsize(log_file)
-    file_mtime = datetime.fromtimestamp(os.path.getmtime(log_file))
-    file_age = (datetime.now() - file_mtime).days
+    file_mtime = datetime.fromtimestamp(segment['end'])
     return {
-        'path': log_file,
-        'size': file_size,
-        'size_mb': file_size / (1024 * 1024),
+        'path': segment['path'],
+        'size': segment['size'],
+        'size_mb': segment['size'] / (1024 * 1024),
         'modified': file_mtime,
-        'age_days': file_age,
-        'session': session_name
+        'age_days': (datetime.now() - file_mtime).days,
+        'session': segment['session']
     }
 
 
 def get_log_statistics() -> Dict:
-    """获取日志统计信息
+    """获取日志统计信息（基于日志索引，不遍历日志目录树）
     
     Returns:
         包含日志统计信息的字典
@@ -331,25 +535,19 @@ def get_log_statistics() -> Dict:
         'session_dirs': []
     }
     
-    # 遍历日志目录下的所有会话目录
-    for item in os.listdir(LOG_DIR):
-        item_path = os.path.join(LOG_DIR, item)
-        if not (os.path.isdir(item_path) and '_' in item):
-            continue
-        
-        try:
-            # 获取会话信息
-            session_info = _get_session_info(item_path, item)
-            stats['session_dirs'].append(session_info)
-            
-            # 获取目录中的日志文件信息
-            for log_file in glob.glob(os.path.join(item_path, '*.log')):
-                file_info = _get_file_info(log_file, item)
-                stats['total_files'] += 1
-                stats['total_size'] += file_info['size']
-                stats['files'].append(file_info)
-        except Exception:
-            pass
+    sessions = get_log_index().sessions(_collect_segments())
+    for session in sessions.values():
+        stats['session_dirs'].append({
+            'path': session['path'],
+            'name': session['name'],
+            'modified': session['modified'],
+            'size': session['size'],
+            'size_mb': session['size'] / (1024 * 1024)
+        })
+        for segment in session['segments']:
+            stats['total_files'] += 1
+            stats['total_size'] += segment['size']
+            stats['files'].append(_get_file_info(segment))
     
     # 按修改时间排序会话目录
     stats['session_dirs'].sort(key=lambda x: x['modified'], reverse=True)
@@ -366,7 +564,7 @@ def get_log_statistics() -> Dict:
 
 def _find_old_session_dirs(cutoff_date: datetime) -> List[Dict]:
     """
-    查找需要清理的旧会话目录
+    从日志索引中查找需要清理的旧会话目录
     
     Args:
         cutoff_date: 截止日期（会删除早于或等于此日期的目录）
@@ -374,34 +572,20 @@ def _find_old_session_dirs(cutoff_date: datetime) -> List[Dict]:
     Returns:
         list: 旧会话目录列表
     """
-    session_dirs = []
-    for item in os.listdir(LOG_DIR):
-        item_path = os.path.join(LOG_DIR, item)
-        if not (os.path.isdir(item_path) and '_' in item):
-            continue
-        
-        try:
-            # 获取目录的修改时间
-            dir_mtime = datetime.fromtimestamp(os.path.getmtime(item_path))
-            
-            # 使用 <= 而不是 <，这样可以删除早于或等于截止日期的目录
-            if dir_mtime <= cutoff_date:
-                dir_size = _get_dir_size(item_path)
-                session_dirs.append({
-                    'path': item_path,
-                    'name': item,
-                    'modified': dir_mtime,
-                    'size': dir_size
-                })
-        except Exception:
-            pass
-    
-    return session_dirs
+    current_session = os.path.basename(SESSION_DIR)
+    index = get_log_index()
+    index.reconcile(skip_session=current_session)
+    
+    # 使用 <= 而不是 <，这样可以删除早于或等于截止日期的目录
+    return [
+        session for name, session in index.sessions().items()
+        if name != current_session and session['modified'] <= cutoff_date
+    ]
 
 
 def _delete_session_dir(session_dir: Dict) -> tuple:
     """
-    删除会话目录及其所有文件
+    删除会话目录及其所有文件，并从日志索引中移除
     
     Args:
         session_dir: 会话目录信息
@@ -414,20 +598,24 @@ def _delete_session_dir(session_dir: Dict) -> tuple:
     error = None
     
     try:
-        # 删除目录中的所有文件
-        for log_file in glob.glob(os.path.join(session_dir['path'], '*.log')):
-            file_size = os.path.getsize(log_file)
-            os.remove(log_file)
+        for segment in session_dir['segments']:
+            if os.path.exists(segment['path']):
+                os.remove(segment['path'])
             deleted_files.append({
-                'path': log_file,
-                'size': file_size
+                'path': segment['path'],
+                'size': segment['size']
             })
-            total_freed += file_size
+            total_freed += segment['size']
         
-        # 删除空目录
-        os.rmdir(session_dir['path'])
+        # 删除索引之外的残留文件后删除目录
+        if os.path.isdir(session_dir['path']):
+            for filename in os.listdir(session_dir['path']):
+                os.remove(os.path.join(session_dir['path'], filename))
+            os.rmdir(session_dir['path'])
     except Exception as e:
         error = str(e)
+    finally:
+        get_log_index().remove_segments([segment['path'] for segment in deleted_files])
     
     return deleted_files, total_freed, error
 
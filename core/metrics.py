@@ -0,0 +1,443 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""运行指标模块
+
+提供计数器、仪表和直方图三类指标，以 Prometheus 文本格式通过本地 HTTP `/metrics`
+端点暴露，并可生成供 /metrics 命令使用的中文摘要。仅依赖标准库。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒），覆盖数据库查询到整次 AI 请求的耗时范围
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.extend(f'{name}="{_escape_label(value)}"' for name, value in extra.items())
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    """指标基类：按标签值元组保存样本"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    @abstractmethod
+    def _render_samples(self) -> List[str]:
+        """渲染该指标的样本行"""
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """增加计数"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+                for key, value in self.snapshot().items()]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        """设置当前值"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+                for key, value in self.snapshot().items()]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每个标签组合: [各分桶计数..., 总数, 总和]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        """记录一次观测值"""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * len(self.buckets) + [0, 0.0]
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """上下文管理器：记录代码块耗时（异常时同样记录）"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def snapshot(self) -> Dict[Tuple, List[float]]:
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+    def quantile(self, q: float, key: Tuple) -> Optional[float]:
+        """按分桶估算分位数（返回所在分桶的上界）"""
+        state = self.snapshot().get(key)
+        if not state or not state[-2]:
+            return None
+        target = q * state[-2]
+        for i, bound in enumerate(self.buckets):
+            if state[i] >= target:
+                return bound
+        return float('inf')
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for key, state in self.snapshot().items():
+            for i, bound in enumerate(self.buckets):
+                labels = _format_labels(self.labelnames, key, {"le": bound})
+                lines.append(f"{self.name}_bucket{labels} {state[i]}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': '+Inf'})} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式输出所有指标"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取全局指标注册表"""
+    return _registry
+
+
+# ==================== 预定义指标 ====================
+
+MESSAGES_FETCHED = _registry.counter(
+    "sakura_messages_fetched_total", "按频道统计的已抓取文本消息数", ["channel"])
+FETCH_DURATION = _registry.histogram(
+    "sakura_fetch_duration_seconds", "单个频道消息抓取耗时", ["channel"])
+LLM_REQUEST_DURATION = _registry.histogram(
+    "sakura_llm_request_duration_seconds", "LLM 请求耗时", ["endpoint", "outcome"])
+LLM_TOKENS = _registry.counter(
+    "sakura_llm_tokens_total", "LLM 消耗的 token 数", ["endpoint", "type"])
+SEND_QUEUE_DEPTH = _registry.gauge(
+    "sakura_send_queue_depth", "发送调度器当前排队的发送请求数")
+SEND_TOTAL = _registry.counter(
+    "sakura_send_total", "发送调度器处理的发送请求数", ["result"])
+FLOOD_WAIT_SECONDS = _registry.counter(
+    "sakura_flood_wait_seconds_total", "Telegram 要求的 FloodWait 累计秒数")
+DB_QUERY_DURATION = _registry.histogram(
+    "sakura_db_query_duration_seconds", "数据库操作耗时", ["method"])
+JOB_STAGE_DURATION = _registry.histogram(
+    "sakura_job_stage_duration_seconds", "总结任务各阶段耗时", ["stage"])
+ERRORS_TOTAL = _registry.counter(
+    "sakura_errors_total", "记录的错误数", ["type"])
+ADMISSION_WAIT_SECONDS = _registry.histogram(
+    "sakura_admission_wait_seconds", "总结任务在准入队列中的等待时间", ["priority"])
+ADMISSION_QUEUE_DEPTH = _registry.gauge(
+    "sakura_admission_queue_depth", "准入队列中等待执行的总结任务数")
+ADMISSION_DEADLINE_MISSED = _registry.counter(
+    "sakura_admission_deadline_missed_total", "超过截止时间才开始执行的总结任务数")
+FETCH_PROBES = _registry.counter(
+    "sakura_fetch_probe_total", "抓取前预检次数（new 有新消息，skipped 跳过抓取，error 预检失败）", ["result"])
+PREFETCH_CACHE = _registry.counter(
+    "sakura_prefetch_cache_total", "定时总结读取预取缓存的次数（hit 使用缓存，miss 完整抓取）", ["result"])
+READER_FETCHES = _registry.counter(
+    "sakura_reader_fetch_total", "各读取会话抓取频道的次数", ["session", "result"])
+READER_MESSAGES = _registry.counter(
+    "sakura_reader_messages_total", "各读取会话抓取的文本消息数", ["session"])
+READER_FLOOD_WAIT_SECONDS = _registry.counter(
+    "sakura_reader_flood_wait_seconds_total", "各读取会话被要求的 FloodWait 累计秒数", ["session"])
+READER_FLOOD_LIMITED = _registry.gauge(
+    "sakura_reader_flood_limited", "读取会话当前是否处于 FloodWait 限流中（1 为限流）", ["session"])
+
+
+def timed(histogram: Histogram, **labels):
+    """装饰器：记录同步函数的执行耗时"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(endpoint: str, response):
+    """从 LLM 响应的 usage 字段累计 token 数"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    for token_type in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, token_type, None)
+        if value:
+            LLM_TOKENS.inc(value, endpoint=endpoint, type=token_type.split('_')[0])
+
+
+# ==================== 摘要 ====================
+
+def _format_duration(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    if value == float('inf'):
+        return f">{DEFAULT_BUCKETS[-1]}s"
+    return f"{value:.2f}s" if value >= 0.1 else f"{value * 1000:.0f}ms"
+
+
+def _summarize_histogram(histogram: Histogram) -> List[str]:
+    lines = []
+    for key, state in sorted(histogram.snapshot().items()):
+        count, total = state[-2], state[-1]
+        if not count:
+            continue
+        label = "/".join(key) or "全部"
+        lines.append(f"  • {label}: {int(count)} 次，平均 {_format_duration(total / count)}，"
+                     f"p95 ≤ {_format_duration(histogram.quantile(0.95, key))}")
+    return lines
+
+
+def get_metrics_summary() -> str:
+    """生成供 /metrics 命令展示的指标摘要"""
+    sections = []
+
+    stage_lines = _summarize_histogram(JOB_STAGE_DURATION)
+    if stage_lines:
+        sections.append("**总结任务阶段耗时**\n" + "\n".join(stage_lines))
+
+    fetched = MESSAGES_FETCHED.snapshot()
+    fetch_lines = []
+    for key, state in sorted(FETCH_DURATION.snapshot().items()):
+        if state[-2]:
+            fetch_lines.append(f"  • {key[0]}: {int(state[-2])} 次，平均 {_format_duration(state[-1] / state[-2])}，"
+                               f"消息 {int(fetched.get(key, 0))} 条")
+    probes = FETCH_PROBES.snapshot()
+    if probes:
+        fetch_lines.append(f"  • 预检: 有新消息 {int(probes.get(('new',), 0))}，跳过抓取 {int(probes.get(('skipped',), 0))}，"
+                           f"失败 {int(probes.get(('error',), 0))}")
+    prefetch = PREFETCH_CACHE.snapshot()
+    if prefetch:
+        fetch_lines.append(f"  • 预取缓存: 命中 {int(prefetch.get(('hit',), 0))}，完整抓取 {int(prefetch.get(('miss',), 0))}")
+    if fetch_lines:
+        sections.append("**消息抓取**\n" + "\n".join(fetch_lines))
+
+    llm_lines = _summarize_histogram(LLM_REQUEST_DURATION)
+    tokens = LLM_TOKENS.snapshot()
+    if llm_lines or tokens:
+        token_text = "，".join(f"{'/'.join(key)}: {int(value)}" for key, value in sorted(tokens.items()))
+        sections.append("**LLM 请求**\n" + "\n".join(llm_lines) + (f"\n  • tokens {token_text}" if token_text else ""))
+
+    sends = SEND_TOTAL.snapshot()
+    queue_depth = SEND_QUEUE_DEPTH.snapshot().get((), 0)
+    flood_wait = FLOOD_WAIT_SECONDS.snapshot().get((), 0)
+    sections.append(
+        "**消息发送**\n"
+        f"  • 成功 {int(sends.get(('ok',), 0))}，失败 {int(sends.get(('error',), 0))}，"
+        f"当前排队 {int(queue_depth)}\n"
+        f"  • FloodWait 累计 {int(flood_wait)} 秒"
+    )
+
+    admission_lines = _summarize_histogram(ADMISSION_WAIT_SECONDS)
+    if admission_lines:
+        waiting = ADMISSION_QUEUE_DEPTH.snapshot().get((), 0)
+        missed = ADMISSION_DEADLINE_MISSED.snapshot().get((), 0)
+        sections.append("**总结任务排队**\n" + "\n".join(admission_lines)
+                        + f"\n  • 当前排队 {int(waiting)}，超过截止时间 {int(missed)} 次")
+
+    reader_fetches = READER_FETCHES.snapshot()
+    if reader_fetches:
+        reader_messages = READER_MESSAGES.snapshot()
+        reader_flood = READER_FLOOD_WAIT_SECONDS.snapshot()
+        limited = READER_FLOOD_LIMITED.snapshot()
+        reader_lines = []
+        for session in sorted({key[0] for key in reader_fetches}):
+            reader_lines.append(
+                f"  • {session}: 成功 {int(reader_fetches.get((session, 'ok'), 0))}，"
+                f"失败 {int(reader_fetches.get((session, 'error'), 0))}，"
+                f"限流 {int(reader_fetches.get((session, 'flood'), 0))} 次（累计 {int(reader_flood.get((session,), 0))} 秒），"
+                f"消息 {int(reader_messages.get((session,), 0))} 条"
+                + ("，当前限流中" if limited.get((session,)) else "")
+            )
+        sections.append("**读取账号**\n" + "\n".join(reader_lines))
+
+    db_lines = _summarize_histogram(DB_QUERY_DURATION)
+    if db_lines:
+        sections.append("**数据库操作**\n" + "\n".join(db_lines))
+
+    errors = ERRORS_TOTAL.snapshot()
+    if errors:
+        sections.append("**错误**\n" + "\n".join(
+            f"  • {key[0]}: {int(value)}" for key, value in sorted(errors.items(), key=lambda item: -item[1])[:10]))
+
+    return "\n\n".join(sections)
+
+
+# ==================== HTTP 端点 ====================
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """处理一个 HTTP 请求：GET /metrics 返回指标，其余路径返回404"""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # 读完请求头
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if not line or line in (b"\r\n", b"\n"):
+                break
+
+        parts = request_line.decode('latin-1').split()
+        path = parts[1].split('?', 1)[0] if len(parts) >= 2 else ''
+        if len(parts) >= 2 and parts[0] == 'GET' and path == '/metrics':
+            status, body = "200 OK", get_metrics_registry().render().encode('utf-8')
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.debug(f"处理指标请求失败: {type(e).__name__}: {e}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int):
+    """启动本地指标 HTTP 端点
+
+    Args:
+        host: 监听地址
+        port: 监听端口
+
+    Returns:
+        asyncio.AbstractServer: 服务器实例，启动失败时返回None
+    """
+    try:
+        server = await asyncio.start_server(_handle_http, host, port)
+    except OSError as e:
+        logger.error(f"指标端点启动失败 {host}:{port}: {type(e).__name__}: {e}")
+        return None
+    logger.info(f"指标端点已启动: http://{host}:{port}/metrics")
+    return server
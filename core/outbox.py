@@ -0,0 +1,171 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+
+"""总结发送队列（outbox）模块
+
+总结生成后先以 pending 状态写入 summaries 表，再投递到源频道，发送成功后补充消息ID。
+发送失败（网络错误、FloodWait 等）时内容仍在数据库中，由定时运行的 drain_outbox
+按 OUTBOX_RETRY_INTERVAL_SECONDS 间隔重新投递，AI 生成的内容不会因为发送失败而丢失。
+"""
+
+import asyncio
+import json
+import logging
+
+from .config import LLM_MODEL, OUTBOX_MAX_ATTEMPTS
+from .database import get_db_manager
+from .error_handler import record_error
+from .summary_time_manager import add_report_message_ids
+from .telegram import send_report, get_active_client, extract_date_range_from_summary
+
+logger = logging.getLogger(__name__)
+
+# 每个总结记录一把锁，避免总结任务与后台投递同时发送同一条记录
+_delivery_locks = {}
+
+
+def enqueue_summary(channel, channel_name, report_text, message_count, summary_type, poll_data=None):
+    """将报告存入发送队列
+
+    Args:
+        channel: 频道URL
+        channel_name: 频道名称
+        report_text: 完整报告内容（含标题）
+        message_count: 消息数量
+        summary_type: 总结类型 (daily/weekly/manual)
+        poll_data: 随总结生成的投票数据，可选
+
+    Returns:
+        int: 总结记录ID
+
+    Raises:
+        RuntimeError: 写入数据库失败
+    """
+    start_time, end_time = extract_date_range_from_summary(report_text)
+    summary_id = get_db_manager().create_pending_summary(
+        channel_id=channel,
+        channel_name=channel_name,
+        summary_text=report_text,
+        message_count=message_count,
+        start_time=start_time,
+        end_time=end_time,
+        ai_model=LLM_MODEL,
+        summary_type=summary_type,
+        poll_data=json.dumps(poll_data, ensure_ascii=False) if poll_data else None
+    )
+    if not summary_id:
+        raise RuntimeError(f"无法将频道 {channel} 的总结存入发送队列")
+    return summary_id
+
+
+def _delivered_ids(summary):
+    return {
+        "summary_message_ids": summary['summary_message_ids'],
+        "poll_message_id": summary['poll_message_id'],
+        "button_message_id": summary['button_message_id']
+    }
+
+
+async def deliver_summary(summary_id, client=None, skip_admins=True):
+    """投递发送队列中的一条总结，已发送的记录直接返回其消息ID
+
+    Args:
+        summary_id: 总结记录ID
+        client: Telegram客户端实例，为None时使用活动的客户端
+        skip_admins: 是否跳过向管理员发送报告
+
+    Returns:
+        dict: 与 send_report 返回值相同的消息ID字典
+
+    Raises:
+        RuntimeError: 记录不存在或发送失败（失败次数已记录）
+    """
+    lock = _delivery_locks.setdefault(summary_id, asyncio.Lock())
+    try:
+        async with lock:
+            db = get_db_manager()
+            summary = db.get_summary_by_id(summary_id)
+            if summary is None:
+                raise RuntimeError(f"发送队列中不存在总结记录 {summary_id}")
+            if summary['delivery_status'] == 'sent':
+                logger.info(f"总结 {summary_id} 已发送，跳过重复投递")
+                return _delivered_ids(summary)
+
+            poll_data = json.loads(summary['poll_data']) if summary['poll_data'] else None
+            sent_ids = await send_report(
+                summary['summary_text'], summary['channel_id'], client or get_active_client(),
+                skip_admins=skip_admins, message_count=summary['message_count'], poll_data=poll_data
+            )
+
+            if not sent_ids or not sent_ids.get("summary_message_ids"):
+                status = db.record_summary_delivery_failure(summary_id, "未能发送到源频道", OUTBOX_MAX_ATTEMPTS)
+                if status == 'failed':
+                    logger.error(f"总结 {summary_id} 连续 {OUTBOX_MAX_ATTEMPTS} 次发送失败，已停止自动重试，内容保留在数据库中")
+                raise RuntimeError(f"总结 {summary_id} 发送到频道 {summary['channel_id']} 失败，已保留在发送队列中")
+
+            if not db.mark_summary_delivered(
+                summary_id,
+                sent_ids["summary_message_ids"],
+                poll_message_id=sent_ids.get("poll_message_id"),
+                button_message_id=sent_ids.get("button_message_id")
+            ):
+                logger.warning(f"总结 {summary_id} 已发送，但更新发送状态失败")
+            logger.info(f"总结 {summary_id} 已发送，消息ID: {sent_ids['summary_message_ids']}")
+            return sent_ids
+    finally:
+        if not lock.locked():
+            _delivery_locks.pop(summary_id, None)
+
+
+async def drain_outbox():
+    """后台投递：重新发送发送队列中所有等待发送的总结
+
+    由总结任务负责的记录会由任务自行重试，不在此处理。
+    发送成功后把消息ID追加到频道的排除列表，避免下次总结抓取到机器人自己的报告。
+    """
+    pending = get_db_manager().get_pending_summaries()
+    if not pending:
+        return
+
+    logger.info(f"发送队列中有 {len(pending)} 条待发送总结，开始投递")
+    for summary in pending:
+        try:
+            sent_ids = await deliver_summary(summary['id'])
+        except Exception as e:
+            logger.warning(f"发送队列投递总结 {summary['id']} 失败: {type(e).__name__}: {e}")
+            continue
+
+        poll_id = sent_ids.get("poll_message_id")
+        button_id = sent_ids.get("button_message_id")
+        add_report_message_ids(
+            summary['channel_id'],
+            summary_message_ids=sent_ids.get("summary_message_ids", []),
+            poll_message_ids=[poll_id] if poll_id else [],
+            button_message_ids=[button_id] if button_id else []
+        )
+
+
+async def outbox_sender_job():
+    """定时任务入口：投递发送队列"""
+    try:
+        await drain_outbox()
+    except Exception as e:
+        record_error(e, "outbox_sender_job")
+        logger.error(f"发送队列投递任务失败: {type(e).__name__}: {e}", exc_info=True)
@@ -20,6 +20,7 @@
 import logging
 from telethon import Button
 from .config import ADMIN_LIST, get_poll_regeneration, update_poll_regeneration, load_poll_regenerations
+from .single_flight import get_single_flight, poll_regeneration_flight_key
 
 logger = logging.getLogger(__name__)
 
@@ -63,19 +64,28 @@ async def handle_poll_regeneration_callback(event):
         await event.answer("❌ 未找到相关投票数据", alert=True)
         return
 
-    # 4. 确认操作
-    await event.answer("⏳ 正在重新生成投票,请稍候...")
+    # 4. 确认操作（重复点击时合并到正在进行的重新生成，不再重复调用 AI）
+    flight_key = poll_regeneration_flight_key(target_channel, summary_msg_id)
+    if get_single_flight().in_flight(flight_key):
+        await event.answer("⏳ 投票正在重新生成中,请稍候...")
+    else:
+        await event.answer("⏳ 正在重新生成投票,请稍候...")
 
     # 5. 执行重新生成逻辑
     # 注意:regen_data['send_to_channel']决定了原投票发送的位置
     # True = 频道模式, False = 讨论组模式
     # 重新生成的投票必须发送到相同的位置
-    success = await regenerate_poll(
+    success, shared = await get_single_flight().do(
+        flight_key,
+        regenerate_poll,
         client=event.client,
         channel=target_channel,
         summary_msg_id=summary_msg_id,
         regen_data=regen_data
     )
+    if shared:
+        logger.info(f"投票重新生成请求已合并到进行中的任务: channel={target_channel}, summary_id={summary_msg_id}")
+        return
 
     if success:
         logger.info(f"✅ 投票重新生成成功: channel={target_channel}, summary_id={summary_msg_id}")
@@ -0,0 +1,153 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+
+"""消息预取模块
+
+定时总结触发前 PREFETCH_LEAD_MINUTES 分钟，把频道自上次总结以来的消息预先抓取到
+本地缓存（message_cache 表）。定时总结触发时从缓存读取，只需再抓取缓存之后
+最后几分钟的增量消息，触发后的耗时基本只剩 LLM 生成。
+"""
+
+import logging
+from datetime import timedelta, timezone
+
+from apscheduler.triggers.base import BaseTrigger
+
+from .config import PREFETCH_LEAD_MINUTES
+from .database import get_db_manager
+from .error_handler import record_error
+from .metrics import PREFETCH_CACHE
+from .summary_time_manager import get_channel_fetch_window
+from .telegram import fetch_last_week_messages, fetch_channel_records
+
+logger = logging.getLogger(__name__)
+
+
+class LeadTimeTrigger(BaseTrigger):
+    """在另一个触发器每次触发前固定时间触发"""
+
+    __slots__ = 'trigger', 'lead'
+
+    def __init__(self, trigger, lead=None):
+        self.trigger = trigger
+        self.lead = lead if lead is not None else timedelta(minutes=PREFETCH_LEAD_MINUTES)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        previous = previous_fire_time + self.lead if previous_fire_time else None
+        next_fire_time = self.trigger.get_next_fire_time(previous, now + self.lead)
+        return next_fire_time - self.lead if next_fire_time else None
+
+    def __str__(self):
+        return f"{self.trigger} - {self.lead}"
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({self.trigger!r}, lead={self.lead})>"
+
+
+def _timestamp(value):
+    """datetime 转为 Unix 时间戳，不带时区的按 UTC 处理"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+async def prefetch_channel(channel):
+    """把频道自上次总结以来的新消息抓取到本地缓存
+
+    缓存覆盖的起始时间不晚于本次抓取起点时，只抓取缓存中最大消息ID之后的消息，
+    并删除上次总结之前的缓存；否则（如总结时间被清除）清空缓存重新抓取。
+    报告消息照常缓存，读取缓存时再按当时的报告消息ID排除。
+
+    Args:
+        channel: 频道URL
+
+    Returns:
+        int: 本次新缓存的文本消息数量
+    """
+    last_summary_time, _ = get_channel_fetch_window(channel)
+    if last_summary_time is None:
+        logger.debug("频道 %s 还没有总结记录，跳过预取", channel)
+        return 0
+
+    since = _timestamp(last_summary_time)
+    db = get_db_manager()
+    state = db.get_message_cache_state(channel)
+    if state is None or state['cached_since'] is None or state['cached_since'] > since:
+        db.reset_message_cache(channel, since)
+        min_id = 0
+    else:
+        db.trim_message_cache(channel, since)
+        min_id = state['max_message_id']
+
+    records, max_message_id = await fetch_channel_records(channel, last_summary_time, min_id)
+    db.save_cached_messages(
+        channel,
+        [(message_id, _timestamp(posted_at), text) for message_id, posted_at, text in records],
+        max_message_id
+    )
+    logger.info(f"频道 {channel} 预取完成，新缓存 {len(records)} 条消息（从消息ID {min_id} 之后开始）")
+    return len(records)
+
+
+async def prefetch_job(channel):
+    """定时任务入口：在定时总结前预取频道消息"""
+    try:
+        await prefetch_channel(channel)
+    except Exception as e:
+        record_error(e, "prefetch_job")
+        logger.error(f"频道 {channel} 消息预取失败: {type(e).__name__}: {e}", exc_info=True)
+
+
+async def fetch_with_cache(channel, start_time, exclude_ids):
+    """读取预取缓存并补抓缓存之后的增量消息
+
+    缓存不能覆盖完整时间窗口或增量抓取失败时，改为完整抓取。
+
+    Args:
+        channel: 频道URL
+        start_time: 上次总结时间
+        exclude_ids: 需要排除的报告消息ID
+
+    Returns:
+        list: 格式化后的消息列表（按消息ID升序）
+    """
+    state = get_db_manager().get_message_cache_state(channel) if start_time else None
+    if state and state['cached_since'] is not None and state['cached_since'] <= _timestamp(start_time):
+        try:
+            records, _ = await fetch_channel_records(channel, start_time, state['max_message_id'])
+        except Exception as e:
+            logger.warning(f"频道 {channel} 增量抓取失败，改为完整抓取: {type(e).__name__}: {e}")
+        else:
+            # 预取可能与本次读取同时进行，按消息ID合并去重
+            merged = dict(get_db_manager().get_cached_messages(channel, _timestamp(start_time)))
+            cached_count = len(merged)
+            merged.update((message_id, text) for message_id, _, text in records)
+            exclude_ids = set(exclude_ids)
+            PREFETCH_CACHE.inc(result="hit")
+            logger.info(f"频道 {channel} 使用预取缓存 {cached_count} 条消息，增量抓取 {len(records)} 条")
+            return [text for message_id, text in sorted(merged.items()) if message_id not in exclude_ids]
+
+    PREFETCH_CACHE.inc(result="miss")
+    messages_by_channel = await fetch_last_week_messages(
+        [channel],
+        start_time=start_time,
+        report_message_ids={channel: exclude_ids}
+    )
+    return messages_by_channel.get(channel, [])
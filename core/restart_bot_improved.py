@@ -120,11 +120,7 @@ except ImportError:
 except Exception as e:
     print(f"停止进程时出错: {e}")
 
-# 2. 等待端口释放
-print("等待端口释放...")
-time.sleep(3)
-
-# 3. 启动新进程
+# 2. 启动新进程（上面已通过 proc.wait 确认旧进程退出，不再固定等待）
 print("启动新的机器人进程...")
 try:
     # 使用绝对路径启动main.py
@@ -17,124 +17,30 @@
 # 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
+import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 
-from .config import CHANNELS, SEND_REPORT_TO_SOURCE, logger, LLM_MODEL
-from .prompt_manager import load_prompt
-from .summary_time_manager import load_last_summary_time, save_last_summary_time
-from .ai_client import analyze_with_ai
-from .telegram import fetch_last_week_messages, send_report, get_active_client, extract_date_range_from_summary
+from .config import (
+    get_config_snapshot, INCREMENTAL_SUMMARY_ENABLED, INCREMENTAL_INTERVAL_HOURS,
+    SCHEDULER_PERSISTENT_JOBS, SCHEDULER_MISFIRE_GRACE_SECONDS, SCHEDULER_COALESCE,
+    CATCHUP_WINDOW_HOURS, CATCHUP_MAX_CONCURRENCY, PREFETCH_ENABLED
+)
+from .summary_time_manager import load_last_summary_time
 from .database import get_db_manager
+from .error_handler import record_error
+from .admission import get_admission_controller, PRIORITY_SCHEDULED, PRIORITY_CATCH_UP
+from .single_flight import get_single_flight, summary_flight_key
+from .job_store import SQLiteJobStore, PERSISTENT_JOBSTORE
+from .leases import hold_channel_lease, lease_skipped_result, lease_lost_result, LeaseLostError
+from .summary_jobs import run_summary_job
+from .tracing import start_trace
 
 logger = logging.getLogger(__name__)
 
-# 创建全局调度器实例
-scheduler = AsyncIOScheduler(timezone='Asia/Shanghai')
-
-async def init_scheduler():
-    """初始化调度器"""
-    global scheduler
-    logger.info("正在初始化调度器...")
-    
-    # 清理旧的投票重新生成数据（超过30天的）
-    try:
-        deleted_count = cleanup_old_regenerations(days=30)
-        if deleted_count > 0:
-            logger.info(f"已清理 {deleted_count} 条过期的投票重新生成数据")
-    except Exception as e:
-        logger.error(f"清理投票重新生成数据失败: {e}")
-    
-    # 获取频道的调度配置
-    for channel in CHANNELS:
-        from .config import get_channel_schedule
-        schedule_config = get_channel_schedule(channel)
-        
-        if not schedule_config:
-            logger.warning(f"频道 {channel} 没有调度配置，将使用默认配置")
-            continue
-        
-        frequency = schedule_config.get('frequency', 'weekly')
-        hour = schedule_config['hour']
-        minute = schedule_config['minute']
-        
-        # 添加定时任务
-        if frequency == 'daily':
-            # 每天模式
-            job = scheduler.add_job(
-                main_job_wrapper,
-                'interval',
-                days=1,
-                start_date=datetime.now().replace(hour=hour, minute=minute, second=0),
-                kwargs={'channel': channel}
-            )
-            logger.info(f"已为频道 {channel} 添加每天定时任务: {hour:02d}:{minute:02d}")
-        
-        elif frequency == 'weekly':
-            # 每周模式
-            days = schedule_config.get('days', [])
-            day_map = {
-                'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3,
-                'fri': 4, 'sat': 5, 'sun': 6
-            }
-            
-            # APScheduler 的 cron 触发器支持多个星期几，用逗号分隔
-            cron_days = ','.join([str(day_map[day.lower()]) for day in days if day.lower() in day_map])
-            
-            if cron_days:
-                job = scheduler.add_job(
-                    main_job_wrapper,
-                    'cron',
-                    day_of_week=cron_days,
-                    hour=hour,
-                    minute=minute,
-                    kwargs={'channel': channel}
-                )
-                days_cn = '、'.join(days)
-                logger.info(f"已为频道 {channel} 添加每周定时任务: 每周{days_cn} {hour:02d}:{minute:02d}")
-        
-        # 添加清理任务（每天凌晨3点）
-        scheduler.add_job(
-            cleanup_old_regenerations,
-            'interval',
-            days=1,
-            start_date=datetime.now().replace(hour=3, minute=0, second=0)
-        )
-        logger.info("已添加投票重新生成数据清理任务（每天凌晨3点）")
-    
-    logger.info(f"调度器初始化完成，共添加了 {len(scheduler.get_jobs())} 个定时任务")
-    scheduler.start()
-    logger.info("调度器已启动")
-
-
-async def main_job_wrapper(channel):
-    """包装主任务函数，用于调度器调用"""
-    try:
-        # 调用主任务
-        from .telegram import get_active_client
-        client = get_active_client()
-        
-        result = await main_job(channel=channel, client=client)
-        
-        if result['success']:
-            logger.info(f"定时任务执行成功: {result['details']}")
-        else:
-            logger.error(f"定时任务执行失败: {result.get('error', '未知错误')}")
-            
-    except Exception as e:
-        logger.error(f"定时任务执行异常: {type(e).__name__}: {e}", exc_info=True)
-
-
-async def stop_scheduler():
-    """停止调度器"""
-    global scheduler
-    if scheduler.running:
-        scheduler.shutdown(wait=False)
-        logger.info("调度器已停止")
-    else:
-        logger.warning("调度器未在运行")
-
 
 def pause_scheduler():
     """暂停调度器"""
@@ -158,135 +64,421 @@ def resume_scheduler():
         logger.warning("调度器未在运行")
 
 
-async def graceful_restart_scheduler():
-    """优雅重启调度器
-    
-    等待当前运行中的任务完成后再重启调度器。
-    用于配置热重载场景，确保不中断正在进行的总结任务。
+_persistent_store = None
+
+# 定时任务最近一次与之对齐的配置快照；机器人自己写入 config.json 时全局快照会先被替换，
+# 配置重载需要以它为基准计算差异
+_scheduled_snapshot = None
+
+
+def get_scheduled_snapshot():
+    """获取定时任务最近一次对齐的配置快照，尚未注册任务时为 None"""
+    return _scheduled_snapshot
+
+
+def create_scheduler(persistent=None):
+    """创建机器人使用的调度器
+
+    定时总结任务放在持久化存储（SQLite）中，其余维护类任务仍放在内存存储中。
+    所有任务统一使用配置的 misfire_grace_time 与 coalesce。
+
+    Args:
+        persistent: 是否使用持久化存储，默认按 SCHEDULER_PERSISTENT_JOBS；
+                    工作进程传入 False，持久化存储只由机器人主进程使用
+
+    Returns:
+        AsyncIOScheduler: 尚未启动的调度器
     """
-    import asyncio
-    from .config import get_scheduler_instance, CHANNELS, set_scheduler_instance, get_channel_schedule
-    
-    global scheduler
+    global _persistent_store
+
+    if persistent is None:
+        persistent = SCHEDULER_PERSISTENT_JOBS
+
+    jobstores = {'default': MemoryJobStore()}
+    if persistent:
+        _persistent_store = SQLiteJobStore()
+        jobstores[PERSISTENT_JOBSTORE] = _persistent_store
+    else:
+        _persistent_store = None
+
+    return AsyncIOScheduler(
+        jobstores=jobstores,
+        job_defaults={
+            'misfire_grace_time': SCHEDULER_MISFIRE_GRACE_SECONDS,
+            'coalesce': SCHEDULER_COALESCE
+        }
+    )
+
+
+def summary_job_id(channel):
+    """频道定时总结任务的 ID"""
+    return f"summary_job_{channel}"
+
+
+def incremental_job_id(channel):
+    """频道增量摘要任务的 ID"""
+    return f"incremental_job_{channel}"
+
+
+def prefetch_job_id(channel):
+    """频道消息预取任务的 ID"""
+    return f"prefetch_job_{channel}"
+
+
+def prefetch_active():
+    """是否为定时总结注册消息预取任务（增量总结模式下不需要）"""
+    return PREFETCH_ENABLED and not INCREMENTAL_SUMMARY_ENABLED
+
+
+async def scheduled_summary_job(channel):
+    """定时任务入口：错峰延迟后经准入控制执行频道总结
+
+    同一时刻触发的频道按哈希得到固定的延迟，再按截止时间排队获取执行名额，
+    避免所有频道同时抓取消息和调用 LLM。
+
+    Args:
+        channel: 频道URL
+    """
+    controller = get_admission_controller()
+    deadline = controller.default_deadline()
+    fire_time = _scheduled_fire_timestamp(channel)
+
+    jitter = controller.jitter_for(channel)
+    if jitter:
+        logger.debug("频道 %s 的定时总结错峰延迟 %.1f 秒", channel, jitter)
+        await asyncio.sleep(jitter)
+
+    return await run_channel_summary(channel, priority=PRIORITY_SCHEDULED, deadline=deadline,
+                                     not_before=fire_time)
+
+
+def _scheduled_fire_timestamp(channel):
+    """本次定时触发的预定时间（Unix 时间戳）；各进程按相同配置计算得到相同的值，用于租约去重"""
+    from .config import get_scheduler_instance
     scheduler_instance = get_scheduler_instance()
-    
+    timezone_info = scheduler_instance.timezone if scheduler_instance else None
+    trigger = CronTrigger(**dict(get_config_snapshot().channel(channel).cron_trigger), timezone=timezone_info)
+    now = datetime.now(timezone.utc)
+    previous = _previous_fire_time(trigger, now - timedelta(days=8), now)
+    return previous.timestamp() if previous else None
+
+
+async def run_channel_summary(channel, priority=PRIORITY_SCHEDULED, deadline=None, not_before=None):
+    """经单飞、准入控制与频道租约执行单个频道的总结
+
+    同一频道已有总结在进行时（定时、补跑或手动），等待并复用其结果，不再重复抓取消息和调用 LLM。
+    多进程部署时还需取得频道租约：其他进程正在执行，或已完成本次定时触发时跳过。
+
+    Args:
+        channel: 频道URL
+        priority: 准入优先级
+        deadline: 准入截止时间戳
+        not_before: 可选，本次定时触发的预定时间戳
+
+    Returns:
+        dict: main_job 的结果字典
+    """
+    async def run_admitted():
+        async with get_admission_controller().admit(channel, priority=priority, deadline=deadline):
+            try:
+                async with hold_channel_lease(channel, not_before=not_before) as lease:
+                    if not lease.acquired:
+                        return lease_skipped_result(channel, lease)
+                    result = await main_job(channel=channel)
+                    lease.completed = result.get("success", False)
+                    return result
+            except LeaseLostError as e:
+                return lease_lost_result(channel, e)
+
+    result, shared = await get_single_flight().do(summary_flight_key(channel), run_admitted)
+    if shared:
+        logger.info(f"频道 {channel} 已有总结在进行，复用其结果: {result.get('details')}")
+    return result
+
+
+# 持久化任务中保存的定时总结入口引用，与其不一致的已保存任务在启动时会被替换
+SUMMARY_JOB_FUNC_REF = f"{__name__}:scheduled_summary_job"
+
+
+def add_summary_job(scheduler_instance, channel, channel_settings):
+    """为频道添加（或替换）定时总结任务
+
+    Args:
+        scheduler_instance: 调度器实例
+        channel: 频道URL
+        channel_settings: 配置快照中该频道的 ChannelSettings
+    """
+    scheduler_instance.add_job(
+        scheduled_summary_job,
+        'cron',
+        **dict(channel_settings.cron_trigger),
+        args=[channel],
+        id=summary_job_id(channel),
+        jobstore=PERSISTENT_JOBSTORE if _persistent_store else 'default',
+        replace_existing=True
+    )
+
+
+def add_incremental_job(scheduler_instance, channel):
+    """为频道添加（或替换）增量摘要任务"""
+    from .incremental_summary import incremental_digest_job
+    scheduler_instance.add_job(
+        incremental_digest_job,
+        'interval',
+        hours=INCREMENTAL_INTERVAL_HOURS,
+        args=[channel],
+        id=incremental_job_id(channel),
+        replace_existing=True
+    )
+
+
+def add_prefetch_job(scheduler_instance, channel, channel_settings):
+    """为频道添加（或替换）消息预取任务，在每次定时总结前 PREFETCH_LEAD_MINUTES 分钟触发"""
+    from .prefetch import LeadTimeTrigger, prefetch_job
+    trigger = CronTrigger(**dict(channel_settings.cron_trigger), timezone=scheduler_instance.timezone)
+    scheduler_instance.add_job(
+        prefetch_job,
+        LeadTimeTrigger(trigger),
+        args=[channel],
+        id=prefetch_job_id(channel),
+        replace_existing=True
+    )
+
+
+def reconcile_channel_jobs(old_snapshot, new_snapshot, scheduler_instance=None):
+    """按新旧配置快照的差异增量调整频道定时任务
+
+    只处理发生变化的频道：新增频道添加任务，删除的频道移除任务，
+    cron 触发器参数变化的频道改用新触发器，其余任务保持不变。
+    移除或改期任务不会影响正在执行的总结，它们会照常跑完。
+
+    APScheduler 的任务存储操作有锁保护，唤醒调度循环也通过 call_soon_threadsafe，
+    因此可以直接在 Watchdog 线程中调用。
+
+    Args:
+        old_snapshot: 定时任务当前对应的配置快照
+        new_snapshot: 重载后的配置快照
+        scheduler_instance: 调度器实例，默认使用全局实例
+
+    Returns:
+        dict: 各类变更的数量 {'added', 'removed', 'rescheduled', 'unchanged'}；调度器不存在时为 None
+    """
+    global _scheduled_snapshot
+
     if scheduler_instance is None:
-        logger.warning("调度器实例不存在，无法重启")
-        return
-    
-    if not scheduler_instance.running:
-        logger.info("调度器未在运行，无需重启")
+        from .config import get_scheduler_instance
+        scheduler_instance = get_scheduler_instance()
+
+    if scheduler_instance is None:
+        logger.warning("调度器实例不存在，跳过定时任务调整")
+        return None
+
+    old_channels = set(old_snapshot.channels)
+    new_channels = set(new_snapshot.channels)
+    changes = {'added': 0, 'removed': 0, 'rescheduled': 0, 'unchanged': 0}
+
+    for channel in old_channels - new_channels:
+        for job_id in (summary_job_id(channel), incremental_job_id(channel), prefetch_job_id(channel)):
+            if scheduler_instance.get_job(job_id):
+                scheduler_instance.remove_job(job_id)
+        changes['removed'] += 1
+        logger.info(f"频道 {channel} 已从配置中移除，已删除其定时任务")
+
+    for channel in new_snapshot.channels:
+        channel_settings = new_snapshot.channel(channel)
+
+        if channel not in old_channels or scheduler_instance.get_job(summary_job_id(channel)) is None:
+            add_summary_job(scheduler_instance, channel, channel_settings)
+            if INCREMENTAL_SUMMARY_ENABLED:
+                add_incremental_job(scheduler_instance, channel)
+            if prefetch_active():
+                add_prefetch_job(scheduler_instance, channel, channel_settings)
+            changes['added'] += 1
+            logger.info(f"已为频道 {channel} 添加定时任务: {dict(channel_settings.cron_trigger)}")
+            continue
+
+        if channel_settings.cron_trigger == old_snapshot.channel(channel).cron_trigger:
+            changes['unchanged'] += 1
+            continue
+
+        scheduler_instance.reschedule_job(
+            summary_job_id(channel),
+            trigger='cron',
+            **dict(channel_settings.cron_trigger)
+        )
+        if prefetch_active():
+            add_prefetch_job(scheduler_instance, channel, channel_settings)
+        changes['rescheduled'] += 1
+        logger.info(f"频道 {channel} 的定时任务已调整: {dict(channel_settings.cron_trigger)}")
+
+    _scheduled_snapshot = new_snapshot
+    logger.info(
+        f"定时任务调整完成: 新增 {changes['added']}，移除 {changes['removed']}，"
+        f"改期 {changes['rescheduled']}，未变 {changes['unchanged']}"
+    )
+    return changes
+
+
+def register_summary_jobs(scheduler_instance, snapshot):
+    """启动时注册所有频道的定时总结任务
+
+    持久化存储中触发器未变的任务原样保留，调度器启动后会按宽限时间补跑错过的那一次；
+    触发器变化或新增的频道重新添加；已不在配置中的频道的旧任务直接删除。
+
+    Args:
+        scheduler_instance: 尚未启动的调度器
+        snapshot: 当前配置快照
+
+    Returns:
+        set: 会由调度器自行补跑的频道（启动补跑时应跳过）
+    """
+    global _scheduled_snapshot
+
+    stored_states = _persistent_store.stored_job_states() if _persistent_store else {}
+    now = datetime.now(timezone.utc)
+    grace = timedelta(seconds=SCHEDULER_MISFIRE_GRACE_SECONDS)
+    misfire_channels = set()
+    kept = 0
+
+    for channel in snapshot.channels:
+        channel_settings = snapshot.channel(channel)
+        state = stored_states.pop(summary_job_id(channel), None)
+        trigger = CronTrigger(**dict(channel_settings.cron_trigger), timezone=scheduler_instance.timezone)
+
+        if (state is None or state.get('func') != SUMMARY_JOB_FUNC_REF
+                or repr(state.get('trigger')) != repr(trigger)):
+            add_summary_job(scheduler_instance, channel, channel_settings)
+            continue
+
+        kept += 1
+        next_run_time = state.get('next_run_time')
+        if next_run_time and next_run_time <= now and now - next_run_time <= grace:
+            misfire_channels.add(channel)
+            logger.info(f"频道 {channel} 错过了 {next_run_time} 的定时总结，调度器启动后将补跑")
+
+    if _persistent_store and stored_states:
+        _persistent_store.discard_jobs(stored_states)
+        logger.info(f"已删除 {len(stored_states)} 个不在配置中的已保存任务")
+
+    _scheduled_snapshot = snapshot
+    if _persistent_store:
+        logger.info(f"沿用已保存的定时任务 {kept} 个，新增或更新 {len(snapshot.channels) - kept} 个")
+    return misfire_channels
+
+
+def _previous_fire_time(trigger, since, now):
+    """返回触发器在 (since, now] 内最后一次预定运行时间，没有则返回 None"""
+    previous = None
+    fire_time = trigger.get_next_fire_time(None, since)
+    while fire_time and fire_time <= now:
+        previous = fire_time
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+    return previous
+
+
+def find_overdue_channels(snapshot, timezone_info, channels=None):
+    """找出最近一次预定总结未执行的频道
+
+    以 summary_time_manager 记录的上次总结时间为准：早于最近一次预定运行时间即视为超期。
+    从未总结过的频道不会补跑。
+
+    Args:
+        snapshot: 当前配置快照
+        timezone_info: 调度器时区
+        channels: 要检查的频道，默认检查全部频道
+
+    Returns:
+        list: 超期的频道
+    """
+    last_times = load_last_summary_time() or {}
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(hours=CATCHUP_WINDOW_HOURS)
+    overdue = []
+
+    for channel in (snapshot.channels if channels is None else channels):
+        last_time = last_times.get(channel)
+        if last_time is None:
+            continue
+        if last_time.tzinfo is None:
+            last_time = last_time.replace(tzinfo=timezone.utc)
+
+        trigger = CronTrigger(**dict(snapshot.channel(channel).cron_trigger), timezone=timezone_info)
+        previous = _previous_fire_time(trigger, since, now)
+        if previous and last_time < previous:
+            logger.info(f"频道 {channel} 上次总结于 {last_time}，错过了 {previous} 的定时总结")
+            overdue.append(channel)
+
+    return overdue
+
+
+async def catch_up_overdue_summaries(snapshot, timezone_info, skip_channels=()):
+    """启动时补跑超期未执行的频道总结，同时执行的数量不超过 CATCHUP_MAX_CONCURRENCY
+
+    上次运行中断、仍有未完成任务的频道也会在此时从中断的阶段继续。
+
+    Args:
+        snapshot: 当前配置快照
+        timezone_info: 调度器时区
+        skip_channels: 由调度器自行补跑的频道
+    """
+    channels = [channel for channel in snapshot.channels if channel not in skip_channels]
+    overdue = find_overdue_channels(snapshot, timezone_info, channels)
+    unfinished = set(get_db_manager().get_unfinished_summary_job_channels())
+    for channel in channels:
+        if channel in unfinished and channel not in overdue:
+            logger.info(f"频道 {channel} 有未完成的总结任务，将从中断的阶段继续")
+            overdue.append(channel)
+    if not overdue:
+        logger.info("没有需要补跑的频道总结")
         return
-    
-    logger.info("开始优雅重启调度器...")
-    
-    try:
-        # 1. 暂停调度器（不再接受新任务）
-        scheduler_instance.pause()
-        logger.info("调度器已暂停")
-        
-        # 2. 获取正在运行的任务
-        running_jobs = [job for job in scheduler_instance.get_jobs() if job.next_run_time]
-        logger.info(f"当前有 {len(running_jobs)} 个定时任务")
-        
-        # 3. 等待运行中的任务完成（最多30秒）
-        if running_jobs:
-            logger.info("等待当前运行中的任务完成...")
+
+    logger.info(f"开始补跑 {len(overdue)} 个频道的定时总结，最多同时执行 {CATCHUP_MAX_CONCURRENCY} 个")
+    semaphore = asyncio.Semaphore(CATCHUP_MAX_CONCURRENCY)
+
+    async def run_catch_up(channel):
+        async with semaphore:
+            # 等待期间可能已被手动总结或定时任务处理，执行前再确认一次
+            if (get_db_manager().get_active_summary_job(channel) is None
+                    and channel not in find_overdue_channels(snapshot, timezone_info, [channel])):
+                logger.info(f"频道 {channel} 已在等待期间完成总结，跳过补跑")
+                return
             try:
-                # APScheduler 的 pause() 会等待当前执行的任务完成
-                # 我们只需要给一点时间确保任务完成
-                await asyncio.sleep(2.0)
-                logger.info("等待完成")
-            except asyncio.TimeoutError:
-                logger.warning("等待任务完成超时，强制继续")
-        
-        # 4. 停止调度器
-        logger.info("停止调度器...")
-        scheduler_instance.shutdown(wait=False)
-        logger.info("调度器已停止")
-        
-        # 5. 创建新的调度器实例
-        from apscheduler.schedulers.asyncio import AsyncIOScheduler
-        new_scheduler = AsyncIOScheduler(timezone='Asia/Shanghai')
-        
-        # 6. 为每个频道重新添加定时任务
-        logger.info(f"重新加载 {len(CHANNELS)} 个频道的定时任务...")
-        
-        for channel in CHANNELS:
-            schedule_config = get_channel_schedule(channel)
-            
-            if not schedule_config:
-                logger.warning(f"频道 {channel} 没有调度配置，跳过")
-                continue
-            
-            frequency = schedule_config.get('frequency', 'weekly')
-            hour = schedule_config['hour']
-            minute = schedule_config['minute']
-            
-            # 添加定时任务
-            if frequency == 'daily':
-                # 每天模式
-                new_scheduler.add_job(
-                    main_job_wrapper,
-                    'interval',
-                    days=1,
-                    start_date=datetime.now().replace(hour=hour, minute=minute, second=0),
-                    kwargs={'channel': channel}
-                )
-                logger.info(f"已为频道 {channel} 添加每天定时任务: {hour:02d}:{minute:02d}")
-            
-            elif frequency == 'weekly':
-                # 每周模式
-                days = schedule_config.get('days', [])
-                day_map = {
-                    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3,
-                    'fri': 4, 'sat': 5, 'sun': 6
-                }
-                
-                # APScheduler 的 cron 触发器支持多个星期几，用逗号分隔
-                cron_days = ','.join([str(day_map[day.lower()]) for day in days if day.lower() in day_map])
-                
-                if cron_days:
-                    new_scheduler.add_job(
-                        main_job_wrapper,
-                        'cron',
-                        day_of_week=cron_days,
-                        hour=hour,
-                        minute=minute,
-                        kwargs={'channel': channel}
-                    )
-                    days_cn = '、'.join(days)
-                    logger.info(f"已为频道 {channel} 添加每周定时任务: 每周{days_cn} {hour:02d}:{minute:02d}")
-        
-        # 7. 添加清理任务（每天凌晨3点）
-        new_scheduler.add_job(
-            cleanup_old_regenerations,
-            'interval',
-            days=1,
-            start_date=datetime.now().replace(hour=3, minute=0, second=0)
-        )
-        logger.info("已添加投票重新生成数据清理任务（每天凌晨3点）")
-        
-        # 8. 更新全局调度器实例
-        global scheduler
-        scheduler = new_scheduler
-        set_scheduler_instance(new_scheduler)
-        
-        # 9. 启动新调度器
-        new_scheduler.start()
-        logger.info(f"新调度器已启动，共添加了 {len(new_scheduler.get_jobs())} 个定时任务")
-        
-        logger.info("调度器优雅重启完成")
-        
-    except Exception as e:
-        logger.error(f"优雅重启调度器失败: {type(e).__name__}: {e}", exc_info=True)
-        # 尝试恢复原调度器
+                await run_channel_summary(channel, priority=PRIORITY_CATCH_UP)
+            except Exception as e:
+                record_error(e, "catch_up_overdue_summaries")
+                logger.error(f"补跑频道 {channel} 的定时总结失败: {type(e).__name__}: {e}", exc_info=True)
+
+    await asyncio.gather(*(run_catch_up(channel) for channel in overdue))
+    logger.info(f"启动补跑完成，共 {len(overdue)} 个频道")
+
+
+async def reclaim_expired_leases():
+    """接手持有进程已崩溃（租约过期未释放）的频道的未完成总结任务
+
+    由各进程定期执行；多个进程同时发现时由租约保证只有一个进程接手。
+    租约过期后已有进程完成过该频道的，或该频道已没有未完成任务的，只清理租约。
+    """
+    db = get_db_manager()
+    snapshot = get_config_snapshot()
+
+    async def reclaim(lease):
+        channel = lease['channel_id']
+        logger.warning(f"频道 {channel} 的租约持有者 {lease['owner']} 已失联，接手其未完成的总结任务")
         try:
-            if scheduler_instance and not scheduler_instance.running:
-                scheduler_instance.start()
-                logger.info("已恢复原调度器")
-        except Exception as e2:
-            logger.error(f"恢复原调度器失败: {type(e2).__name__}: {e2}")
+            await run_channel_summary(channel, priority=PRIORITY_CATCH_UP, not_before=lease['acquired_at'])
+        except Exception as e:
+            record_error(e, "reclaim_expired_leases")
+            logger.error(f"接手频道 {channel} 的总结任务失败: {type(e).__name__}: {e}", exc_info=True)
+
+    orphaned = []
+    for lease in db.get_expired_job_leases():
+        channel = lease['channel_id']
+        if channel not in snapshot.channels or db.get_active_summary_job(channel) is None:
+            db.release_job_lease(channel, lease['owner'])
+        else:
+            orphaned.append(lease)
+
+    await asyncio.gather(*(reclaim(lease) for lease in orphaned))
 
 
 async def main_job(channel=None, client=None, manual=False):
@@ -310,186 +502,23 @@ async def main_job(channel=None, client=None, manual=False):
             }
     """
     start_time = datetime.now()
+    # 整个任务使用同一个配置快照，避免执行过程中热重载导致前后配置不一致
+    snapshot = get_config_snapshot()
     
     if channel:
         logger.info(f"手动任务启动（单频道模式）: {start_time}, 频道: {channel}")
         channels_to_process = [channel]
     else:
         logger.info(f"定时任务启动（全频道模式）: {start_time}")
-        channels_to_process = CHANNELS
+        channels_to_process = snapshot.channels
     
     try:
         results = []
         
-        # 按频道分别处理
+        # 按频道分别处理：每个频道对应一条持久化的总结任务，崩溃或重启后从最后完成的阶段继续
         for channel in channels_to_process:
-            channel_start_time = datetime.now()
-            
-            # 读取该频道的上次总结时间和报告消息ID
-            channel_summary_data = load_last_summary_time(channel, include_report_ids=True)
-            if channel_summary_data:
-                channel_last_summary_time = channel_summary_data["time"]
-                # 使用新的键名: summary_message_ids
-                # 为了向后兼容,同时支持旧格式
-                if "summary_message_ids" in channel_summary_data:
-                    # 新格式
-                    summary_ids = channel_summary_data["summary_message_ids"]
-                    # 类型检查: 如果summary_ids是字典,说明数据格式错误,需要修复
-                    if isinstance(summary_ids, dict):
-                        logger.warning(f"检测到summary_ids是字典格式,正在修复数据结构: {summary_ids}")
-                        summary_ids = summary_ids.get("summary_message_ids", [])
-                    # 确保是列表
-                    if not isinstance(summary_ids, list):
-                        logger.error(f"summary_ids类型错误: {type(summary_ids)}, 值: {summary_ids}, 使用空列表")
-                        summary_ids = []
-
-                    poll_ids = channel_summary_data.get("poll_message_ids", [])
-                    button_ids = channel_summary_data.get("button_message_ids", [])
-                    # 确保都是列表
-                    if not isinstance(poll_ids, list):
-                        poll_ids = []
-                    if not isinstance(button_ids, list):
-                        button_ids = []
-
-                    # 合并所有消息ID用于排除
-                    report_message_ids_to_exclude = summary_ids + poll_ids + button_ids
-                else:
-                    # 旧格式,使用report_message_ids
-                    report_message_ids_to_exclude = channel_summary_data["report_message_ids"]
-            else:
-                channel_last_summary_time = None
-                report_message_ids_to_exclude = []
-            
-            # 抓取该频道从上次总结时间开始的消息，排除已发送的报告消息
-            messages_by_channel = await fetch_last_week_messages(
-                [channel], 
-                start_time=channel_last_summary_time,
-                report_message_ids={channel: report_message_ids_to_exclude}
-            )
-            
-            # 获取该频道的消息
-            messages = messages_by_channel.get(channel, [])
-            if messages:
-                logger.info(f"开始处理频道 {channel} 的消息")
-                current_prompt = load_prompt()
-                summary = analyze_with_ai(messages, current_prompt)
-                
-                # 获取频道实际名称
-                try:
-                    channel_entity = await client.get_entity(channel)
-                    channel_name = channel_entity.title
-                    logger.info(f"获取到频道实际名称: {channel_name}")
-                except Exception as e:
-                    logger.warning(f"获取频道实体失败，使用链接后缀作为回退: {e}")
-                    channel_name = channel.split('/')[-1]
-                
-                # 获取活动的客户端实例
-                active_client = get_active_client()
-                
-                # 获取频道的调度配置，用于生成报告标题
-                from .config import get_channel_schedule
-                schedule_config = get_channel_schedule(channel)
-                frequency = schedule_config.get('frequency', 'weekly')
-                
-                # 计算起始日期和终止日期
-                end_date = datetime.now(timezone.utc)
-                if channel_last_summary_time:
-                    start_date = channel_last_summary_time
-                else:
-                    start_date = end_date - timedelta(days=7)
-                
-                # 格式化日期为 月.日 格式
-                start_date_str = f"{start_date.month}.{start_date.day}"
-                end_date_str = f"{end_date.month}.{end_date.day}"
-
-                # 根据频率生成报告标题
-                if frequency == 'daily':
-                    report_title = f"{channel_name} 日报 {end_date_str}"
-                else:  # weekly
-                    report_title = f"{channel_name} 周报 {start_date_str}-{end_date_str}"
-
-                # 生成报告文本
-                report_text = f"**{report_title}**\n\n{summary}"
-                
-                # 发送报告给管理员，并根据配置决定是否发送回源频道
-                # 跳过向管理员发送报告，避免重复发送
-                sent_report_ids = []
-                if SEND_REPORT_TO_SOURCE:
-                    sent_report_ids = await send_report(report_text, channel, active_client, skip_admins=True, message_count=len(messages))
-                else:
-                    await send_report(report_text, None, active_client, skip_admins=True, message_count=len(messages))
-                
-                # 保存该频道的本次总结时间和所有相关消息ID
-                if sent_report_ids:
-                    summary_ids = sent_report_ids.get("summary_message_ids", [])
-                    poll_id = sent_report_ids.get("poll_message_id")
-                    button_id = sent_report_ids.get("button_message_id")
-
-                    # 转换单个ID为列表格式
-                    poll_ids = [poll_id] if poll_id else []
-                    button_ids = [button_id] if button_id else []
-
-                    # 保存到数据库
-                    db = get_db_manager()
-                    
-                    # 提取时间范围
-                    start_time_db, end_time_db = extract_date_range_from_summary(report_text)
-                    
-                    summary_id = db.save_summary(
-                        channel_id=channel,
-                        channel_name=channel_name,
-                        summary_text=report_text,
-                        message_count=len(messages),
-                        start_time=start_time_db,
-                        end_time=end_time_db,
-                        summary_message_ids=summary_ids,
-                        poll_message_id=poll_id,
-                        button_message_id=button_id,
-                        ai_model=LLM_MODEL,
-                        summary_type=frequency  # 'daily' 或 'weekly'
-                    )
-
-                    if summary_id:
-                        logger.info(f"定时任务总结已保存到数据库，记录ID: {summary_id}")
-                    else:
-                        logger.warning("保存到数据库失败，但不影响定时任务执行")
-
-                    # 更新总结时间记录（不包含报告消息ID，避免存储过多数据）
-                    save_last_summary_time(
-                        channel,
-                        datetime.now(timezone.utc)
-                    )
-                else:
-                    save_last_summary_time(channel, datetime.now(timezone.utc))
-                    
-                channel_end_time = datetime.now()
-                channel_processing_time = (channel_end_time - channel_start_time).total_seconds()
-                
-                result = {
-                    "success": True,
-                    "channel": channel,
-                    "message_count": len(messages),
-                    "summary_length": len(summary),
-                    "processing_time": channel_processing_time,
-                    "error": None,
-                    "details": f"成功处理频道 {channel}，共 {len(messages)} 条消息，生成 {len(summary)} 字符的总结，处理时间 {channel_processing_time:.2f}秒"
-                }
-                results.append(result)
-                
-            else:
-                logger.info(f"频道 {channel} 没有新消息需要总结")
-                channel_end_time = datetime.now()
-                channel_processing_time = (channel_end_time - channel_start_time).total_seconds()
-                
-                result = {
-                    "success": True,
-                    "channel": channel,
-                    "message_count": 0,
-                    "summary_length": 0,
-                    "processing_time": channel_processing_time,
-                    "error": None,
-                    "details": f"频道 {channel} 没有新消息需要总结，处理时间 {channel_processing_time:.2f}秒"
-                }
+            with start_trace("summary_job", channel=channel, manual=manual):
+                result = await run_summary_job(channel, snapshot, client)
                 results.append(result)
         
         end_time = datetime.now()
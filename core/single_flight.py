@@ -0,0 +1,108 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""单飞（single-flight）模块
+
+同一个键同一时间只允许一次执行：第一个调用者负责执行，
+执行期间到达的调用者不再重复执行，而是等待并共享同一个结果（或异常）。
+用于避免同一频道被定时任务和手动命令同时总结、投票重新生成按钮被重复点击等情况。
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def summary_flight_key(channel: str) -> str:
+    """频道总结的单飞键，定时总结、启动补跑与手动总结共用"""
+    return f"summary:{channel}"
+
+
+def poll_regeneration_flight_key(channel: str, summary_msg_id: int) -> str:
+    """投票重新生成的单飞键"""
+    return f"poll_regen:{channel}:{summary_msg_id}"
+
+
+class SingleFlight:
+    """按键合并并发执行的注册表"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._stats = {
+            "executed_total": 0,
+            "shared_total": 0,
+        }
+
+    def in_flight(self, key: str) -> bool:
+        """该键当前是否有执行中的调用"""
+        return key in self._calls
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Tuple[Any, bool]:
+        """执行 func，同一键已在执行时等待并共享其结果
+
+        Args:
+            key: 单飞键
+            func: 异步函数
+            *args, **kwargs: 传给 func 的参数
+
+        Returns:
+            tuple: (结果, 是否为共享的结果)
+        """
+        existing = self._calls.get(key)
+        if existing is not None:
+            self._stats["shared_total"] += 1
+            logger.info(f"{key} 正在执行中，等待并共享其结果")
+            # shield：等待者被取消时不影响正在执行的调用
+            return await asyncio.shield(existing), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self._stats["executed_total"] += 1
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "Future exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._calls.pop(key, None)
+
+    def get_stats(self) -> dict:
+        """获取单飞统计信息"""
+        return {**self._stats, "in_flight": len(self._calls)}
+
+
+_global_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """获取全局单飞注册表实例（首次调用时创建）"""
+    global _global_single_flight
+    if _global_single_flight is None:
+        _global_single_flight = SingleFlight()
+    return _global_single_flight
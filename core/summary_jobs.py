@@ -0,0 +1,334 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""总结任务队列模块
+
+每次定时总结在数据库 summary_jobs 表中对应一条任务记录，按阶段推进：
+pending → fetched（已抓取消息）→ summarised（已生成总结）→ sent（已发送报告）→ persisted（已保存记录）。
+每完成一个阶段就把结果写回数据库，进程崩溃或重启后从最后完成的阶段继续，
+已经付费完成的 AI 调用不会重做。发送回源频道的报告先存入发送队列（core.outbox）再投递，
+重试时复用同一条总结记录。失败次数达到 SUMMARY_JOB_MAX_ATTEMPTS 后任务进入死信，
+可通过 /jobs 命令查看和重试。
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+
+from .config import (
+    INCREMENTAL_SUMMARY_ENABLED, FETCH_PROBE_ENABLED, PREFETCH_ENABLED, SUMMARY_JOB_MAX_ATTEMPTS
+)
+from .prompt_manager import load_prompt
+from .summary_time_manager import save_last_summary_time, get_channel_fetch_window
+from .ai_client import analyze_channel_messages
+from .telegram import fetch_last_week_messages, probe_new_messages, send_report, get_active_client
+from .database import get_db_manager
+from .incremental_summary import summarize_from_partials
+from .outbox import enqueue_summary, deliver_summary
+from .prefetch import fetch_with_cache
+from .leases import check_current_lease, LeaseLostError
+from .metrics import JOB_STAGE_DURATION
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 任务阶段（state：最后完成的阶段）
+STATE_PENDING = 'pending'
+STATE_FETCHED = 'fetched'
+STATE_SUMMARISED = 'summarised'
+STATE_SENT = 'sent'
+STATE_PERSISTED = 'persisted'
+
+# 任务状态（status）
+STATUS_ACTIVE = 'active'
+STATUS_DONE = 'done'
+STATUS_DEAD = 'dead'
+
+
+@contextmanager
+def _stage(name, channel):
+    """记录总结任务的一个阶段：生成链路子 span，计入阶段耗时指标并输出结构化日志"""
+    start = time.monotonic()
+    with span(name) as stage_span, JOB_STAGE_DURATION.time(stage=name):
+        yield stage_span
+    duration_ms = round((time.monotonic() - start) * 1000, 1)
+    trace = getattr(stage_span, 'trace', None)
+    logger.info(
+        "频道 %s 阶段 %s 完成，耗时 %.0fms", channel, name, duration_ms,
+        extra={'channel': channel, 'stage': name, 'duration_ms': duration_ms,
+               'trace_id': trace.trace_id if trace else None}
+    )
+
+
+def _advance(job, **fields):
+    """把阶段结果写回数据库并返回更新后的任务；写入失败时抛出异常，避免在内存中继续推进"""
+    if not get_db_manager().update_summary_job(job['id'], **fields):
+        raise RuntimeError(f"无法更新总结任务 {job['id']}")
+    return {**job, **fields}
+
+
+async def _fetch_stage(job, snapshot):
+    """抓取自上次总结以来的消息；增量模式下直接合并阶段性摘要"""
+    channel = job['channel_id']
+    last_summary_time, exclude_ids = get_channel_fetch_window(channel)
+    window_start = last_summary_time.isoformat() if last_summary_time else None
+    window_end = datetime.now(timezone.utc).isoformat()
+
+    if INCREMENTAL_SUMMARY_ENABLED:
+        channel_settings = snapshot.channel(channel)
+        with_poll = snapshot.send_report_to_source and channel_settings.poll_enabled
+        with _stage("merge_partials", channel):
+            merged = await summarize_from_partials(channel, load_prompt(), with_poll=with_poll)
+        if not merged:
+            return _advance(job, state=STATE_PERSISTED, status=STATUS_DONE,
+                            window_start=window_start, window_end=window_end, message_count=0)
+
+        # 总结时间只推进到已合并摘要的末尾，合并期间新生成的摘要留给下一次总结
+        summary, poll_data, message_count, window_end = merged
+        _check_summary(summary)
+        return _advance(
+            job, state=STATE_SUMMARISED, window_start=window_start, window_end=window_end,
+            message_count=message_count, summary_text=summary,
+            poll_data=json.dumps(poll_data, ensure_ascii=False) if poll_data else None
+        )
+
+    # 先只读取最新的几条消息，没有新内容时不再分页抓取整个时间窗口
+    if FETCH_PROBE_ENABLED and last_summary_time:
+        with _stage("probe", channel):
+            has_new = await probe_new_messages(channel, last_summary_time, exclude_ids)
+        if not has_new:
+            logger.info(f"频道 {channel} 预检自上次总结以来没有新消息，跳过抓取")
+            return _advance(job, state=STATE_PERSISTED, status=STATUS_DONE,
+                            window_start=window_start, window_end=window_end, message_count=0)
+
+    with _stage("fetch", channel) as fetch_span:
+        if PREFETCH_ENABLED:
+            # 定时总结前已预取到缓存，这里只需补抓缓存之后的增量
+            messages = await fetch_with_cache(channel, last_summary_time, exclude_ids)
+        else:
+            messages_by_channel = await fetch_last_week_messages(
+                [channel],
+                start_time=last_summary_time,
+                report_message_ids={channel: exclude_ids}
+            )
+            messages = messages_by_channel.get(channel, [])
+    fetch_span.set_attribute("message_count", len(messages))
+
+    if not messages:
+        return _advance(job, state=STATE_PERSISTED, status=STATUS_DONE,
+                        window_start=window_start, window_end=window_end, message_count=0)
+
+    return _advance(
+        job, state=STATE_FETCHED, window_start=window_start, window_end=window_end,
+        message_count=len(messages), messages_json=json.dumps(messages, ensure_ascii=False)
+    )
+
+
+def _check_summary(summary):
+    """AI 返回失败提示时抛出异常，计为一次失败而不是把错误信息当作总结发送"""
+    if not summary or summary.startswith("AI 分析失败"):
+        raise RuntimeError(summary or "AI 未返回总结内容")
+
+
+async def _summarise_stage(job, snapshot):
+    """调用 AI 生成总结；完成后清除已不再需要的消息内容"""
+    channel = job['channel_id']
+    channel_settings = snapshot.channel(channel)
+    with_poll = snapshot.send_report_to_source and channel_settings.poll_enabled
+    messages = json.loads(job['messages_json'] or '[]')
+
+    logger.info(f"开始处理频道 {channel} 的消息")
+    with _stage("analyze", channel):
+        summary, poll_data = await asyncio.to_thread(
+            analyze_channel_messages, messages, load_prompt(), with_poll
+        )
+    _check_summary(summary)
+
+    return _advance(
+        job, state=STATE_SUMMARISED, summary_text=summary, messages_json=None,
+        poll_data=json.dumps(poll_data, ensure_ascii=False) if poll_data else None
+    )
+
+
+async def _send_stage(job, snapshot, client):
+    """生成报告，按配置存入发送队列并投递回源频道"""
+    channel = job['channel_id']
+
+    # 获取频道实际名称（实体缓存，解析失败时使用链接后缀作为回退）
+    from .telegram.entity_cache import get_entity_cache
+    with span("entity_resolve"):
+        channel_name = await get_entity_cache().get_title(client, channel)
+    logger.info(f"获取到频道实际名称: {channel_name}")
+
+    # 计算起始日期和终止日期（使用抓取时记录的时间窗口，恢复执行时标题保持一致）
+    end_date = datetime.fromisoformat(job['window_end'])
+    if job['window_start']:
+        start_date = datetime.fromisoformat(job['window_start'])
+    else:
+        start_date = end_date - timedelta(days=7)
+    start_date_str = f"{start_date.month}.{start_date.day}"
+    end_date_str = f"{end_date.month}.{end_date.day}"
+
+    # 根据频率生成报告标题
+    frequency = snapshot.channel(channel).schedule.get('frequency', 'weekly')
+    if frequency == 'daily':
+        report_title = f"{channel_name} 日报 {end_date_str}"
+    else:  # weekly
+        report_title = f"{channel_name} 周报 {start_date_str}-{end_date_str}"
+    report_text = f"**{report_title}**\n\n{job['summary_text']}"
+
+    poll_data = json.loads(job['poll_data']) if job['poll_data'] else None
+    active_client = get_active_client()
+
+    # 发送回源频道前先存入发送队列，发送失败时重试复用同一条记录
+    if snapshot.send_report_to_source and not job['summary_id']:
+        with span("db_save"):
+            summary_id = enqueue_summary(channel, channel_name, report_text, job['message_count'],
+                                         frequency, poll_data=poll_data)
+        job = _advance(job, summary_id=summary_id, channel_name=channel_name, report_text=report_text)
+
+    # 发送报告给管理员，并根据配置决定是否发送回源频道
+    sent_report_ids = []
+    with _stage("send", channel):
+        if snapshot.send_report_to_source:
+            sent_report_ids = await deliver_summary(job['summary_id'], active_client)
+        else:
+            await send_report(report_text, None, active_client, skip_admins=True,
+                              message_count=job['message_count'])
+
+    return _advance(
+        job, state=STATE_SENT, channel_name=channel_name, report_text=report_text,
+        sent_report_ids=json.dumps(sent_report_ids or {})
+    )
+
+
+def _persist_stage(job):
+    """保存本次总结时间（总结记录已由发送队列保存）"""
+    channel = job['channel_id']
+    sent_report_ids = json.loads(job['sent_report_ids'] or '{}')
+    summary_ids = sent_report_ids.get("summary_message_ids", [])
+    poll_id = sent_report_ids.get("poll_message_id")
+    button_id = sent_report_ids.get("button_message_id")
+
+    # 以抓取时刻作为本次总结时间，并排除本次发送的报告消息，恢复执行时不会漏掉之后的新消息
+    with span("state_save"):
+        save_last_summary_time(
+            channel,
+            datetime.fromisoformat(job['window_end']),
+            summary_message_ids=summary_ids,
+            poll_message_ids=[poll_id] if poll_id else [],
+            button_message_ids=[button_id] if button_id else []
+        )
+
+    return _advance(job, state=STATE_PERSISTED, status=STATUS_DONE, last_error=None)
+
+
+async def run_summary_job(channel, snapshot, client=None):
+    """执行（或恢复执行）频道的总结任务
+
+    频道有未完成的任务时从其最后完成的阶段继续，否则创建新任务。
+    任一阶段失败时记录失败次数并抛出异常，达到上限后任务进入死信。
+
+    Args:
+        channel: 频道URL
+        snapshot: 本次任务使用的配置快照
+        client: Telegram客户端实例，为None时使用全局客户端
+
+    Returns:
+        dict: 任务执行结果，格式与 main_job 相同
+    """
+    start_time = datetime.now()
+    client = client or get_active_client()
+    db = get_db_manager()
+
+    job = db.get_active_summary_job(channel)
+    if job:
+        resumed_from = job['state']
+        logger.info(f"频道 {channel} 有未完成的总结任务 {job['id']}，从 {resumed_from} 阶段继续"
+                    f"（已失败 {job['attempts']} 次）")
+    else:
+        resumed_from = None
+        job_id = db.create_summary_job(channel)
+        job = db.get_summary_job(job_id) if job_id else None
+        if job is None:
+            raise RuntimeError(f"无法为频道 {channel} 创建总结任务")
+
+    try:
+        if job['state'] == STATE_PENDING:
+            job = await _fetch_stage(job, snapshot)
+        if job['state'] == STATE_FETCHED:
+            job = await _summarise_stage(job, snapshot)
+        if job['state'] == STATE_SUMMARISED:
+            # 发送前确认仍持有频道租约，避免与接手的进程重复发送
+            check_current_lease()
+            job = await _send_stage(job, snapshot, client)
+        if job['state'] == STATE_SENT:
+            job = _persist_stage(job)
+    except LeaseLostError:
+        # 任务保持在当前阶段，由接手租约的进程继续，不计为失败
+        raise
+    except Exception as e:
+        status = db.record_summary_job_failure(job['id'], f"{type(e).__name__}: {e}", SUMMARY_JOB_MAX_ATTEMPTS)
+        if status == STATUS_DEAD:
+            logger.error(f"频道 {channel} 的总结任务 {job['id']} 在 {job['state']} 阶段之后连续失败 "
+                         f"{SUMMARY_JOB_MAX_ATTEMPTS} 次，已转入死信，可使用 /jobs 查看并重试")
+        raise
+
+    processing_time = (datetime.now() - start_time).total_seconds()
+    message_count = job['message_count'] or 0
+    resumed_text = f"（从 {resumed_from} 阶段恢复）" if resumed_from else ""
+
+    if not message_count:
+        logger.info(f"频道 {channel} 没有新消息需要总结")
+        return {
+            "success": True,
+            "channel": channel,
+            "message_count": 0,
+            "summary_length": 0,
+            "processing_time": processing_time,
+            "error": None,
+            "details": f"频道 {channel} 没有新消息需要总结，处理时间 {processing_time:.2f}秒"
+        }
+
+    JOB_STAGE_DURATION.observe(processing_time, stage="total")
+    summary_length = len(job['summary_text'] or '')
+    return {
+        "success": True,
+        "channel": channel,
+        "message_count": message_count,
+        "summary_length": summary_length,
+        "processing_time": processing_time,
+        "error": None,
+        "details": f"成功处理频道 {channel}{resumed_text}，共 {message_count} 条消息，生成 {summary_length} 字符的总结，处理时间 {processing_time:.2f}秒"
+    }
+
+
+def format_summary_jobs(jobs):
+    """将任务列表格式化为 /jobs 命令展示的文本"""
+    lines = []
+    for job in jobs:
+        line = (f"• #{job['id']} {job['channel_id']}  阶段 {job['state']}，"
+                f"失败 {job['attempts']} 次，更新于 {job['updated_at']}")
+        if job['last_error']:
+            line += f"\n    错误: {job['last_error'][:200]}"
+        lines.append(line)
+    return "\n".join(lines)
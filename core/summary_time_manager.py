@@ -62,14 +62,15 @@ def _load_summary_file():
     """
     from .config import LAST_SUMMARY_FILE
     
-    logger.info(f"开始读取上次总结时间文件: {LAST_SUMMARY_FILE}")
+    logger.debug("开始读取上次总结时间文件: %s", LAST_SUMMARY_FILE)
     
     try:
         with open(LAST_SUMMARY_FILE, "r", encoding="utf-8") as f:
             content = f.read().strip()
             if content:
                 last_data = json.loads(content)
-                logger.info(f"成功读取所有频道的上次总结数据: {last_data}")
+                # 完整数据可能很大，仅在 DEBUG 级别输出
+                logger.debug("成功读取所有频道的上次总结数据: %s", last_data)
                 return last_data
             else:
                 logger.warning(f"上次总结时间文件 {LAST_SUMMARY_FILE} 内容为空")
@@ -101,7 +102,7 @@ def load_last_summary_time(channel=None, include_report_ids=False):
         if channel_data:
             result = _convert_channel_data(channel_data, include_report_ids)
             if not include_report_ids:
-                logger.info(f"成功读取频道 {channel} 的上次总结时间: {result}")
+                logger.debug("成功读取频道 %s 的上次总结时间: %s", channel, result)
             return result
         else:
             logger.warning(f"频道 {channel} 的上次总结时间不存在")
@@ -171,7 +172,7 @@ def save_last_summary_time(channel, time_to_save, summary_message_ids=None, poll
     """
     from .config import LAST_SUMMARY_FILE
 
-    logger.info(f"开始保存频道 {channel} 的上次总结时间到文件: {LAST_SUMMARY_FILE}")
+    logger.debug("开始保存频道 %s 的上次总结时间到文件: %s", channel, LAST_SUMMARY_FILE)
     
     try:
         # 读取现有数据
@@ -199,6 +200,62 @@ def save_last_summary_time(channel, time_to_save, summary_message_ids=None, poll
             json.dump(existing_data, f, ensure_ascii=False, indent=2)
 
         logger.info(f"成功保存频道 {channel} 的上次总结时间: {time_to_save}")
-        logger.debug(f"总结消息ID: {summary_ids}, 投票消息ID: {poll_ids}, 按钮消息ID: {button_ids}")
+        logger.debug("总结消息ID: %s, 投票消息ID: %s, 按钮消息ID: %s", summary_ids, poll_ids, button_ids)
     except Exception as e:
         logger.error(f"保存上次总结时间到文件 {LAST_SUMMARY_FILE} 时出错: {type(e).__name__}: {e}", exc_info=True)
+
+
+def add_report_message_ids(channel, summary_message_ids=None, poll_message_ids=None, button_message_ids=None):
+    """为频道追加需要排除的报告消息ID，不修改上次总结时间
+
+    用于发送队列延后投递的报告：总结时间在生成时已保存，消息ID在发送成功后才得到。
+
+    Args:
+        channel: 频道标识
+        summary_message_ids: 总结消息ID列表
+        poll_message_ids: 投票消息ID列表
+        button_message_ids: 按钮消息ID列表
+    """
+    from .config import LAST_SUMMARY_FILE
+
+    try:
+        existing_data = _load_existing_summary_data()
+        channel_data = existing_data.get(channel)
+        if not channel_data:
+            logger.warning(f"频道 {channel} 没有上次总结记录，跳过追加报告消息ID")
+            return
+
+        for key, ids in (("summary_message_ids", summary_message_ids),
+                         ("poll_message_ids", poll_message_ids),
+                         ("button_message_ids", button_message_ids)):
+            current = _validate_and_convert_ids(channel_data.get(key), key)
+            channel_data[key] = current + [i for i in (ids or []) if i not in current]
+
+        with open(LAST_SUMMARY_FILE, "w", encoding="utf-8") as f:
+            json.dump(existing_data, f, ensure_ascii=False, indent=2)
+
+        logger.info(f"已为频道 {channel} 追加报告消息ID")
+    except Exception as e:
+        logger.error(f"追加报告消息ID到文件 {LAST_SUMMARY_FILE} 时出错: {type(e).__name__}: {e}", exc_info=True)
+
+
+def get_channel_fetch_window(channel):
+    """获取频道本次抓取的起始时间和需要排除的报告消息ID
+
+    Args:
+        channel: 频道标识
+
+    Returns:
+        tuple: (上次总结时间或None, 需要排除的消息ID列表)
+    """
+    channel_summary_data = load_last_summary_time(channel, include_report_ids=True)
+    if not channel_summary_data:
+        return None, []
+
+    # 类型检查: 如果ID列表是字典,说明数据格式错误,需要修复
+    summary_ids = _validate_and_convert_ids(channel_summary_data.get("summary_message_ids"), "summary_message_ids")
+    poll_ids = _validate_and_convert_ids(channel_summary_data.get("poll_message_ids"), "poll_message_ids")
+    button_ids = _validate_and_convert_ids(channel_summary_data.get("button_message_ids"), "button_message_ids")
+
+    # 合并所有消息ID用于排除
+    return channel_summary_data["time"], summary_ids + poll_ids + button_ids
@@ -23,20 +23,34 @@ Telegram客户端模块
 """
 
 # 导入消息抓取相关函数
-from .message_fetcher import fetch_last_week_messages
+from .message_fetcher import fetch_last_week_messages, probe_new_messages, fetch_channel_records
 
 # 导入消息发送相关函数
 from .message_sender import (
     send_report,
     send_long_message,
+    build_message_parts,
+    send_message_parts,
+    update_streaming_message,
+    finalize_streamed_message,
     extract_date_range_from_summary,
     set_active_client,
     get_active_client
 )
 
+# 导入发送调度相关函数
+from .send_scheduler import (
+    get_send_scheduler,
+    get_send_queue_stats
+)
+
+# 导入频道实体缓存相关函数
+from .entity_cache import get_entity_cache
+
 # 导入投票发送相关函数
 from .poll_sender import (
     send_poll,
+    is_poll_enabled,
     send_poll_to_channel,
     send_poll_to_discussion_group
 )
@@ -44,16 +58,30 @@ from .poll_sender import (
 __all__ = [
     # 消息抓取
     'fetch_last_week_messages',
+    'probe_new_messages',
+    'fetch_channel_records',
     
     # 消息发送
     'send_report',
     'send_long_message',
+    'build_message_parts',
+    'send_message_parts',
+    'update_streaming_message',
+    'finalize_streamed_message',
     'extract_date_range_from_summary',
     'set_active_client',
     'get_active_client',
     
+    # 发送调度
+    'get_send_scheduler',
+    'get_send_queue_stats',
+    
+    # 频道实体缓存
+    'get_entity_cache',
+    
     # 投票发送
     'send_poll',
+    'is_poll_enabled',
     'send_poll_to_channel',
     'send_poll_to_discussion_group'
 ]
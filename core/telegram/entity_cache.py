@@ -0,0 +1,283 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""频道实体缓存模块
+
+在进程内缓存频道的 InputPeer、标题和绑定的讨论组ID，带 TTL 与失效机制，
+并持久化到磁盘，重启后无需重新解析即可使用。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+from telethon.tl.types import InputPeerChannel
+
+from ..config import ENTITY_CACHE_FILE, ENTITY_CACHE_TTL_HOURS
+
+logger = logging.getLogger(__name__)
+
+# 启动预热时的最大并发解析数
+WARM_UP_CONCURRENCY = 5
+
+
+@dataclass
+class ChannelEntityInfo:
+    """频道实体缓存条目"""
+    channel: str
+    channel_id: int
+    access_hash: Optional[int]
+    title: str
+    linked_chat_id: Optional[int] = None  # 讨论组ID（超级群组格式），None 表示没有讨论组
+    linked_chat_resolved: bool = False    # 是否已查询过讨论组
+    resolved_at: float = 0.0
+
+    @property
+    def input_peer(self):
+        """构造可直接用于请求的 InputPeerChannel，缺少 access_hash 时返回 None"""
+        if self.access_hash is None:
+            return None
+        return InputPeerChannel(self.channel_id, self.access_hash)
+
+
+class EntityCache:
+    """进程级频道实体缓存"""
+
+    def __init__(self, cache_file: str, ttl_seconds: float):
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, ChannelEntityInfo] = {}
+        self._loaded = False
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        """首次使用时从磁盘加载缓存"""
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for channel, item in data.items():
+                self._entries[channel] = ChannelEntityInfo(**item)
+            logger.info(f"已从 {self.cache_file} 加载 {len(self._entries)} 个频道实体缓存")
+        except Exception as e:
+            logger.warning(f"加载频道实体缓存失败，将重新解析: {type(e).__name__}: {e}")
+            self._entries.clear()
+
+    def _save(self):
+        """将缓存写入磁盘"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            data = {channel: asdict(info) for channel, info in self._entries.items()}
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.warning(f"保存频道实体缓存失败: {type(e).__name__}: {e}")
+
+    # ---------- 查询 ----------
+
+    def _is_fresh(self, info: ChannelEntityInfo) -> bool:
+        return time.time() - info.resolved_at < self.ttl_seconds
+
+    def _get_lock(self, channel: str) -> asyncio.Lock:
+        lock = self._locks.get(channel)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[channel] = lock
+        return lock
+
+    def peek(self, channel: str) -> Optional[ChannelEntityInfo]:
+        """仅查询缓存，不访问网络；过期条目视为不存在"""
+        self._load()
+        info = self._entries.get(channel)
+        if info and self._is_fresh(info):
+            return info
+        return None
+
+    async def resolve(self, client, channel: str, refresh: bool = False) -> Optional[ChannelEntityInfo]:
+        """获取频道实体信息，缓存未命中或过期时通过 get_entity 解析
+
+        Args:
+            client: Telegram客户端实例
+            channel: 频道URL
+            refresh: 是否强制刷新
+
+        Returns:
+            ChannelEntityInfo: 频道实体信息，解析失败返回None
+        """
+        if not refresh:
+            info = self.peek(channel)
+            if info:
+                self._stats["hits"] += 1
+                return info
+
+        async with self._get_lock(channel):
+            # 等待锁期间可能已被其他任务解析
+            if not refresh:
+                info = self.peek(channel)
+                if info:
+                    self._stats["hits"] += 1
+                    return info
+
+            self._stats["misses"] += 1
+            try:
+                entity = await client.get_entity(channel)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"解析频道实体失败: {channel}: {type(e).__name__}: {e}")
+                return None
+
+            old = self._entries.get(channel)
+            info = ChannelEntityInfo(
+                channel=channel,
+                channel_id=entity.id,
+                access_hash=getattr(entity, 'access_hash', None),
+                title=getattr(entity, 'title', None) or channel.split('/')[-1],
+                resolved_at=time.time(),
+            )
+            # 频道ID未变化时保留已查询到的讨论组信息
+            if old and old.channel_id == info.channel_id and old.linked_chat_resolved:
+                info.linked_chat_id = old.linked_chat_id
+                info.linked_chat_resolved = True
+
+            self._entries[channel] = info
+            self._save()
+            logger.debug(f"已缓存频道实体: {channel} -> {info.channel_id} ({info.title})")
+            return info
+
+    async def get_title(self, client, channel: str) -> str:
+        """获取频道标题，解析失败时使用链接后缀作为回退"""
+        info = await self.resolve(client, channel)
+        if info:
+            return info.title
+        return channel.split('/')[-1]
+
+    async def get_input_peer(self, client, channel: str):
+        """获取频道的 InputPeer，解析失败时返回原始频道标识"""
+        info = await self.resolve(client, channel)
+        if info and info.input_peer is not None:
+            return info.input_peer
+        return channel
+
+    async def get_linked_chat_id(self, client, channel: str) -> Optional[int]:
+        """获取频道绑定的讨论组ID（超级群组格式）
+
+        Args:
+            client: Telegram客户端实例
+            channel: 频道URL
+
+        Returns:
+            int: 讨论组ID，频道没有讨论组或查询失败时返回None
+        """
+        info = await self.resolve(client, channel)
+        if not info:
+            return None
+        if info.linked_chat_resolved:
+            return info.linked_chat_id
+
+        from telethon.tl.functions.channels import GetFullChannelRequest
+
+        async with self._get_lock(channel):
+            if info.linked_chat_resolved:
+                return info.linked_chat_id
+            try:
+                peer = info.input_peer if info.input_peer is not None else channel
+                full_info = await client(GetFullChannelRequest(peer))
+                linked_chat_id = getattr(full_info.full_chat, 'linked_chat_id', None)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"获取频道 {channel} 的讨论组ID失败: {e}")
+                return None
+
+            if linked_chat_id and linked_chat_id > 0:
+                # 转换为超级群组格式
+                linked_chat_id = -1000000000000 - linked_chat_id
+
+            info.linked_chat_id = linked_chat_id or None
+            info.linked_chat_resolved = True
+            self._save()
+            return info.linked_chat_id
+
+    # ---------- 维护 ----------
+
+    def invalidate(self, channel: Optional[str] = None):
+        """使缓存失效
+
+        Args:
+            channel: 指定频道URL；为None时清空全部缓存
+        """
+        self._load()
+        if channel:
+            if self._entries.pop(channel, None):
+                logger.info(f"已清除频道 {channel} 的实体缓存")
+        else:
+            self._entries.clear()
+            logger.info("已清除所有频道实体缓存")
+        self._save()
+
+    async def warm_up(self, client, channels):
+        """预热缓存：并发解析所有频道的实体与讨论组
+
+        Args:
+            client: Telegram客户端实例
+            channels: 频道URL列表
+        """
+        if not channels:
+            return
+
+        semaphore = asyncio.Semaphore(WARM_UP_CONCURRENCY)
+
+        async def warm_one(channel):
+            async with semaphore:
+                await self.get_linked_chat_id(client, channel)
+
+        start = time.monotonic()
+        await asyncio.gather(*(warm_one(channel) for channel in channels), return_exceptions=True)
+        resolved = sum(1 for channel in channels if self.peek(channel))
+        logger.info(f"频道实体缓存预热完成: {resolved}/{len(channels)} 个频道，耗时 {time.monotonic() - start:.2f} 秒")
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存命中统计"""
+        return {"entries": len(self._entries), **self._stats}
+
+
+# 全局实体缓存实例
+_global_entity_cache = None
+
+
+def get_entity_cache() -> EntityCache:
+    """获取全局频道实体缓存实例（首次调用时创建）"""
+    global _global_entity_cache
+    if _global_entity_cache is None:
+        _global_entity_cache = EntityCache(ENTITY_CACHE_FILE, ENTITY_CACHE_TTL_HOURS * 3600)
+    return _global_entity_cache
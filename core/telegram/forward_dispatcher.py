@@ -0,0 +1,188 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""讨论组转发消息分发器模块
+
+频道消息会被 Telegram 自动转发到绑定的讨论组。本模块只注册一个常驻事件处理器，
+按 (讨论组ID, 频道ID, 频道消息ID) 索引等待者，收到转发后直接唤醒对应等待者；
+同一频道消息被手动转发到其他会话时不会误匹配。
+转发早于等待注册到达时由最近转发缓冲区命中，事件丢失时按消息ID主动拉取。
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from telethon import events
+
+logger = logging.getLogger(__name__)
+
+# 最近转发缓冲区容量与有效期（秒）
+RECENT_FORWARD_BUFFER_SIZE = 256
+RECENT_FORWARD_TTL_SECONDS = 600
+
+
+class DiscussionForwardDispatcher:
+    """讨论组转发消息分发器"""
+
+    def __init__(self):
+        self._waiters: Dict[Tuple[int, int, int], List[asyncio.Future]] = {}
+        self._recent: "OrderedDict[Tuple[int, int, int], Tuple[object, float]]" = OrderedDict()
+        self._registered_clients = []
+
+    @staticmethod
+    def _extract_key(message) -> Optional[Tuple[int, int]]:
+        """从转发消息中提取 (频道ID, 频道消息ID)，不是频道转发时返回None"""
+        fwd_from = getattr(message, 'fwd_from', None)
+        if not fwd_from:
+            return None
+        from_id = getattr(fwd_from, 'from_id', None)
+        channel_id = getattr(from_id, 'channel_id', None)
+        channel_post = getattr(fwd_from, 'channel_post', None)
+        if channel_id is None or channel_post is None:
+            return None
+        return channel_id, channel_post
+
+    def register(self, client):
+        """在客户端上注册常驻转发事件处理器（同一客户端只注册一次）"""
+        if any(registered is client for registered in self._registered_clients):
+            return
+        client.add_event_handler(
+            self._on_new_message,
+            events.NewMessage(func=lambda e: self._extract_key(e.message) is not None)
+        )
+        self._registered_clients.append(client)
+        logger.info("讨论组转发分发器已注册")
+
+    def _remember(self, key: Tuple[int, int, int], message):
+        """记录最近的转发消息，并淘汰过期或超出容量的条目"""
+        now = time.monotonic()
+        self._recent[key] = (message, now)
+        self._recent.move_to_end(key)
+        while self._recent:
+            oldest_key, (_, seen_at) = next(iter(self._recent.items()))
+            if len(self._recent) > RECENT_FORWARD_BUFFER_SIZE or now - seen_at > RECENT_FORWARD_TTL_SECONDS:
+                self._recent.popitem(last=False)
+            else:
+                break
+
+    def _pop_recent(self, key: Tuple[int, int, int]):
+        """取出缓冲区中未过期的转发消息"""
+        item = self._recent.pop(key, None)
+        if item and time.monotonic() - item[1] <= RECENT_FORWARD_TTL_SECONDS:
+            return item[0]
+        return None
+
+    async def _on_new_message(self, event):
+        """常驻事件处理器：唤醒等待者或写入缓冲区"""
+        forward_key = self._extract_key(event.message)
+        if forward_key is None or event.chat_id is None:
+            return
+
+        key = (event.chat_id, *forward_key)
+        futures = [future for future in self._waiters.pop(key, []) if not future.done()]
+        if futures:
+            logger.info(f"收到转发消息，讨论组消息ID: {event.message.id}")
+            for future in futures:
+                future.set_result(event.message)
+        else:
+            self._remember(key, event.message)
+
+    async def _fetch_forward(self, client, channel_peer, channel_post):
+        """事件丢失时通过 GetDiscussionMessageRequest 主动获取讨论组中的转发消息"""
+        from telethon.tl.functions.messages import GetDiscussionMessageRequest
+
+        try:
+            result = await client(GetDiscussionMessageRequest(peer=channel_peer, msg_id=channel_post))
+        except Exception as e:
+            logger.warning(f"主动获取讨论组转发消息失败: {type(e).__name__}: {e}")
+            return None
+
+        for message in getattr(result, 'messages', []):
+            fwd_from = getattr(message, 'fwd_from', None)
+            if fwd_from and getattr(fwd_from, 'channel_post', None) == channel_post:
+                return message
+        # 部分情况下讨论消息不带 fwd_from，第一条即为讨论组中的对应消息
+        messages = getattr(result, 'messages', [])
+        return messages[0] if messages else None
+
+    async def wait_for_forward(self, client, channel_peer, discussion_group_id, channel_id, channel_post,
+                               timeout=10):
+        """等待频道消息被转发到讨论组
+
+        同一条频道消息可以有多个等待者，收到转发后全部唤醒。
+
+        Args:
+            client: Telegram客户端实例
+            channel_peer: 频道的 InputPeer 或URL，用于事件丢失时主动拉取
+            discussion_group_id: 讨论组ID（超级群组格式），只接受该会话中的转发
+            channel_id: 频道ID
+            channel_post: 频道中的消息ID
+            timeout: 等待事件的最长秒数
+
+        Returns:
+            Message: 讨论组中的转发消息
+
+        Raises:
+            asyncio.TimeoutError: 等待超时且主动拉取也失败
+        """
+        self.register(client)
+        key = (discussion_group_id, channel_id, channel_post)
+
+        message = self._pop_recent(key)
+        if message is not None:
+            logger.info(f"转发消息已提前到达，讨论组消息ID: {message.id}")
+            return message
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"等待转发消息超时（{timeout}秒），尝试按消息ID主动获取")
+        finally:
+            futures = self._waiters.get(key)
+            if futures and future in futures:
+                futures.remove(future)
+                if not futures:
+                    del self._waiters[key]
+
+        message = await self._fetch_forward(client, channel_peer, channel_post)
+        if message is None:
+            raise asyncio.TimeoutError()
+        logger.info(f"已主动获取讨论组转发消息，ID: {message.id}")
+        return message
+
+    def get_stats(self):
+        """获取分发器状态"""
+        return {"waiting": sum(len(futures) for futures in self._waiters.values()), "buffered": len(self._recent)}
+
+
+# 全局分发器实例
+_global_forward_dispatcher = None
+
+
+def get_forward_dispatcher() -> DiscussionForwardDispatcher:
+    """获取全局讨论组转发分发器实例"""
+    global _global_forward_dispatcher
+    if _global_forward_dispatcher is None:
+        _global_forward_dispatcher = DiscussionForwardDispatcher()
+    return _global_forward_dispatcher
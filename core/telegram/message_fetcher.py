@@ -17,100 +17,288 @@
 # 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta, timezone
-from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 
-from ..config import (
-    API_ID, API_HASH, CHANNELS, SESSION_NAME_PATH
-)
+from ..config import get_config_snapshot
 from ..error_handler import retry_with_backoff, record_error
+from ..metrics import MESSAGES_FETCHED, FETCH_DURATION, FETCH_PROBES, READER_FETCHES, READER_MESSAGES
+from .session_pool import get_reader_pool, session_label
 
 logger = logging.getLogger(__name__)
 
 
+async def _fetch_channel(client, channel, start_time, exclude_ids, min_id=0):
+    """用指定客户端抓取单个频道自 start_time 以来的文本消息
+
+    Args:
+        min_id: 只抓取ID大于该值的消息（已缓存到该ID时只抓取增量）
+
+    Returns:
+        tuple: (消息记录列表 [(消息ID, 发送时间, 格式化文本)], 处理的消息总数, 处理到的最大消息ID)
+    """
+    channel_messages = []
+    channel_message_count = 0
+    skipped_report_count = 0
+    max_message_id = min_id
+    logger.info(f"开始抓取频道: {channel}")
+    logger.debug("频道 %s 要排除的报告消息ID列表: %s", channel, exclude_ids)
+    exclude_ids = set(exclude_ids)
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    # 动态获取频道名用于生成链接
+    channel_part = channel.split('/')[-1]
+
+    async for message in client.iter_messages(channel, offset_date=start_time, reverse=True, min_id=min_id):
+        channel_message_count += 1
+        max_message_id = max(max_message_id, message.id)
+
+        # 跳过报告消息
+        if message.id in exclude_ids:
+            skipped_report_count += 1
+            if debug_enabled:
+                logger.debug("跳过报告消息，ID: %s", message.id)
+            continue
+
+        if message.text:
+            msg_link = f"https://t.me/{channel_part}/{message.id}"
+            channel_messages.append((message.id, message.date, f"内容: {message.text[:500]}\n链接: {msg_link}"))
+
+            # 每抓取10条消息记录一次日志
+            if debug_enabled and len(channel_messages) % 10 == 0:
+                logger.debug("频道 %s 已抓取 %d 条有效消息", channel, len(channel_messages))
+
+    logger.info(f"频道 {channel} 抓取完成，共处理 {channel_message_count} 条消息，其中 {len(channel_messages)} 条包含文本内容，跳过了 {skipped_report_count} 条报告消息")
+    return channel_messages, channel_message_count, max_message_id
+
+
+async def _fetch_with_session(session_path, channels, start_time, report_message_ids, pool):
+    """用一个读取会话依次抓取分配给它的频道
+
+    会话被 FloodWait 限流或无法连接时停止使用该会话，本会话尚未完成的频道交由调用方改用其他会话。
+
+    Returns:
+        tuple: (按频道分组的消息字典, 需要改用其他会话的频道列表, 处理的消息总数)
+    """
+    label = session_label(session_path)
+    messages_by_channel = {}
+    total_message_count = 0
+
+    try:
+        client = await pool.get_client(session_path)
+    except Exception as e:
+        READER_FETCHES.inc(session=label, result="error")
+        record_error(e, f"reader_session_connect_{label}")
+        logger.error(f"读取会话 {label} 连接失败: {type(e).__name__}: {e}")
+        pool.mark_unavailable(session_path)
+        return messages_by_channel, list(channels), total_message_count
+
+    for index, channel in enumerate(channels):
+        channel_fetch_start = time.monotonic()
+        try:
+            channel_records, channel_message_count, _ = await _fetch_channel(
+                client, channel, start_time, report_message_ids.get(channel, [])
+            )
+        except FloodWaitError as e:
+            READER_FETCHES.inc(session=label, result="flood")
+            pool.mark_flood(session_path, e.seconds)
+            return messages_by_channel, channels[index:], total_message_count
+        except Exception as e:
+            READER_FETCHES.inc(session=label, result="error")
+            record_error(e, f"fetch_messages_channel_{channel}")
+            logger.error(f"抓取频道 {channel} 消息时出错: {e}")
+            # 继续处理其他频道
+            continue
+
+        channel_messages = [text for _, _, text in channel_records]
+        READER_FETCHES.inc(session=label, result="ok")
+        READER_MESSAGES.inc(len(channel_messages), session=label)
+        FETCH_DURATION.observe(time.monotonic() - channel_fetch_start, channel=channel)
+        MESSAGES_FETCHED.inc(len(channel_messages), channel=channel)
+
+        # 将当前频道的消息添加到字典中
+        messages_by_channel[channel] = channel_messages
+        total_message_count += channel_message_count
+
+    return messages_by_channel, [], total_message_count
+
+
+async def fetch_channel_records(channel, start_time, min_id=0):
+    """抓取单个频道 start_time 之后、ID 大于 min_id 的文本消息记录（供消息预取缓存使用）
+
+    报告消息不在此处排除，由读取缓存的一方按当时的报告消息ID过滤。
+    使用频道哈希分配的读取会话，被 FloodWait 限流时改用下一个可用会话。
+
+    Args:
+        channel: 频道URL
+        start_time: 开始抓取的时间
+        min_id: 只抓取ID大于该值的消息
+
+    Returns:
+        tuple: (消息记录列表 [(消息ID, 发送时间, 格式化文本)], 处理到的最大消息ID)
+    """
+    pool = get_reader_pool()
+    tried_sessions = set()
+
+    while True:
+        session_path = pool.pick(channel, exclude=tried_sessions)
+        if session_path is None:
+            raise RuntimeError(f"频道 {channel} 没有可用的读取会话（均处于 FloodWait 限流中）")
+        tried_sessions.add(session_path)
+        label = session_label(session_path)
+
+        fetch_start = time.monotonic()
+        try:
+            client = await pool.get_client(session_path)
+            records, _, max_message_id = await _fetch_channel(client, channel, start_time, (), min_id)
+        except FloodWaitError as e:
+            READER_FETCHES.inc(session=label, result="flood")
+            pool.mark_flood(session_path, e.seconds)
+            continue
+        except Exception:
+            READER_FETCHES.inc(session=label, result="error")
+            raise
+
+        READER_FETCHES.inc(session=label, result="ok")
+        READER_MESSAGES.inc(len(records), session=label)
+        FETCH_DURATION.observe(time.monotonic() - fetch_start, channel=channel)
+        MESSAGES_FETCHED.inc(len(records), channel=channel)
+        return records, max_message_id
+
+
+# 预检最多读取的消息数（单次 GetHistory 的上限）
+PROBE_MAX_MESSAGES = 100
+
+
+async def probe_new_messages(channel, since, exclude_ids=()):
+    """预检频道自 since 以来是否有新消息（机器人发送的报告消息不算）
+
+    只发出一次 GetHistory 请求，读取最新的 报告消息数+1 条消息，
+    取其中最新的一条非报告消息与 since 比较，无需分页抓取整个时间窗口。
+
+    Args:
+        channel: 频道URL
+        since: 上次总结时间
+        exclude_ids: 需要排除的报告消息ID
+
+    Returns:
+        bool: 有新消息或无法确定时返回True，确定没有新消息时返回False
+    """
+    if since is None:
+        return True
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    pool = get_reader_pool()
+    session_path = pool.pick(channel)
+    if session_path is None:
+        FETCH_PROBES.inc(result="error")
+        return True
+
+    exclude_ids = set(exclude_ids)
+    limit = min(len(exclude_ids) + 1, PROBE_MAX_MESSAGES)
+    try:
+        client = await pool.get_client(session_path)
+        messages = await client.get_messages(channel, limit=limit)
+    except FloodWaitError as e:
+        pool.mark_flood(session_path, e.seconds)
+        FETCH_PROBES.inc(result="error")
+        return True
+    except Exception as e:
+        logger.warning(f"预检频道 {channel} 最新消息失败，改为完整抓取: {type(e).__name__}: {e}")
+        FETCH_PROBES.inc(result="error")
+        return True
+
+    latest = next((message for message in messages if message.id not in exclude_ids), None)
+    if latest is None:
+        # 读到的全是报告消息：不足 limit 条说明频道没有其他消息，否则无法确定
+        has_new = len(messages) >= limit
+    else:
+        has_new = latest.date > since
+
+    FETCH_PROBES.inc(result="new" if has_new else "skipped")
+    logger.debug("频道 %s 预检结果: %s（最新消息 %s）", channel, "有新消息" if has_new else "无新消息",
+                 latest.date if latest else None)
+    return has_new
+
+
 @retry_with_backoff(
     max_retries=3,
     base_delay=2.0,
     max_delay=60.0,
     exponential_backoff=True,
-    retry_on_exceptions=(ConnectionError, TimeoutError, Exception)
+    dependency="telegram"
 )
 async def fetch_last_week_messages(channels_to_fetch=None, start_time=None, report_message_ids=None):
     """抓取指定时间范围的频道消息
+
+    频道按读取会话池的一致性哈希分配到各个会话，不同会话并行抓取；
+    某个会话被 FloodWait 限流或无法连接时，其未完成的频道改用下一个可用会话。
     
     Args:
         channels_to_fetch: 可选，要抓取的频道列表。如果为None，则抓取所有配置的频道。
         start_time: 可选，开始抓取的时间。如果为None，则默认抓取过去一周的消息。
         report_message_ids: 可选，要排除的报告消息ID列表，按频道分组。
+
+    Raises:
+        RuntimeError: 有频道没有任何可用的读取会话，避免调用方把未抓取的频道当作没有新消息
     """
-    # 确保 API_ID 是整数
     logger.info("开始抓取指定时间范围的频道消息")
-    
-    async with TelegramClient(SESSION_NAME_PATH, int(API_ID), API_HASH) as client:
-        # 如果没有提供开始时间，则默认抓取过去一周的消息
-        if start_time is None:
-            start_time = datetime.now(timezone.utc) - timedelta(days=7)
-            logger.info(f"未提供开始时间，默认抓取过去一周的消息")
-        
-        messages_by_channel = {}  # 按频道分组的消息字典
-        report_message_ids = report_message_ids or {}
-        
-        # 确定要抓取的频道
-        if channels_to_fetch and isinstance(channels_to_fetch, list):
-            # 只抓取指定的频道
-            channels = channels_to_fetch
-            logger.info(f"正在抓取指定的 {len(channels)} 个频道的消息，时间范围: {start_time} 至今")
-        else:
-            # 抓取所有配置的频道
-            if not CHANNELS:
-                logger.warning("没有配置任何频道，无法抓取消息")
-                return messages_by_channel
-            channels = CHANNELS
-            logger.info(f"正在抓取所有 {len(channels)} 个频道的消息，时间范围: {start_time} 至今")
-        
-        total_message_count = 0
-        
-        # 遍历所有要抓取的频道
-        for channel in channels:
-            channel_messages = []
-            channel_message_count = 0
-            skipped_report_count = 0
-            logger.info(f"开始抓取频道: {channel}")
-            
-            # 获取当前频道要排除的报告消息ID列表
-            exclude_ids = report_message_ids.get(channel, [])
-            logger.info(f"频道 {channel} 要排除的报告消息ID列表: {exclude_ids}")
-            
-            try:
-                async for message in client.iter_messages(channel, offset_date=start_time, reverse=True):
-                    total_message_count += 1
-                    channel_message_count += 1
-                    
-                    # 跳过报告消息
-                    if message.id in exclude_ids:
-                        skipped_report_count += 1
-                        logger.debug(f"跳过报告消息，ID: {message.id}")
-                        continue
-                    
-                    if message.text:
-                        # 动态获取频道名用于生成链接
-                        channel_part = channel.split('/')[-1]
-                        msg_link = f"https://t.me/{channel_part}/{message.id}"
-                        channel_messages.append(f"内容: {message.text[:500]}\n链接: {msg_link}")
-                        
-                        # 每抓取10条消息记录一次日志
-                        if len(channel_messages) % 10 == 0:
-                            logger.debug(f"频道 {channel} 已抓取 {len(channel_messages)} 条有效消息")
-            except Exception as e:
-                record_error(e, f"fetch_messages_channel_{channel}")
-                logger.error(f"抓取频道 {channel} 消息时出错: {e}")
-                # 继续处理其他频道
+
+    # 如果没有提供开始时间，则默认抓取过去一周的消息
+    if start_time is None:
+        start_time = datetime.now(timezone.utc) - timedelta(days=7)
+        logger.info(f"未提供开始时间，默认抓取过去一周的消息")
+
+    messages_by_channel = {}  # 按频道分组的消息字典
+    report_message_ids = report_message_ids or {}
+
+    # 确定要抓取的频道
+    if channels_to_fetch and isinstance(channels_to_fetch, list):
+        # 只抓取指定的频道
+        channels = channels_to_fetch
+        logger.info(f"正在抓取指定的 {len(channels)} 个频道的消息，时间范围: {start_time} 至今")
+    else:
+        # 抓取所有配置的频道
+        channels = get_config_snapshot().channels
+        if not channels:
+            logger.warning("没有配置任何频道，无法抓取消息")
+            return messages_by_channel
+        logger.info(f"正在抓取所有 {len(channels)} 个频道的消息，时间范围: {start_time} 至今")
+
+    pool = get_reader_pool()
+    tried_sessions = {channel: set() for channel in channels}
+    pending = list(channels)
+    unavailable = []
+    total_message_count = 0
+
+    while pending:
+        # 按会话分组：每个频道使用其哈希分配的会话，限流中或已失败的会话依次顺延
+        assignments = {}
+        for channel in pending:
+            session_path = pool.pick(channel, exclude=tried_sessions[channel])
+            if session_path is None:
+                logger.error(f"频道 {channel} 没有可用的读取会话（均处于限流中或无法连接）")
+                unavailable.append(channel)
                 continue
-            
-            # 将当前频道的消息添加到字典中
-            messages_by_channel[channel] = channel_messages
-            logger.info(f"频道 {channel} 抓取完成，共处理 {channel_message_count} 条消息，其中 {len(channel_messages)} 条包含文本内容，跳过了 {skipped_report_count} 条报告消息")
-        
-        logger.info(f"所有指定频道消息抓取完成，共处理 {total_message_count} 条消息")
-        return messages_by_channel
+            tried_sessions[channel].add(session_path)
+            assignments.setdefault(session_path, []).append(channel)
+
+        results = await asyncio.gather(*(
+            _fetch_with_session(session_path, session_channels, start_time, report_message_ids, pool)
+            for session_path, session_channels in assignments.items()
+        ))
+
+        pending = []
+        for session_messages, flooded_channels, message_count in results:
+            messages_by_channel.update(session_messages)
+            pending.extend(flooded_channels)
+            total_message_count += message_count
+
+    if unavailable:
+        raise RuntimeError(f"以下频道没有可用的读取会话，稍后重试: {', '.join(unavailable)}")
+
+    logger.info(f"所有指定频道消息抓取完成，共处理 {total_message_count} 条消息")
+    return messages_by_channel
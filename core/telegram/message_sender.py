@@ -17,16 +17,19 @@
 # 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
+import asyncio
 import logging
 from datetime import datetime, timezone
 from telethon import TelegramClient
 
 from ..config import (
-    API_ID, API_HASH, BOT_TOKEN, ADMIN_LIST, SEND_REPORT_TO_SOURCE,
-    SESSION_PATH, LLM_MODEL,
+    API_ID, API_HASH, BOT_TOKEN, ADMIN_LIST,
+    SESSION_PATH, get_config_snapshot,
 )
 
 from ..telegram_client_utils import split_message_smart, validate_message_entities
+from .send_scheduler import get_send_scheduler
+from .entity_cache import get_entity_cache
 
 logger = logging.getLogger(__name__)
 
@@ -141,31 +144,67 @@ def _extract_daily_date_range(summary_text):
     return start_time, end_time
 
 
-async def send_long_message(client, chat_id, text, max_length=4000, channel_title=None, show_pagination=True):
-    """分段发送长消息
-    
+def _split_into_parts(text, content_max_length):
+    """使用智能分割算法切分文本，失败时回退到按字符简单分割
+
+    Args:
+        text: 要分割的文本
+        content_max_length: 每段内容的最大长度
+
+    Returns:
+        list: 分割后的文本片段
+    """
+    try:
+        parts = split_message_smart(text, content_max_length, preserve_md=True)
+        logger.info(f"智能分割完成，共分成 {len(parts)} 段")
+
+        # 验证每个分段的实体完整性
+        for i, part in enumerate(parts):
+            is_valid, error_msg = validate_message_entities(part)
+            if not is_valid:
+                logger.warning(f"第 {i+1} 段实体验证失败: {error_msg}")
+                # 尝试修复：移除有问题的格式
+                parts[i] = part.replace('**', '').replace('`', '')
+                logger.info(f"已修复第 {i+1} 段的格式问题")
+    except Exception as e:
+        logger.error(f"智能分割失败，使用简单分割: {e}")
+        # 回退到简单分割
+        parts = []
+        text_length = len(text)
+        for i in range(0, text_length, content_max_length):
+            part = text[i:i+content_max_length]
+            if part:
+                parts.append(part)
+        logger.info(f"简单分割完成，共分成 {len(parts)} 段")
+
+    return parts
+
+
+def build_message_parts(text, max_length=4000, channel_title=None, show_pagination=True):
+    """将长文本切分为可直接发送的消息列表
+
+    切分结果与接收者无关，发送给多个接收者时只需切分一次。
+
     Args:
-        client: Telegram客户端实例
-        chat_id: 接收者聊天ID
         text: 要发送的文本
         max_length: 最大分段长度，默认4000字符
         channel_title: 频道标题，用于分段消息的标题。如果为None，则使用"更新日志"
-        show_pagination: 是否在每条消息显示分页标题（如"1/3"），默认为True。设为False时只在第一条显示标题
+        show_pagination: 是否在每条消息显示分页标题（如"1/3"）
+
+    Returns:
+        list: 每个元素都是长度不超过 max_length 的完整消息文本
     """
-    logger.info(f"开始发送长消息，接收者: {chat_id}，消息总长度: {len(text)}字符，最大分段长度: {max_length}字符")
-    
     if len(text) <= max_length:
         logger.info(f"消息长度未超过限制，直接发送")
         # 如果消息不超过限制但提供了标题，可以添加标题
         if channel_title and show_pagination:
             text = f"📋 **{channel_title}**\n\n{text}"
-        await client.send_message(chat_id, text, link_preview=False)
-        return
-    
+        return [text]
+
     # 确定标题
     if channel_title is None:
         channel_title = "更新日志"
-    
+
     # 计算标题长度
     if show_pagination:
         # 标题格式：📋 **{channel_title} ({i+1}/{len(parts)})**\n\n
@@ -176,41 +215,19 @@ async def send_long_message(client, chat_id, text, max_length=4000, channel_titl
         # 第一条：📋 **{channel_title}**\n\n
         # 其他：无标题
         max_title_length = len(f"📋 **{channel_title}**\n\n")
-    
+
     # 实际可用于内容的最大长度
     content_max_length = max_length - max_title_length
-    
+
     logger.info(f"消息需要分段发送，开始分段处理，标题长度: {max_title_length}字符，内容最大长度: {content_max_length}字符")
-    
-    # 使用智能分割算法
-    try:
-        parts = split_message_smart(text, content_max_length, preserve_md=True)
-        logger.info(f"智能分割完成，共分成 {len(parts)} 段")
-        
-        # 验证每个分段的实体完整性
-        for i, part in enumerate(parts):
-            is_valid, error_msg = validate_message_entities(part)
-            if not is_valid:
-                logger.warning(f"第 {i+1} 段实体验证失败: {error_msg}")
-                # 尝试修复：移除有问题的格式
-                parts[i] = part.replace('**', '').replace('`', '')
-                logger.info(f"已修复第 {i+1} 段的格式问题")
-    except Exception as e:
-        logger.error(f"智能分割失败，使用简单分割: {e}")
-        # 回退到简单分割
-        parts = []
-        text_length = len(text)
-        for i in range(0, text_length, content_max_length):
-            part = text[i:i+content_max_length]
-            if part:
-                parts.append(part)
-        logger.info(f"简单分割完成，共分成 {len(parts)} 段")
-    
+
+    parts = _split_into_parts(text, content_max_length)
+
     # 验证分段结果
     total_content_length = sum(len(part) for part in parts)
     logger.debug(f"分段后总内容长度: {total_content_length}字符，原始长度: {len(text)}字符")
-    
-    # 发送所有部分
+
+    messages = []
     for i, part in enumerate(parts):
         # 根据 show_pagination 参数决定标题格式
         if show_pagination:
@@ -219,34 +236,150 @@ async def send_long_message(client, chat_id, text, max_length=4000, channel_titl
         else:
             # 不显示任何标题，直接发送内容
             full_message = part
-        
-        full_message_length = len(full_message)
-        logger.info(f"正在发送第 {i+1}/{len(parts)} 段，长度: {full_message_length}字符")
-        
+
         # 验证消息长度不超过限制
-        if full_message_length > max_length:
-            logger.error(f"第 {i+1} 段消息长度 {full_message_length} 超过限制 {max_length}，将进行紧急分割")
+        if len(full_message) > max_length:
+            logger.error(f"第 {i+1} 段消息长度 {len(full_message)} 超过限制 {max_length}，将进行紧急分割")
             # 紧急分割：直接按字符分割
-            for j in range(0, full_message_length, max_length):
-                emergency_part = full_message[j:j+max_length]
-                await client.send_message(chat_id, emergency_part, link_preview=False)
-                logger.warning(f"发送紧急分割段 {j//max_length + 1}")
+            for j in range(0, len(full_message), max_length):
+                messages.append(full_message[j:j+max_length])
         else:
+            messages.append(full_message)
+
+    return messages
+
+
+async def send_message_parts(client, chat_id, parts):
+    """按顺序发送已切分好的消息
+
+    持有该聊天的顺序锁，避免与其他任务发往同一聊天的消息交错；
+    单段发送失败时移除格式重试一次。
+
+    Args:
+        client: Telegram客户端实例
+        chat_id: 接收者聊天ID
+        parts: build_message_parts 返回的消息列表
+
+    Returns:
+        list: 成功发送的消息ID列表
+    """
+    scheduler = get_send_scheduler()
+    message_ids = []
+
+    async with scheduler.ordered(chat_id):
+        for i, part in enumerate(parts):
+            logger.info(f"正在发送第 {i+1}/{len(parts)} 段，长度: {len(part)}字符")
             try:
-                await client.send_message(chat_id, full_message, link_preview=False)
-                logger.debug(f"成功发送第 {i+1}/{len(parts)} 段")
+                msg = await scheduler.send_message(client, chat_id, part, link_preview=False)
+                message_ids.append(msg.id)
+                logger.debug(f"成功发送第 {i+1}/{len(parts)} 段，消息ID: {msg.id}")
             except Exception as e:
                 logger.error(f"发送第 {i+1} 段失败: {e}")
                 # 尝试移除格式后重试
                 try:
-                    plain_message = full_message.replace('**', '').replace('`', '')
-                    await client.send_message(chat_id, plain_message, link_preview=False)
-                    logger.info(f"已成功发送第 {i+1} 段（移除格式后）")
+                    plain_message = part.replace('**', '').replace('`', '')
+                    msg = await scheduler.send_message(client, chat_id, plain_message, link_preview=False)
+                    message_ids.append(msg.id)
+                    logger.info(f"已成功发送第 {i+1} 段（移除格式后），消息ID: {msg.id}")
                 except Exception as e2:
                     logger.error(f"即使移除格式后发送第 {i+1} 段仍然失败: {e2}")
 
+    return message_ids
+
+
+async def send_long_message(client, chat_id, text, max_length=4000, channel_title=None, show_pagination=True):
+    """分段发送长消息
+    
+    Args:
+        client: Telegram客户端实例
+        chat_id: 接收者聊天ID
+        text: 要发送的文本
+        max_length: 最大分段长度，默认4000字符
+        channel_title: 频道标题，用于分段消息的标题。如果为None，则使用"更新日志"
+        show_pagination: 是否在每条消息显示分页标题（如"1/3"），默认为True。设为False时只在第一条显示标题
+
+    Returns:
+        list: 成功发送的消息ID列表
+    """
+    logger.info(f"开始发送长消息，接收者: {chat_id}，消息总长度: {len(text)}字符，最大分段长度: {max_length}字符")
+    parts = build_message_parts(text, max_length, channel_title, show_pagination)
+    return await send_message_parts(client, chat_id, parts)
+
+
+async def update_streaming_message(client, chat_id, message, text, max_length=4000):
+    """用流式生成的中间结果更新占位消息
+
+    只显示末尾部分以满足长度限制；中间结果的 Markdown 可能不完整，因此以纯文本编辑。
+
+    Args:
+        client: Telegram客户端实例
+        chat_id: 占位消息所在的聊天ID
+        message: 占位消息对象
+        text: 目前已生成的文本
+        max_length: 最大消息长度
+    """
+    header = "📝 正在生成总结...\n\n"
+    visible = text[-(max_length - len(header) - 1):]
+    try:
+        await get_send_scheduler().submit(
+            chat_id, client.edit_message, message, f"{header}{visible}▌",
+            parse_mode=None, link_preview=False
+        )
+    except Exception as e:
+        # 内容未变化等错误不影响最终结果
+        logger.debug(f"更新流式占位消息失败: {type(e).__name__}: {e}")
+
+
+async def finalize_streamed_message(client, chat_id, message, text, max_length=4000):
+    """流式生成结束后，将最终文本重新分段：第一段编辑进占位消息，其余分段依次发送
+
+    Args:
+        client: Telegram客户端实例
+        chat_id: 占位消息所在的聊天ID
+        message: 占位消息对象
+        text: 最终文本
+        max_length: 最大分段长度
+
+    Returns:
+        list: 最终消息ID列表（包含占位消息）
+    """
+    parts = build_message_parts(text, max_length)
+    scheduler = get_send_scheduler()
+
+    try:
+        await scheduler.submit(chat_id, client.edit_message, message, parts[0], link_preview=False)
+        message_ids = [message.id]
+    except Exception as e:
+        logger.warning(f"编辑占位消息失败，改为发送新消息: {type(e).__name__}: {e}")
+        message_ids = await send_message_parts(client, chat_id, parts[:1])
+
+    if len(parts) > 1:
+        message_ids += await send_message_parts(client, chat_id, parts[1:])
+    return message_ids
+
+
+async def _send_parts_to_admins(client, parts):
+    """并发向所有管理员发送同一份已切分的报告
+
+    每个管理员的发送仍受发送调度器的聊天级与全局限流约束，
+    单个管理员发送失败不影响其他管理员。
 
-async def send_report(summary_text, source_channel=None, client=None, skip_admins=False, message_count=0):
+    Args:
+        client: Telegram客户端实例
+        parts: 已切分好的消息列表
+    """
+    async def send_to_admin(admin_id):
+        try:
+            logger.info(f"正在向管理员 {admin_id} 发送报告")
+            await send_message_parts(client, admin_id, parts)
+            logger.info(f"成功向管理员 {admin_id} 发送报告")
+        except Exception as e:
+            logger.error(f"向管理员 {admin_id} 发送报告失败: {type(e).__name__}: {e}", exc_info=True)
+
+    await asyncio.gather(*(send_to_admin(admin_id) for admin_id in ADMIN_LIST))
+
+
+async def send_report(summary_text, source_channel=None, client=None, skip_admins=False, message_count=0, poll_data=None):
     """发送报告
 
     Args:
@@ -254,7 +387,10 @@ async def send_report(summary_text, source_channel=None, client=None, skip_admin
         source_channel: 源频道，可选。如果提供，将向该频道发送报告
         client: 可选。已存在的Telegram客户端实例，如果不提供，将尝试使用活动的客户端实例或创建新实例
         skip_admins: 是否跳过向管理员发送报告，默认为False
-        message_count: 消息数量，用于数据库记录，默认为0
+        message_count: 消息数量，默认为0
+        poll_data: 可选，随总结一起生成的投票数据；为None时由投票流程单独生成
+
+    总结记录由发送队列（core.outbox）在发送前保存、发送后补充消息ID，此处不写数据库。
 
     Returns:
         dict: 包含所有消息ID的字典
@@ -272,6 +408,7 @@ async def send_report(summary_text, source_channel=None, client=None, skip_admin
 
     # 存储发送到源频道的消息ID
     report_message_ids = []
+    scheduler = get_send_scheduler()
     poll_message_id = None
     button_message_id = None
     
@@ -303,14 +440,9 @@ async def send_report(summary_text, source_channel=None, client=None, skip_admin
             # 获取频道实际名称（如果提供了源频道）
             channel_actual_name = None
             if source_channel:
-                try:
-                    channel_entity = await use_client.get_entity(source_channel)
-                    channel_actual_name = channel_entity.title
-                    logger.info(f"获取到频道实际名称: {channel_actual_name}")
-                except Exception as e:
-                    logger.warning(f"获取频道实体失败，使用默认名称: {e}")
-                    # 使用频道链接的最后部分作为回退
-                    channel_actual_name = source_channel.split('/')[-1]
+                # 解析失败时实体缓存会使用频道链接的最后部分作为回退
+                channel_actual_name = await get_entity_cache().get_title(use_client, source_channel)
+                logger.info(f"获取到频道实际名称: {channel_actual_name}")
             
             # 提取日期范围和报告类型（从原总结文本中提取）
             date_range = ""
@@ -366,81 +498,23 @@ async def send_report(summary_text, source_channel=None, client=None, skip_admin
                     summary_text_for_source = new_title + "\n\n" + summary_text
                     summary_text_for_admins = summary_text_for_source
             
-            # 向所有管理员发送消息（除非跳过）
+            # 报告只切分一次，管理员与源频道复用同一份分段结果
+            report_parts = build_message_parts(summary_text_for_admins, show_pagination=False)
+
+            # 向所有管理员并发发送消息（除非跳过），与源频道发送同时进行
+            admin_task = None
             if not skip_admins:
-                for admin_id in ADMIN_LIST:
-                    try:
-                        logger.info(f"正在向管理员 {admin_id} 发送报告")
-                        await send_long_message(use_client, admin_id, summary_text_for_admins, show_pagination=False)
-                        logger.info(f"成功向管理员 {admin_id} 发送报告")
-                    except Exception as e:
-                        logger.error(f"向管理员 {admin_id} 发送报告失败: {type(e).__name__}: {e}", exc_info=True)
+                admin_task = asyncio.create_task(_send_parts_to_admins(use_client, report_parts))
             else:
                 logger.info("跳过向管理员发送报告")
             
             # 如果提供了源频道且配置允许，向源频道发送报告
-            if source_channel and SEND_REPORT_TO_SOURCE:
+            if source_channel and get_config_snapshot().send_report_to_source:
                 try:
                     logger.info(f"正在向源频道 {source_channel} 发送报告")
                     
-                    # 直接调用use_client.send_message并收集消息ID
-                    if len(summary_text_for_source) <= 4000:
-                        # 短消息直接发送
-                        msg = await use_client.send_message(source_channel, summary_text_for_source, link_preview=False)
-                        report_message_ids.append(msg.id)
-                    else:
-                        # 长消息分段发送，收集每个分段的消息ID
-                        # 使用频道实际名称作为分段消息标题
-                        channel_title = channel_actual_name if channel_actual_name else "频道周报汇总"
-                        
-                        # 使用send_long_message函数进行智能分割和发送
-                        # 但需要收集消息ID，所以需要自定义实现
-                        max_length = 4000
-                        max_title_length = len(f"📋 **{channel_title} (99/99)**\n\n")
-                        content_max_length = max_length - max_title_length
-                        
-                        # 使用智能分割算法
-                        try:
-                            parts = split_message_smart(summary_text_for_source, content_max_length, preserve_md=True)
-                            logger.info(f"智能分割完成，共分成 {len(parts)} 段")
-                            
-                            # 验证每个分段的实体完整性
-                            for i, part in enumerate(parts):
-                                is_valid, error_msg = validate_message_entities(part)
-                                if not is_valid:
-                                    logger.warning(f"第 {i+1} 段实体验证失败: {error_msg}")
-                                    # 尝试修复：移除有问题的格式
-                                    parts[i] = part.replace('**', '').replace('`', '')
-                                    logger.info(f"已修复第 {i+1} 段的格式问题")
-                        except Exception as e:
-                            logger.error(f"智能分割失败，使用简单分割: {e}")
-                            # 回退到简单分割
-                            parts = []
-                            text_length = len(summary_text_for_source)
-                            for i in range(0, text_length, content_max_length):
-                                part = summary_text_for_source[i:i+content_max_length]
-                                if part:
-                                    parts.append(part)
-                            logger.info(f"简单分割完成，共分成 {len(parts)} 段")
-                        
-                        # 发送所有部分并收集消息ID
-                        for i, part in enumerate(parts):
-                            # 不显示任何标题，直接发送内容
-                            part_text = part
-                            try:
-                                msg = await use_client.send_message(source_channel, part_text, link_preview=False)
-                                report_message_ids.append(msg.id)
-                                logger.debug(f"成功发送第 {i+1}/{len(parts)} 段，消息ID: {msg.id}")
-                            except Exception as e:
-                                logger.error(f"发送第 {i+1} 段失败: {e}")
-                                # 尝试移除格式后重试
-                                try:
-                                    plain_text = part_text.replace('**', '').replace('`', '')
-                                    msg = await use_client.send_message(source_channel, plain_text, link_preview=False)
-                                    report_message_ids.append(msg.id)
-                                    logger.info(f"已成功发送第 {i+1} 段（移除格式后），消息ID: {msg.id}")
-                                except Exception as e2:
-                                    logger.error(f"即使移除格式后发送第 {i+1} 段仍然失败: {e2}")
+                    # 发送所有分段并收集消息ID
+                    report_message_ids = await send_message_parts(use_client, source_channel, report_parts)
                     
                     logger.info(f"成功向源频道 {source_channel} 发送报告，消息ID: {report_message_ids}")
                     
@@ -448,7 +522,7 @@ async def send_report(summary_text, source_channel=None, client=None, skip_admin
                     if report_message_ids:
                         try:
                             first_message_id = report_message_ids[0]
-                            await use_client.pin_message(source_channel, first_message_id)
+                            await scheduler.submit(source_channel, use_client.pin_message, source_channel, first_message_id)
                             logger.info(f"已成功置顶消息ID: {first_message_id}")
                         except Exception as e:
                             logger.warning(f"置顶消息失败，可能需要管理员权限: {e}")
@@ -458,7 +532,8 @@ async def send_report(summary_text, source_channel=None, client=None, skip_admin
                         logger.info(f"开始处理投票发送，总结消息ID: {report_message_ids[0]}")
                         # 使用第一个消息ID作为投票回复目标
                         poll_result = await send_poll(
-                            use_client, source_channel, report_message_ids[0], summary_text_for_source
+                            use_client, source_channel, report_message_ids[0], summary_text_for_source,
+                            poll_data=poll_data
                         )
                         if poll_result and poll_result.get("poll_msg_id"):
                             poll_message_id = poll_result.get("poll_msg_id")
@@ -468,41 +543,11 @@ async def send_report(summary_text, source_channel=None, client=None, skip_admin
                             logger.warning("投票发送失败，但总结消息已成功发送")
                 except Exception as e:
                     logger.error(f"向源频道 {source_channel} 发送报告失败: {type(e).__name__}: {e}", exc_info=True)
-        
-        # 保存到数据库
-        # 如果成功发送总结到频道，保存到数据库
-        if source_channel and report_message_ids:
-            try:
-                from ..database import get_db_manager
-
-                # 提取时间范围
-                start_time, end_time = extract_date_range_from_summary(summary_text_for_source)
-
-                # 保存到数据库
-                db = get_db_manager()
-                summary_id = db.save_summary(
-                    channel_id=source_channel,
-                    channel_name=channel_actual_name,
-                    summary_text=summary_text_for_source,
-                    message_count=message_count,
-                    start_time=start_time,
-                    end_time=end_time,
-                    summary_message_ids=report_message_ids,
-                    poll_message_id=poll_message_id,
-                    button_message_id=button_message_id,
-                    ai_model=LLM_MODEL,
-                    summary_type='manual'  # 手动触发的总结
-                )
-
-                if summary_id:
-                    logger.info(f"总结已保存到数据库，记录ID: {summary_id}")
-                else:
-                    logger.warning("保存到数据库失败，但不影响总结发送")
-
-            except Exception as e:
-                logger.error(f"保存总结到数据库时出错: {type(e).__name__}: {e}", exc_info=True)
-                # 数据库保存失败不影响总结发送，只记录日志
 
+            # 等待管理员发送完成
+            if admin_task:
+                await admin_task
+        
         # 返回包含所有消息ID的字典
         return {
             "summary_message_ids": report_message_ids,
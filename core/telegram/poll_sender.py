@@ -20,13 +20,16 @@
 import logging
 import asyncio
 
-from ..config import ENABLE_POLL, get_channel_poll_config
+from ..config import get_config_snapshot
 from ..error_handler import record_error
+from .send_scheduler import get_send_scheduler
+from .entity_cache import get_entity_cache
+from .forward_dispatcher import get_forward_dispatcher
 
 logger = logging.getLogger(__name__)
 
 
-async def send_poll_to_channel(client, channel, summary_message_id, summary_text):
+async def send_poll_to_channel(client, channel, summary_message_id, summary_text, poll_data=None):
     """发送投票到源频道，直接回复总结消息
 
     Args:
@@ -34,6 +37,7 @@ async def send_poll_to_channel(client, channel, summary_message_id, summary_text
         channel: 频道URL或ID
         summary_message_id: 总结消息在频道中的ID
         summary_text: 总结文本，用于生成投票内容
+        poll_data: 可选，已生成的投票数据（合并生成模式）；为None时根据总结生成
 
     Returns:
         dict: {"poll_msg_id": 12347, "button_msg_id": 12348} 或 None
@@ -41,15 +45,18 @@ async def send_poll_to_channel(client, channel, summary_message_id, summary_text
     logger.info(f"开始处理投票发送到频道: 频道={channel}, 消息ID={summary_message_id}")
 
     try:
-        # 获取频道实体
-        logger.info(f"获取频道实体: {channel}")
-        channel_entity = await client.get_entity(channel)
-        logger.info(f"成功获取频道实体: {channel_entity.title if hasattr(channel_entity, 'title') else channel}")
-
-        # 生成投票内容
-        logger.info("开始生成投票内容")
-        from ..ai_client import generate_poll_from_summary
-        poll_data = generate_poll_from_summary(summary_text)
+        # 获取频道实体（优先使用实体缓存）
+        channel_info = await get_entity_cache().resolve(client, channel)
+        channel_peer = channel_info.input_peer if channel_info and channel_info.input_peer is not None else channel
+        logger.info(f"成功获取频道实体: {channel_info.title if channel_info else channel}")
+
+        # 生成投票内容（合并生成模式下已随总结一起生成）
+        if poll_data is None:
+            logger.info("开始生成投票内容")
+            from ..ai_client import generate_poll_from_summary
+            poll_data = generate_poll_from_summary(summary_text)
+        else:
+            logger.info("使用随总结一起生成的投票内容")
 
         if not poll_data or 'question' not in poll_data or 'options' not in poll_data:
             logger.error("生成投票内容失败，使用默认投票")
@@ -97,8 +104,8 @@ async def send_poll_to_channel(client, channel, summary_message_id, summary_text
             reply_header = InputReplyToMessage(reply_to_msg_id=int(summary_message_id))
 
             # 发送投票到频道，回复总结消息
-            poll_result = await client(SendMediaRequest(
-                peer=channel,
+            poll_result = await get_send_scheduler().submit(channel, client, SendMediaRequest(
+                peer=channel_peer,
                 media=InputMediaPoll(poll=poll_obj),
                 message='',
                 reply_to=reply_header
@@ -130,7 +137,8 @@ async def send_poll_to_channel(client, channel, summary_message_id, summary_text
                 )]]
 
                 # 发送按钮消息，回复投票
-                button_msg = await client.send_message(
+                button_msg = await get_send_scheduler().send_message(
+                    client,
                     channel,
                     "💡 投票效果不理想?点击下方按钮重新生成",
                     reply_to=poll_msg_id,
@@ -141,7 +149,7 @@ async def send_poll_to_channel(client, channel, summary_message_id, summary_text
 
                 # 保存映射关系到存储
                 from ..config import add_poll_regeneration
-                channel_name = channel_entity.title if hasattr(channel_entity, 'title') else channel
+                channel_name = channel_info.title if channel_info else channel
                 add_poll_regeneration(
                     channel=channel,
                     summary_msg_id=summary_message_id,
@@ -178,7 +186,7 @@ async def send_poll_to_channel(client, channel, summary_message_id, summary_text
         return None
 
 
-async def send_poll_to_discussion_group(client, channel, summary_message_id, summary_text):
+async def send_poll_to_discussion_group(client, channel, summary_message_id, summary_text, poll_data=None):
     """发送投票到频道的讨论组（评论区）
 
     Args:
@@ -186,22 +194,26 @@ async def send_poll_to_discussion_group(client, channel, summary_message_id, sum
         channel: 频道URL或ID
         summary_message_id: 总结消息在频道中的ID
         summary_text: 总结文本，用于生成投票内容
+        poll_data: 可选，已生成的投票数据（合并生成模式）；为None时根据总结生成
 
     Returns:
         dict: {"poll_msg_id": 12347, "button_msg_id": 12348} 或 None
     """
     logger.info(f"开始处理投票发送到讨论组: 频道={channel}, 消息ID={summary_message_id}")
 
-    if not ENABLE_POLL:
+    if not get_config_snapshot().enable_poll:
         logger.info("投票功能已禁用，跳过投票发送")
         return False
 
     try:
-        # 获取频道实体
+        # 获取频道实体（优先使用实体缓存）
         logger.info(f"获取频道实体: {channel}")
-        channel_entity = await client.get_entity(channel)
-        channel_id = channel_entity.id
-        channel_name = channel_entity.title if hasattr(channel_entity, 'title') else channel
+        channel_info = await get_entity_cache().resolve(client, channel)
+        if not channel_info:
+            logger.error(f"无法解析频道实体: {channel}")
+            return False
+        channel_id = channel_info.channel_id
+        channel_name = channel_info.title
 
         # 检查频道是否有绑定的讨论组(使用缓存版本)
         from ..config import get_discussion_group_id_cached
@@ -222,10 +234,13 @@ async def send_poll_to_discussion_group(client, channel, summary_message_id, sum
             logger.warning("请将机器人添加到频道的讨论组（私人群组）中")
             return False
 
-        # 生成投票内容
-        logger.info("开始生成投票内容")
-        from ..ai_client import generate_poll_from_summary
-        poll_data = generate_poll_from_summary(summary_text)
+        # 生成投票内容（合并生成模式下已随总结一起生成）
+        if poll_data is None:
+            logger.info("开始生成投票内容")
+            from ..ai_client import generate_poll_from_summary
+            poll_data = generate_poll_from_summary(summary_text)
+        else:
+            logger.info("使用随总结一起生成的投票内容")
 
         if not poll_data or 'question' not in poll_data or 'options' not in poll_data:
             logger.error("生成投票内容失败，使用默认投票")
@@ -234,36 +249,14 @@ async def send_poll_to_discussion_group(client, channel, summary_message_id, sum
                 "options": ["非常满意", "比较满意", "一般", "有待改进"]
             }
 
-        # 使用事件监听方式等待转发消息
+        # 通过常驻转发分发器等待转发消息（已提前到达或事件丢失时也能获取）
         logger.info(f"等待频道消息转发到讨论组...")
+        channel_peer = channel_info.input_peer if channel_info.input_peer is not None else channel
 
-        # 创建事件Future来等待转发消息
-        from asyncio import Future
-        forward_message_future = Future()
-
-        # 定义事件处理器
-        from telethon import events
-
-        @client.on(events.NewMessage(chats=discussion_group_id))
-        async def on_discussion_message(event):
-            msg = event.message
-
-            # 检查是否是转发消息
-            if (hasattr(msg, 'fwd_from') and msg.fwd_from and
-                hasattr(msg.fwd_from, 'from_id') and msg.fwd_from.from_id and
-                hasattr(msg.fwd_from.from_id, 'channel_id') and
-                msg.fwd_from.from_id.channel_id == channel_id and
-                msg.fwd_from.channel_post == summary_message_id):
-
-                logger.info(f"收到转发消息，讨论组消息ID: {msg.id}")
-                forward_message_future.set_result(msg)
-
-                # 移除事件处理器
-                client.remove_event_handler(on_discussion_message)
-
-        # 等待转发消息（最多10秒）
         try:
-            forward_message = await asyncio.wait_for(forward_message_future, timeout=10)
+            forward_message = await get_forward_dispatcher().wait_for_forward(
+                client, channel_peer, discussion_group_id, channel_id, summary_message_id, timeout=10
+            )
             logger.info(f"成功收到转发消息，ID: {forward_message.id}")
 
             # 发送投票作为回复
@@ -310,7 +303,7 @@ async def send_poll_to_discussion_group(client, channel, summary_message_id, sum
 
                 # 5. 【核心区别】直接通过client(...)发起SendMediaRequest
                 # 这会绕过send_message内部那些容易出错的自动转换逻辑
-                poll_result = await client(SendMediaRequest(
+                poll_result = await get_send_scheduler().submit(discussion_group_id, client, SendMediaRequest(
                     peer=int(discussion_group_id),  # 必须是int, 例如-1003311748800
                     media=InputMediaPoll(poll=poll_obj),
                     message='',  # 不要带任何消息文本，让它纯粹发投票
@@ -343,7 +336,8 @@ async def send_poll_to_discussion_group(client, channel, summary_message_id, sum
                     )]]
 
                     # 发送按钮消息到讨论组，回复投票
-                    button_msg = await client.send_message(
+                    button_msg = await get_send_scheduler().send_message(
+                        client,
                         discussion_group_id,
                         "💡 投票效果不理想?点击下方按钮重新生成",
                         reply_to=poll_msg_id,
@@ -386,14 +380,13 @@ async def send_poll_to_discussion_group(client, channel, summary_message_id, sum
                 return None
 
         except asyncio.TimeoutError:
-            logger.warning(f"等待转发消息超时（10秒），可能转发延迟或未成功")
-            # 移除事件处理器
-            client.remove_event_handler(on_discussion_message)
+            logger.warning(f"未能获取讨论组中的转发消息，可能转发延迟或未成功")
 
             # 尝试发送独立消息
             try:
                 logger.info(f"尝试发送独立投票消息")
-                await client.send_message(
+                await get_send_scheduler().send_message(
+                    client,
                     discussion_group_id,
                     f"📊 **投票：{poll_data['question']}**\n\n" +
                     "\n".join([f"• {opt}" for opt in poll_data['options']])
@@ -410,7 +403,19 @@ async def send_poll_to_discussion_group(client, channel, summary_message_id, sum
         return None
 
 
-async def send_poll(client, channel, summary_message_id, summary_text):
+def is_poll_enabled(channel):
+    """判断指定频道是否启用投票（频道独立配置优先，其次为全局配置）
+
+    Args:
+        channel: 频道URL
+
+    Returns:
+        bool: 是否启用投票
+    """
+    return get_config_snapshot().channel(channel).poll_enabled
+
+
+async def send_poll(client, channel, summary_message_id, summary_text, poll_data=None):
     """根据频道配置发送投票到频道或讨论组
 
     Args:
@@ -418,20 +423,16 @@ async def send_poll(client, channel, summary_message_id, summary_text):
         channel: 频道URL或ID
         summary_message_id: 总结消息在频道中的ID
         summary_text: 总结文本，用于生成投票内容
+        poll_data: 可选，已生成的投票数据（合并生成模式）；为None时根据总结生成
 
     Returns:
         dict: {"poll_msg_id": 12347, "button_msg_id": 12348} 或 None
     """
     # 获取频道投票配置
-    poll_config = get_channel_poll_config(channel)
+    poll_config = get_config_snapshot().channel(channel).poll_config
 
     # 检查是否启用投票
-    enabled = poll_config['enabled']
-    if enabled is None:
-        # 没有独立配置，使用全局配置
-        enabled = ENABLE_POLL
-
-    if not enabled:
+    if not is_poll_enabled(channel):
         logger.info(f"频道 {channel} 的投票功能已禁用，跳过投票发送")
         return None
 
@@ -439,8 +440,8 @@ async def send_poll(client, channel, summary_message_id, summary_text):
     if poll_config['send_to_channel']:
         # 频道模式：直接回复总结消息
         logger.info(f"频道 {channel} 配置为频道模式，投票将发送到频道")
-        return await send_poll_to_channel(client, channel, summary_message_id, summary_text)
+        return await send_poll_to_channel(client, channel, summary_message_id, summary_text, poll_data)
     else:
         # 讨论组模式：发送到讨论组，回复转发消息
         logger.info(f"频道 {channel} 配置为讨论组模式，投票将发送到讨论组")
-        return await send_poll_to_discussion_group(client, channel, summary_message_id, summary_text)
+        return await send_poll_to_discussion_group(client, channel, summary_message_id, summary_text, poll_data)
@@ -0,0 +1,254 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""发送调度器模块
+
+统一管理所有对外发送请求：全局令牌桶 + 每个聊天的令牌桶限流，
+遇到 FloodWait 时按服务器要求的秒数暂停该聊天，并保证同一聊天内分段消息的顺序。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict
+
+from telethon.errors import FloodWaitError
+
+from ..metrics import SEND_QUEUE_DEPTH, SEND_TOTAL, FLOOD_WAIT_SECONDS
+from ..config import (
+    SEND_GLOBAL_RATE, SEND_PRIVATE_CHAT_RATE, SEND_GROUP_CHAT_RATE_PER_MINUTE,
+    SEND_CHAT_BURST, SEND_FLOOD_WAIT_MAX_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# 单次发送遇到 FloodWait 后的最大重试次数
+MAX_FLOOD_WAIT_RETRIES = 3
+
+
+class TokenBucket:
+    """异步令牌桶
+
+    以固定速率补充令牌，容量决定允许的突发数量。
+    等待者按获取锁的顺序依次放行，保证先到先发。
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        """按流逝时间补充令牌"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    async def acquire(self):
+        """获取一个令牌，令牌不足或处于 FloodWait 冷却期时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def block_for(self, seconds: float):
+        """在指定秒数内暂停放行（用于响应 FloodWait）"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated_at = time.monotonic()
+
+
+class SendScheduler:
+    """对外发送调度器
+
+    所有发送操作通过 submit() 执行：先获取聊天级令牌，再获取全局令牌。
+    需要保证多段消息顺序时，调用方在 ordered(chat_id) 锁内依次提交。
+    """
+
+    def __init__(self, global_rate: float, private_rate: float,
+                 group_rate_per_minute: float, burst: int, flood_wait_max: int):
+        self.private_rate = private_rate
+        self.group_rate = group_rate_per_minute / 60.0
+        self.burst = burst
+        self.flood_wait_max = flood_wait_max
+
+        self._global_bucket = TokenBucket(global_rate, int(global_rate))
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._pending: Dict[str, int] = {}
+
+        self._stats = {
+            "sent_total": 0,
+            "failed_total": 0,
+            "flood_wait_count": 0,
+            "flood_wait_seconds_total": 0,
+            "max_queue_depth": 0,
+        }
+
+    @staticmethod
+    def _chat_key(chat_id) -> str:
+        """将聊天ID统一转换为字典键"""
+        return str(chat_id)
+
+    def _is_private_chat(self, chat_id) -> bool:
+        """判断是否为私聊（正数用户ID或 'me'），其余按群组/频道处理"""
+        if chat_id == 'me':
+            return True
+        return isinstance(chat_id, int) and chat_id > 0
+
+    def _get_chat_bucket(self, chat_id) -> TokenBucket:
+        """获取（或创建）聊天级令牌桶"""
+        key = self._chat_key(chat_id)
+        bucket = self._chat_buckets.get(key)
+        if bucket is None:
+            rate = self.private_rate if self._is_private_chat(chat_id) else self.group_rate
+            bucket = TokenBucket(rate, self.burst)
+            self._chat_buckets[key] = bucket
+        return bucket
+
+    def ordered(self, chat_id) -> asyncio.Lock:
+        """获取聊天级顺序锁
+
+        在锁内依次提交的多段消息不会与其他任务发往同一聊天的消息交错。
+
+        Args:
+            chat_id: 聊天ID
+
+        Returns:
+            asyncio.Lock: 该聊天的顺序锁
+        """
+        key = self._chat_key(chat_id)
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._chat_locks[key] = lock
+        return lock
+
+    async def submit(self, chat_id, func: Callable, *args, **kwargs) -> Any:
+        """在限流约束下执行一次发送操作
+
+        Args:
+            chat_id: 目标聊天ID，用于选择聊天级令牌桶
+            func: 实际执行发送的协程函数
+            *args, **kwargs: 传给 func 的参数
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            FloodWaitError: 服务器要求等待的时间超过 SEND_FLOOD_WAIT_MAX_SECONDS，或重试次数耗尽
+        """
+        key = self._chat_key(chat_id)
+        bucket = self._get_chat_bucket(chat_id)
+
+        self._pending[key] = self._pending.get(key, 0) + 1
+        queue_depth = sum(self._pending.values())
+        SEND_QUEUE_DEPTH.set(queue_depth)
+        if queue_depth > self._stats["max_queue_depth"]:
+            self._stats["max_queue_depth"] = queue_depth
+
+        try:
+            attempt = 0
+            while True:
+                await bucket.acquire()
+                await self._global_bucket.acquire()
+                try:
+                    result = await func(*args, **kwargs)
+                    self._stats["sent_total"] += 1
+                    SEND_TOTAL.inc(result="ok")
+                    return result
+                except FloodWaitError as e:
+                    attempt += 1
+                    self._stats["flood_wait_count"] += 1
+                    self._stats["flood_wait_seconds_total"] += e.seconds
+                    FLOOD_WAIT_SECONDS.inc(e.seconds)
+
+                    if e.seconds > self.flood_wait_max or attempt > MAX_FLOOD_WAIT_RETRIES:
+                        logger.error(f"向 {chat_id} 发送触发 FloodWait {e.seconds} 秒，"
+                                     f"超过等待上限或重试次数（第 {attempt} 次），放弃发送")
+                        self._stats["failed_total"] += 1
+                        SEND_TOTAL.inc(result="error")
+                        raise
+
+                    logger.warning(f"向 {chat_id} 发送触发 FloodWait，暂停该聊天 {e.seconds} 秒后重试"
+                                   f"（第 {attempt}/{MAX_FLOOD_WAIT_RETRIES} 次）")
+                    bucket.block_for(e.seconds)
+                except Exception:
+                    self._stats["failed_total"] += 1
+                    SEND_TOTAL.inc(result="error")
+                    raise
+        finally:
+            self._pending[key] -= 1
+            if self._pending[key] <= 0:
+                del self._pending[key]
+            SEND_QUEUE_DEPTH.set(sum(self._pending.values()))
+
+    async def send_message(self, client, chat_id, *args, **kwargs):
+        """通过调度器调用 client.send_message"""
+        return await self.submit(chat_id, client.send_message, chat_id, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取发送队列统计信息
+
+        Returns:
+            dict: 包含当前队列深度、各聊天排队数量及累计发送/FloodWait 统计
+        """
+        return {
+            "queue_depth": sum(self._pending.values()),
+            "pending_by_chat": dict(self._pending),
+            "tracked_chats": len(self._chat_buckets),
+            **self._stats,
+        }
+
+
+# 全局发送调度器实例
+_global_send_scheduler = None
+
+
+def get_send_scheduler() -> SendScheduler:
+    """获取全局发送调度器实例（首次调用时创建）"""
+    global _global_send_scheduler
+    if _global_send_scheduler is None:
+        _global_send_scheduler = SendScheduler(
+            global_rate=SEND_GLOBAL_RATE,
+            private_rate=SEND_PRIVATE_CHAT_RATE,
+            group_rate_per_minute=SEND_GROUP_CHAT_RATE_PER_MINUTE,
+            burst=SEND_CHAT_BURST,
+            flood_wait_max=SEND_FLOOD_WAIT_MAX_SECONDS,
+        )
+        logger.info("发送调度器已初始化")
+    return _global_send_scheduler
+
+
+def get_send_queue_stats() -> Dict[str, Any]:
+    """获取全局发送队列统计信息"""
+    return get_send_scheduler().get_stats()
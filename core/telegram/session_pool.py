@@ -0,0 +1,172 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+
+"""读取会话池模块
+
+抓取频道历史消息使用的用户会话可以配置多个（READER_SESSIONS）。
+每个频道按一致性哈希固定分配到一个会话，增减会话时只有少量频道改变归属；
+某个会话被 FloodWait 限流期间，其频道沿哈希环临时改用下一个可用会话。
+每个会话在进程内只保持一个常驻连接，并发的抓取、预检和预取共用该连接，
+避免多个客户端同时打开同一个会话文件。
+各会话的抓取次数、消息数和限流情况计入运行指标。
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from telethon import TelegramClient
+
+from ..config import API_ID, API_HASH, READER_SESSION_PATHS
+from ..metrics import READER_FLOOD_LIMITED, READER_FLOOD_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 每个会话在哈希环上的虚拟节点数，使频道分布更均匀
+VIRTUAL_NODES = 256
+
+# 会话连接失败后暂停分配频道的秒数
+CONNECT_RETRY_SECONDS = 60
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def session_label(session_path: str) -> str:
+    """会话的展示名称（会话文件名），用于日志和指标"""
+    return os.path.basename(session_path)
+
+
+class ReaderSessionPool:
+    """读取会话池：一致性哈希分配频道，持有各会话的客户端，并记录各会话的限流状态"""
+
+    def __init__(self, session_paths: Iterable[str], virtual_nodes: int = VIRTUAL_NODES):
+        self.session_paths: List[str] = list(dict.fromkeys(session_paths))
+        if not self.session_paths:
+            raise ValueError("读取会话池至少需要一个会话")
+
+        ring = sorted(
+            (_ring_hash(f"{session_label(path)}#{i}"), path)
+            for path in self.session_paths
+            for i in range(virtual_nodes)
+        )
+        self._ring_hashes = [h for h, _ in ring]
+        self._ring_paths = [path for _, path in ring]
+        self._flood_until: Dict[str, float] = {}
+        self._clients: Dict[str, TelegramClient] = {}
+        self._client_locks: Dict[str, asyncio.Lock] = {}
+
+    def preference(self, channel: str) -> List[str]:
+        """频道的会话优先顺序：从频道在哈希环上的位置顺时针依次经过的会话"""
+        start = bisect.bisect(self._ring_hashes, _ring_hash(channel))
+        order = []
+        for i in range(len(self._ring_paths)):
+            path = self._ring_paths[(start + i) % len(self._ring_paths)]
+            if path not in order:
+                order.append(path)
+                if len(order) == len(self.session_paths):
+                    break
+        return order
+
+    def is_limited(self, session_path: str) -> bool:
+        """会话是否仍处于 FloodWait 限流或连接失败后的暂停期中"""
+        limited = self._flood_until.get(session_path, 0) > time.monotonic()
+        if not limited and session_path in self._flood_until:
+            del self._flood_until[session_path]
+            READER_FLOOD_LIMITED.set(0, session=session_label(session_path))
+        return limited
+
+    def pick(self, channel: str, exclude: Iterable[str] = ()) -> Optional[str]:
+        """为频道选择会话：优先使用哈希分配的会话，限流中或已排除的会话依次顺延
+
+        Returns:
+            会话路径；所有候选会话都不可用时返回None
+        """
+        excluded = set(exclude)
+        for path in self.preference(channel):
+            if path not in excluded and not self.is_limited(path):
+                return path
+        return None
+
+    def mark_flood(self, session_path: str, seconds: float):
+        """记录会话被 FloodWait 限流，限流期间不再分配频道"""
+        label = session_label(session_path)
+        self._flood_until[session_path] = max(self._flood_until.get(session_path, 0), time.monotonic() + seconds)
+        READER_FLOOD_WAIT_SECONDS.inc(seconds, session=label)
+        READER_FLOOD_LIMITED.set(1, session=label)
+        logger.warning(f"读取会话 {label} 被要求等待 {seconds} 秒，期间其频道改用其他会话")
+
+    def mark_unavailable(self, session_path: str, seconds: float = CONNECT_RETRY_SECONDS):
+        """记录会话连接失败，在 seconds 秒内不再分配频道"""
+        self._flood_until[session_path] = max(self._flood_until.get(session_path, 0), time.monotonic() + seconds)
+        logger.warning(f"读取会话 {session_label(session_path)} 连接失败，{seconds} 秒内其频道改用其他会话")
+
+    async def get_client(self, session_path: str) -> TelegramClient:
+        """获取会话的常驻客户端，首次使用或连接断开时（重新）连接
+
+        同一会话的并发调用共用同一个客户端。
+        """
+        client = self._clients.get(session_path)
+        if client is not None and client.is_connected():
+            return client
+
+        lock = self._client_locks.setdefault(session_path, asyncio.Lock())
+        async with lock:
+            client = self._clients.get(session_path)
+            if client is None:
+                client = TelegramClient(session_path, int(API_ID), API_HASH)
+                self._clients[session_path] = client
+            if not client.is_connected():
+                await client.start()
+                logger.info(f"读取会话 {session_label(session_path)} 已连接")
+            return client
+
+    async def close(self):
+        """断开所有会话的客户端连接"""
+        for session_path, client in list(self._clients.items()):
+            try:
+                if client.is_connected():
+                    await client.disconnect()
+            except Exception as e:
+                logger.error(f"断开读取会话 {session_label(session_path)} 时出错: {type(e).__name__}: {e}")
+        self._clients.clear()
+
+
+_global_reader_pool: Optional[ReaderSessionPool] = None
+
+
+def get_reader_pool() -> ReaderSessionPool:
+    """获取全局读取会话池实例（首次调用时创建）"""
+    global _global_reader_pool
+    if _global_reader_pool is None:
+        _global_reader_pool = ReaderSessionPool(READER_SESSION_PATHS)
+        logger.info(f"读取会话池已创建: {', '.join(session_label(p) for p in _global_reader_pool.session_paths)}")
+    return _global_reader_pool
+
+
+async def close_reader_pool():
+    """断开读取会话池的所有连接（进程退出时调用）"""
+    if _global_reader_pool is not None:
+        await _global_reader_pool.close()
@@ -23,8 +23,8 @@ from datetime import datetime, timedelta, timezone
 from telethon import TelegramClient, Button
 from telethon.tl.types import PeerChannel
 from .config import (
-    API_ID, API_HASH, BOT_TOKEN, CHANNELS, ADMIN_LIST, SEND_REPORT_TO_SOURCE,
-    SESSION_NAME_PATH,
+    API_ID, API_HASH, BOT_TOKEN, ADMIN_LIST, SESSION_NAME_PATH,
+    get_config_snapshot,
 )
 from .error_handler import retry_with_backoff, record_error
 from .telegram_client_utils import split_message_smart, validate_message_entities
@@ -144,7 +144,7 @@ def get_active_client():
     base_delay=2.0,
     max_delay=60.0,
     exponential_backoff=True,
-    retry_on_exceptions=(ConnectionError, TimeoutError, Exception)
+    dependency="telegram"
 )
 async def fetch_last_week_messages(channels_to_fetch=None, start_time=None, report_message_ids=None):
     """抓取指定时间范围的频道消息
@@ -173,10 +173,10 @@ async def fetch_last_week_messages(channels_to_fetch=None, start_time=None, repo
             logger.info(f"正在抓取指定的 {len(channels)} 个频道的消息，时间范围: {start_time} 至今")
         else:
             # 抓取所有配置的频道
-            if not CHANNELS:
+            channels = get_config_snapshot().channels
+            if not channels:
                 logger.warning("没有配置任何频道，无法抓取消息")
                 return messages_by_channel
-            channels = CHANNELS
             logger.info(f"正在抓取所有 {len(channels)} 个频道的消息，时间范围: {start_time} 至今")
         
         total_message_count = 0
@@ -347,7 +347,7 @@ async def _send_report_to_admins_and_channel(client, summary_text, source_channe
         logger.info("跳过向管理员发送报告")
     
     # 如果提供了源频道且配置允许，向源频道发送报告
-    if source_channel and SEND_REPORT_TO_SOURCE:
+    if source_channel and get_config_snapshot().send_report_to_source:
         try:
             logger.info(f"正在向源频道 {source_channel} 发送报告")
             
@@ -0,0 +1,290 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""轻量级链路追踪模块
+
+每次总结任务由 start_trace() 创建根 span，任务内部各阶段用 span() 创建子 span，
+当前 span 通过 contextvar 传递，在协程与 asyncio.to_thread 线程中都能正确嵌套。
+根 span 结束后整条链路写入本地 JSONL 文件（可选 OTLP/JSON 格式），
+并保留最近若干条供 /trace 命令查看。没有活动链路时 span() 不做任何事。
+"""
+
+import contextvars
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+from .config import TRACING_ENABLED, TRACE_FILE, TRACE_OTLP_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# 内存中保留的最近链路数量
+RECENT_TRACE_LIMIT = 20
+
+# 链路文件超过该大小（字节）时轮转为 .1
+TRACE_FILE_MAX_BYTES = 10 * 1024 * 1024
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """一个计时片段"""
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        """附加属性（如消息数、模型名）"""
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        """标记该 span 失败"""
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """一条完整链路，包含根 span 及其所有子 span"""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def root(self) -> Optional[Span]:
+        return self.spans[0] if self.spans else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {"trace_id": self.trace_id, "spans": spans}
+
+
+class _NoopSpan:
+    """没有活动链路时返回的空 span"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_recent_traces: deque = deque(maxlen=RECENT_TRACE_LIMIT)
+_export_lock = threading.Lock()
+
+
+@contextmanager
+def _enter_span(trace: Trace, name: str, parent: Optional[Span], attributes: Dict[str, Any]):
+    span_obj = Span(trace, name, parent, attributes)
+    trace.add(span_obj)
+    token = _current_span.set(span_obj)
+    try:
+        yield span_obj
+    except BaseException as e:
+        span_obj.record_exception(e)
+        raise
+    finally:
+        span_obj.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """开始一条新链路（根 span），结束时导出
+
+    Args:
+        name: 根 span 名称，如 "summary_job"
+        **attributes: 附加属性，如 channel
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP_SPAN
+        return
+
+    trace = Trace()
+    try:
+        with _enter_span(trace, name, None, attributes) as root:
+            yield root
+    finally:
+        _finish_trace(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """在当前链路中创建子 span；没有活动链路时不记录
+
+    Args:
+        name: span 名称，如 "fetch"、"llm_call"
+        **attributes: 附加属性
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+
+    with _enter_span(parent.trace, name, parent, attributes) as span_obj:
+        yield span_obj
+
+
+def traced(name: str):
+    """装饰器：将同步或异步函数的执行记录为子 span"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return sync_wrapper
+    return decorator
+
+
+# ==================== 导出 ====================
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp(trace: Trace) -> Dict[str, Any]:
+    """转换为 OTLP/JSON（ExportTraceServiceRequest）结构"""
+    spans = []
+    for item in trace.to_dict()["spans"]:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": item["span_id"],
+            "name": item["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(item["start_ns"]),
+            "endTimeUnixNano": str(item["end_ns"] or item["start_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in item["attributes"].items()],
+            "status": {"code": 2, "message": item["error"]} if item["status"] == "error" else {"code": 1},
+        }
+        if item["parent_id"]:
+            otlp_span["parentSpanId"] = item["parent_id"]
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "sakura-channel-summary"}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+def _finish_trace(trace: Trace):
+    """保存到最近链路列表并写入链路文件"""
+    _recent_traces.append(trace)
+    record = _to_otlp(trace) if TRACE_OTLP_FORMAT else trace.to_dict()
+
+    try:
+        with _export_lock:
+            os.makedirs(os.path.dirname(TRACE_FILE), exist_ok=True)
+            if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) > TRACE_FILE_MAX_BYTES:
+                os.replace(TRACE_FILE, f"{TRACE_FILE}.1")
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        logger.warning(f"写入链路文件失败: {type(e).__name__}: {e}")
+
+    root = trace.root
+    if root:
+        logger.debug(f"链路 {trace.trace_id} ({root.name}) 完成，耗时 {root.duration_ms:.0f}ms，共 {len(trace.spans)} 个span")
+
+
+def get_recent_traces() -> List[Trace]:
+    """获取最近完成的链路（旧的在前）"""
+    return list(_recent_traces)
+
+
+def format_trace(trace: Trace) -> str:
+    """将链路格式化为缩进的耗时树，供 /trace 命令展示"""
+    children: Dict[Optional[str], List[Span]] = {}
+    for span_obj in trace.spans:
+        children.setdefault(span_obj.parent_id, []).append(span_obj)
+
+    root = trace.root
+    lines = []
+
+    def walk(span_obj: Span, depth: int):
+        attributes = "，".join(f"{k}={v}" for k, v in span_obj.attributes.items())
+        share = f" ({span_obj.duration_ms / root.duration_ms:.0%})" if depth and root.duration_ms else ""
+        mark = " ❌" if span_obj.status == "error" else ""
+        line = f"{'  ' * depth}{'└ ' if depth else ''}{span_obj.name}: {span_obj.duration_ms:.0f}ms{share}{mark}"
+        if attributes:
+            line += f"  [{attributes}]"
+        lines.append(line)
+        if span_obj.error:
+            lines.append(f"{'  ' * (depth + 1)}错误: {span_obj.error}")
+        for child in sorted(children.get(span_obj.span_id, []), key=lambda s: s.start_ns):
+            walk(child, depth + 1)
+
+    if root:
+        walk(root, 0)
+    return "\n".join(lines)
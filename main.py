@@ -17,6 +17,7 @@
 # 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
 # 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
 
+import argparse
 import asyncio
 import logging
 import os
@@ -28,16 +29,22 @@ from telethon.events import NewMessage, CallbackQuery, ChatAction
 from telethon.tl.functions.bots import SetBotCommandsRequest
 from telethon.tl.functions.channels import LeaveChannelRequest
 from telethon.tl.types import BotCommand, BotCommandScopeDefault
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from core.config import (
-    API_ID, API_HASH, BOT_TOKEN, CHANNELS, LLM_API_KEY,
+    API_ID, API_HASH, BOT_TOKEN, LLM_API_KEY,
     RESTART_FLAG_FILE, SHUTDOWN_FLAG_FILE, SESSION_PATH,
-    logger, get_channel_schedule, build_cron_trigger, ADMIN_LIST,
-    BLACKLIST_ENABLED, BLACKLIST_THRESHOLD_COUNT, BLACKLIST_THRESHOLD_HOURS
+    logger, get_config_snapshot, ADMIN_LIST,
+    BLACKLIST_ENABLED, BLACKLIST_THRESHOLD_COUNT, BLACKLIST_THRESHOLD_HOURS,
+    INCREMENTAL_SUMMARY_ENABLED, INCREMENTAL_INTERVAL_HOURS,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, CATCHUP_ENABLED,
+    OUTBOX_RETRY_INTERVAL_SECONDS, LEASE_TTL_SECONDS, WORKER_ID, PREFETCH_LEAD_MINUTES
 )
 from core.database import get_db_manager
-from core.scheduler import main_job
+from core.scheduler import (
+    create_scheduler, register_summary_jobs, add_incremental_job, catch_up_overdue_summaries,
+    reclaim_expired_leases, add_prefetch_job, prefetch_active
+)
+from core.outbox import outbox_sender_job
 from core.command_handlers import (
     handle_manual_summary, handle_show_prompt, handle_set_prompt,
     handle_prompt_input, handle_show_poll_prompt, handle_set_poll_prompt,
@@ -48,7 +55,7 @@ from core.command_handlers import (
     handle_changelog, handle_shutdown, handle_pause, handle_resume,
     handle_start, handle_help, handle_clear_cache, handle_clean_logs,
     handle_blacklist, handle_channel_poll, handle_set_channel_poll,
-    handle_delete_channel_poll, handle_reload
+    handle_delete_channel_poll, handle_reload, handle_metrics, handle_trace, handle_jobs
 )
 from core.history_handlers import handle_history, handle_export, handle_stats
 from core.poll_regeneration_handlers import handle_poll_regeneration_callback
@@ -116,6 +123,9 @@ async def send_startup_message(client):
 /reload - 重载所有配置（无需重启）
 /clearcache - 清除讨论组ID缓存
 /cleanlogs - 清理旧日志文件
+/metrics - 查看运行指标
+/trace - 查看最近总结任务的链路耗时
+/jobs - 查看总结任务队列与死信
 
 **📄 其他**
 /changelog - 查看项目更新日志"""
@@ -166,6 +176,7 @@ async def run_bot_instance():
     
     scheduler = None
     client = None
+    metrics_server = None
     
     try:
         # 初始化错误处理系统
@@ -173,27 +184,17 @@ async def run_bot_instance():
         health_checker = initialize_error_handling()
         logger.info("错误处理系统初始化完成")
         
-        # 初始化调度器
-        scheduler = AsyncIOScheduler()
+        # 初始化调度器（定时总结任务保存在 SQLite 中，重启后不会丢失）
+        scheduler = create_scheduler()
 
         # 为每个频道配置独立的定时任务
-        logger.info(f"开始为 {len(CHANNELS)} 个频道配置定时任务...")
-        for channel in CHANNELS:
+        snapshot = get_config_snapshot()
+        logger.info(f"开始为 {len(snapshot.channels)} 个频道配置定时任务...")
+        # 任务ID为 summary_job_{channel}，配置重载时按ID增量调整
+        misfire_channels = register_summary_jobs(scheduler, snapshot)
+        for channel in snapshot.channels:
             # 获取频道的自动总结时间配置（已标准化）
-            schedule = get_channel_schedule(channel)
-
-            # 构建 cron 触发器参数
-            trigger_params = build_cron_trigger(schedule)
-
-            # 创建定时任务
-            scheduler.add_job(
-                main_job,
-                'cron',
-                **trigger_params,  # 解包触发器参数
-                args=[channel],  # 传入频道参数
-                id=f"summary_job_{channel}",  # 唯一ID，便于管理
-                replace_existing=True
-            )
+            schedule = snapshot.channel(channel).schedule
 
             # 格式化输出信息
             frequency = schedule.get('frequency', 'weekly')
@@ -211,7 +212,26 @@ async def run_bot_instance():
 
             logger.info(f"频道 {channel} 的定时任务已配置：{frequency_text} {schedule['hour']:02d}:{schedule['minute']:02d}")
 
-        logger.info(f"定时任务配置完成：共 {len(CHANNELS)} 个频道")
+        logger.info(f"定时任务配置完成：共 {len(snapshot.channels)} 个频道")
+
+        # 增量总结：按固定间隔为每个频道生成阶段性摘要
+        if INCREMENTAL_SUMMARY_ENABLED:
+            for channel in snapshot.channels:
+                add_incremental_job(scheduler, channel)
+            scheduler.add_job(
+                get_db_manager().delete_old_partial_digests,
+                'cron',
+                hour=3,
+                minute=30,
+                id="cleanup_partial_digests"
+            )
+            logger.info(f"增量总结任务已配置：每 {INCREMENTAL_INTERVAL_HOURS} 小时生成一次阶段性摘要")
+
+        # 消息预取：每次定时总结前预先抓取频道消息到本地缓存
+        if prefetch_active():
+            for channel in snapshot.channels:
+                add_prefetch_job(scheduler, channel, snapshot.channel(channel))
+            logger.info(f"消息预取任务已配置：定时总结前 {PREFETCH_LEAD_MINUTES} 分钟执行")
 
         # 添加定期清理任务
         from core.config import cleanup_old_regenerations
@@ -224,6 +244,32 @@ async def run_bot_instance():
         )
         logger.info("投票重新生成数据清理任务已配置：每天凌晨3点执行")
 
+        # 定期清理已完成的旧总结任务记录（死信任务保留）
+        scheduler.add_job(
+            get_db_manager().delete_old_summary_jobs,
+            'cron',
+            hour=3,
+            minute=15,
+            id="cleanup_summary_jobs"
+        )
+
+        # 发送队列：定期重新投递发送失败的总结
+        scheduler.add_job(
+            outbox_sender_job,
+            'interval',
+            seconds=OUTBOX_RETRY_INTERVAL_SECONDS,
+            id="outbox_sender"
+        )
+        logger.info(f"发送队列投递任务已配置：每 {OUTBOX_RETRY_INTERVAL_SECONDS} 秒执行")
+
+        # 接手租约过期（持有进程已崩溃）的频道的未完成总结任务
+        scheduler.add_job(
+            reclaim_expired_leases,
+            'interval',
+            seconds=LEASE_TTL_SECONDS,
+            id="reclaim_leases"
+        )
+
         # 启动机器人客户端，处理命令
         logger.info("开始初始化Telegram机器人客户端...")
         client = TelegramClient(SESSION_PATH, int(API_ID), API_HASH)
@@ -284,6 +330,9 @@ async def run_bot_instance():
         client.add_event_handler(handle_reload, NewMessage(pattern='/reload'))
         client.add_event_handler(handle_clear_cache, NewMessage(pattern='/clearcache|/clear_cache|/清除缓存'))
         client.add_event_handler(handle_clean_logs, NewMessage(pattern='/cleanlogs|/clean_logs|/清理日志'))
+        client.add_event_handler(handle_metrics, NewMessage(pattern='/metrics|/指标'))
+        client.add_event_handler(handle_trace, NewMessage(pattern='/trace|/链路'))
+        client.add_event_handler(handle_jobs, NewMessage(pattern='/jobs|/任务队列'))
 
         # 只处理非命令消息作为提示词输入
         client.add_event_handler(handle_prompt_input, NewMessage(func=lambda e: not e.text.startswith('/')))
@@ -611,12 +660,20 @@ async def run_bot_instance():
         client.add_event_handler(handle_auto_leave, ChatAction())
         logger.info("自动退出事件处理器已注册")
 
+        # 注册常驻的讨论组转发分发器（投票发送到评论区时使用）
+        from core.telegram.forward_dispatcher import get_forward_dispatcher
+        get_forward_dispatcher().register(client)
+
         logger.info("命令处理器添加完成")
 
         # 启动客户端
         logger.info("正在启动Telegram机器人客户端...")
         await client.start(bot_token=BOT_TOKEN)
         logger.info("Telegram机器人客户端启动成功")
+
+        # 后台预热频道实体缓存（InputPeer、标题、讨论组），不阻塞启动流程
+        from core.telegram.entity_cache import get_entity_cache
+        asyncio.create_task(get_entity_cache().warm_up(client, list(get_config_snapshot().channels)))
         
         # 注册机器人命令
         logger.info("开始注册机器人命令...")
@@ -669,7 +726,10 @@ async def run_bot_instance():
             BotCommand(command="setloglevel", description="设置日志级别"),
             BotCommand(command="reload", description="重载所有配置（无需重启）"),
             BotCommand(command="clearcache", description="清除讨论组ID缓存"),
-            BotCommand(command="cleanlogs", description="清理旧日志文件")
+            BotCommand(command="cleanlogs", description="清理旧日志文件"),
+            BotCommand(command="metrics", description="查看运行指标"),
+            BotCommand(command="trace", description="查看最近总结任务的链路耗时"),
+            BotCommand(command="jobs", description="查看总结任务队列与死信")
         ]
         
         
@@ -692,6 +752,18 @@ async def run_bot_instance():
         from core.config import set_scheduler_instance
         set_scheduler_instance(scheduler)
         logger.info("调度器实例已存储到config模块")
+
+        # 后台补跑重启期间错过的定时总结（调度器会自行补跑的频道除外）
+        if CATCHUP_ENABLED:
+            asyncio.create_task(catch_up_overdue_summaries(snapshot, scheduler.timezone, misfire_channels))
+
+        # 后台投递上次运行时未发送成功的总结
+        asyncio.create_task(outbox_sender_job())
+
+        # 启动本地指标端点
+        if METRICS_ENABLED:
+            from core.metrics import start_metrics_server
+            metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT)
         
         # 向管理员发送启动消息
         logger.info("开始向管理员发送启动消息...")
@@ -768,6 +840,16 @@ async def run_bot_instance():
                     logger.info("调度器之前已停止，跳过关闭操作")
             except Exception as e:
                 logger.error(f"停止调度器时出错: {e}")
+
+        # 关闭指标端点
+        if metrics_server:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+            logger.info("指标端点已关闭")
+
+        # 断开读取会话池的常驻连接
+        from core.telegram.session_pool import close_reader_pool
+        await close_reader_pool()
         
         # 断开客户端连接（检查连接状态）
         if client and client.is_connected():
@@ -795,8 +877,85 @@ async def run_bot_instance():
         set_scheduler_instance(None)
 
 
-async def main():
-    """主函数"""
+async def run_worker_instance():
+    """运行一个工作进程：只执行定时总结，不处理机器人命令
+
+    与机器人主进程共用数据库，各进程的定时任务同时触发，
+    通过频道租约保证每个频道的每次定时总结只由一个进程执行。
+    持久化任务存储、启动补跑、增量摘要、消息预取和发送队列等仍只由机器人主进程负责。
+    """
+    logger.info(f"开始初始化工作进程 {WORKER_ID} v{__version__}...")
+
+    scheduler = None
+    client = None
+
+    try:
+        initialize_error_handling()
+
+        # 工作进程只使用内存任务存储，避免与主进程争用持久化任务
+        scheduler = create_scheduler(persistent=False)
+        snapshot = get_config_snapshot()
+        register_summary_jobs(scheduler, snapshot)
+        scheduler.add_job(
+            reclaim_expired_leases,
+            'interval',
+            seconds=LEASE_TTL_SECONDS,
+            id="reclaim_leases"
+        )
+        logger.info(f"工作进程定时任务配置完成：共 {len(snapshot.channels)} 个频道")
+
+        # 机器人客户端只用于发送报告，不注册命令处理器
+        client = TelegramClient(SESSION_PATH, int(API_ID), API_HASH)
+        from core.telegram import set_active_client
+        set_active_client(client)
+        await client.start(bot_token=BOT_TOKEN)
+        logger.info("工作进程的Telegram机器人客户端启动成功")
+
+        scheduler.start()
+        from core.config import set_scheduler_instance
+        set_scheduler_instance(scheduler)
+        logger.info(f"工作进程 {WORKER_ID} 已启动，等待定时总结任务")
+
+        await client.run_until_disconnected()
+    except Exception as e:
+        logger.critical(f"工作进程初始化或运行失败: {type(e).__name__}: {e}", exc_info=True)
+    finally:
+        logger.info("开始清理工作进程资源...")
+
+        if scheduler and scheduler.running:
+            try:
+                scheduler.shutdown(wait=True)
+                logger.info("调度器已停止")
+            except Exception as e:
+                logger.error(f"停止调度器时出错: {e}")
+
+        from core.telegram.session_pool import close_reader_pool
+        await close_reader_pool()
+
+        if client and client.is_connected():
+            try:
+                await client.disconnect()
+                logger.info("客户端连接已安全断开")
+            except Exception as e:
+                logger.error(f"断开客户端连接时出错: {e}")
+
+        from core.telegram import set_active_client
+        set_active_client(None)
+        from core.config import set_scheduler_instance
+        set_scheduler_instance(None)
+        logger.info("工作进程资源清理完成")
+
+
+async def main(worker=False):
+    """主函数
+
+    Args:
+        worker: 是否以工作进程模式运行
+    """
+    # 确保数据目录结构存在
+    from core.config import ensure_data_directories
+    ensure_data_directories()
+    
     # 执行配置验证
     from core.config import validate_config
     is_valid, errors, warnings = validate_config()
@@ -808,23 +967,38 @@ async def main():
             print(f"  ❌ {error}")
         return
     
+    if worker and not WORKER_ID:
+        logger.error("工作进程模式需要设置 WORKER_ID 环境变量")
+        print("工作进程模式需要设置 WORKER_ID 环境变量（各工作进程取不同的值）")
+        return
+
     logger.info("配置验证通过，准备启动主程序")
     
-    # 运行机器人实例
+    # 运行机器人实例（或工作进程）
     try:
-        await run_bot_instance()
+        if worker:
+            await run_worker_instance()
+        else:
+            await run_bot_instance()
     except KeyboardInterrupt:
         logger.info("收到键盘中断，退出程序")
     except Exception as e:
         logger.critical(f"主函数执行失败: {type(e).__name__}: {e}", exc_info=True)
 
 if __name__ == "__main__":
-    logger.info(f"===== Sakura频道总结助手 v{__version__} 启动 ====")
+    parser = argparse.ArgumentParser(description="Sakura频道总结助手")
+    parser.add_argument(
+        '--worker', action='store_true',
+        help="以工作进程模式运行：只执行分配到的定时总结，不处理机器人命令（需设置 WORKER_ID）"
+    )
+    args = parser.parse_args()
+
+    logger.info(f"===== Sakura频道总结助手 v{__version__} 启动{'（工作进程 ' + WORKER_ID + '）' if args.worker else ''} ====")
     
     # 启动主函数
     try:
         logger.info("开始启动主函数...")
-        asyncio.run(main())
+        asyncio.run(main(worker=args.worker))
     except KeyboardInterrupt:
         logger.info("机器人服务已通过键盘中断停止")
     except Exception as e:
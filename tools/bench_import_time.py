@@ -0,0 +1,102 @@
+# Copyright 2026 Sakura-频道总结助手
+#
+# 本项目采用 GNU General Public License v3.0 (GPLv3) 许可证
+#
+# 您可以自由地：
+# - 商业使用：将本软件用于商业目的
+# - 修改：修改本软件以满足您的需求
+# - 分发：分发本软件的副本
+# - 专利使用：明确授予专利许可
+#
+# 您必须遵守以下条件：
+# - 开源修改：如果修改了代码，必须开源修改后的代码
+# - 源代码分发：分发程序时必须同时提供源代码
+# - 相同许可证：修改和分发必须使用相同的GPLv3许可证
+# - 版权声明：保留原有的版权声明和许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Channel-Summary-Assistant-Pro
+# 许可证全文：https://www.gnu.org/licenses/gpl-3.0.html
+
+"""启动导入耗时基准
+
+在子进程中用 python -X importtime 导入指定模块（默认 main），
+取多次运行中的最小值，列出累计耗时最高的模块。
+总耗时超过预算时以非零状态码退出，可放在 CI 或发布前检查中。
+
+用法：
+    python tools/bench_import_time.py
+    python tools/bench_import_time.py --module main --budget-ms 600 --top 15 --repeat 3
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# 项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 默认导入耗时预算（毫秒）
+DEFAULT_BUDGET_MS = 600
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure(module: str):
+    """在全新子进程中导入模块一次
+
+    Returns:
+        tuple: (目标模块累计耗时毫秒, [(模块名, 累计耗时毫秒), ...])
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+
+    total_ms = None
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        name = match.group(4)
+        modules.append((name, cumulative_ms))
+        if name == module and not match.group(3).strip(" "):
+            total_ms = cumulative_ms
+
+    if total_ms is None:
+        raise RuntimeError(f"importtime 输出中没有找到模块 {module}")
+    return total_ms, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量启动时的模块导入耗时")
+    parser.add_argument("--module", default="main", help="要导入的模块（默认：main）")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="导入耗时预算（毫秒）")
+    parser.add_argument("--top", type=int, default=15, help="列出累计耗时最高的模块数量")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最小值")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(1, args.repeat))]
+    total_ms, modules = min(runs, key=lambda run: run[0])
+
+    print(f"导入 {args.module}: {total_ms:.1f} ms（{len(runs)} 次运行的最小值，预算 {args.budget_ms:.0f} ms）")
+    print(f"\n累计耗时最高的 {args.top} 个模块:")
+    for name, cumulative_ms in sorted(modules, key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_ms:8.1f} ms  {name}")
+
+    if total_ms > args.budget_ms:
+        print(f"\n❌ 超出预算 {total_ms - args.budget_ms:.1f} ms")
+        return 1
+    print("\n✅ 在预算之内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())